@@ -0,0 +1 @@
+Added the `adaptive_download_concurrency` remote option, which adapts the download concurrency of syncs to the throughput and throttling behaviour of the upstream server.
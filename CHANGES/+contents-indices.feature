@@ -0,0 +1 @@
+Added the `publish_contents` option to APT publications, which publishes `Contents-<arch>` indices from file lists of the packages, that are stored once per package.
@@ -0,0 +1 @@
+Packages and Sources files are now sorted by package name, version, and architecture, so publishing the same content always yields byte identical index files.
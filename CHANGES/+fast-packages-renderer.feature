@@ -0,0 +1 @@
+Structured and simple publishes now render Packages paragraphs directly from database rows, instead of using the `Package822Serializer`.
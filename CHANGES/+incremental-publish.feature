@@ -0,0 +1 @@
+Added the `incremental` option to APT publications, which reuses the unchanged index files of the latest publication with the same options.
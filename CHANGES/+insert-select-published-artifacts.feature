@@ -0,0 +1 @@
+On PostgreSQL, structured publishes now create the published artifacts of packages with a single `INSERT ... SELECT` per component, computing the pool paths in the database.
@@ -0,0 +1 @@
+Improved the performance of optimized syncs, by loading the metadata of the previous repository version up front instead of querying it for each distribution and package index.
@@ -0,0 +1 @@
+Added an optional database cache of rendered Packages paragraphs, shared by all publications and bounded by the `PACKAGE_PARAGRAPH_CACHE_MAX_ENTRIES` setting.
@@ -0,0 +1 @@
+Added the `MAX_PUBLISH_WORKER_PROCESSES` setting, which lets structured publishes render the index files of each distribution and component in a pool of worker processes.
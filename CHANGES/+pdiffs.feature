@@ -0,0 +1 @@
+Added the `publish_pdiffs` option to APT publications, which publishes `Packages.diff` patches from the `Packages` files of the latest `APT_PDIFF_HISTORY` publications of the repository.
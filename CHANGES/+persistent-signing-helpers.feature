@@ -0,0 +1 @@
+Added the `APT_PERSISTENT_SIGNING_SERVICES` setting, which runs the scripts of the listed Release signing services as persistent helpers signing all Release files of a publication.
@@ -0,0 +1 @@
+Added the `hybrid_format` option to APT publications, which also lists `Architecture: all` packages in the `Packages` files of all architectures and sets `No-Support-for-Architecture-all: Packages` in the `Release` files.
@@ -0,0 +1 @@
+Added the `distributions` and `overlay` options to APT publications, which publish a subset of the distributions of a repository version, optionally combined with the other distributions of the latest publication.
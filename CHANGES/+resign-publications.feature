@@ -0,0 +1 @@
+Added the `resign` actions to APT publications and distributions, which create copies of publications with newly signed Release files, without regenerating any index files.
@@ -0,0 +1 @@
+Added the `APT_REUSE_IDENTICAL_PUBLICATIONS` setting. When enabled, publishing a repository version, that was already published with the same options, reuses the files of the existing publication, including its Release file dates and signatures, instead of generating them anew.
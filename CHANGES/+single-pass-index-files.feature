@@ -0,0 +1 @@
+Publishing now writes the uncompressed and compressed variants of index files in a single pass, hashing them while writing, instead of reading every file again for compression, hashing and by-hash entries.
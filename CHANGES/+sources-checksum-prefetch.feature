@@ -0,0 +1 @@
+Generating Sources indices now fetches the checksums of all source packages of a component at once, instead of querying them per source package.
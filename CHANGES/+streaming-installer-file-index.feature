@@ -0,0 +1 @@
+Installer file indices are now parsed while streaming their SUMS files, and skipped entirely by optimized syncs if they are unchanged from the previous repository version.
@@ -0,0 +1 @@
+Simple publications now stream the packages and source packages of the repository version in chunks, joined with their artifacts, so their memory use no longer grows with the size of the repository.
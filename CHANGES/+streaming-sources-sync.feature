@@ -0,0 +1 @@
+Improved the performance and memory usage of syncs with `sync_sources=True`, by parsing well formed Sources paragraphs without the serializer, skipping source packages already known from the previous repository version, and emitting source package release components as the sync progresses.
@@ -0,0 +1 @@
+Structured publishes now stream the packages of each component from a single query, ordered by architecture and joined with their artifacts, instead of loading and filtering all packages of a distribution in memory.
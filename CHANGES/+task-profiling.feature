@@ -0,0 +1 @@
+Added the `deb-profile` task diagnostic and the `APT_TASK_PROFILING` setting, which attach sampled call stacks and database query statistics to the publish, sync, modify and copy tasks.
@@ -0,0 +1 @@
+Added the `publish_translations` option to APT publications, which publishes short descriptions with `Description-md5` in the `Packages` files, and the long descriptions in `i18n/Translation-en` files.
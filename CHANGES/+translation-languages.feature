@@ -0,0 +1 @@
+Added the `languages` and `translation_single_compression` remote options to sync translation files for a selected set of languages only.
@@ -0,0 +1 @@
+Added the `APT_INDEX_COMPRESSION_FORMATS` setting, to publish xz and zst compressed index files in addition to gzip compressed ones, using multithreaded compression.
@@ -14,6 +14,9 @@ CHECKSUM_TYPE_MAP = {
     "sha512": "SHA512",
 }
 
+# File extensions of translation file variants, from most to least strongly compressed:
+TRANSLATION_COMPRESSION_PREFERENCE = (".xz", ".bz2", ".gz", "")
+
 PACKAGE_UPLOAD_DEFAULT_DISTRIBUTION = "pulp"
 PACKAGE_UPLOAD_DEFAULT_COMPONENT = "upload"
 
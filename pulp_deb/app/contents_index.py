@@ -0,0 +1,161 @@
+"""Helpers for generating Contents indices from cached lists of the files in packages."""
+
+import heapq
+import logging
+import os
+import tempfile
+import zlib
+from gettext import gettext as _
+
+from debian import debfile
+
+from pulpcore.plugin.models import ContentArtifact
+
+from pulp_deb.app.models import PackageFileList
+
+log = logging.getLogger(__name__)
+
+# The number of packages, whose file lists are fetched and merged into one sorted run, at once:
+CONTENTS_BATCH_SIZE = 1000
+# The width of the file name column of Contents indices:
+CONTENTS_PATH_WIDTH = 55
+
+
+def package_file_paths(fileobj):
+    """
+    Return the sorted paths of the files in the data tarball of the package file fileobj.
+
+    Directories are omitted, and the paths are relative to the root directory, as in Contents
+    indices. Paths are returned as bytes, since file names in packages need not be valid UTF-8.
+    """
+    paths = []
+    with debfile.DebFile(fileobj=fileobj) as deb:
+        for member in deb.data.tgz():
+            if member.isdir():
+                continue
+            path = os.path.normpath(member.name).lstrip("/")
+            if path and path != "." and "\n" not in path:
+                paths.append(path.encode("utf-8", "surrogateescape"))
+    return sorted(paths)
+
+
+def contents_location(section, package):
+    """
+    Return the location of a package in Contents indices, which is "<section>/<package>".
+    """
+    return "{}/{}".format(section, package) if section else package
+
+
+class PackageFileListCache:
+    """
+    Provides the file lists of packages, extracting those not cached yet from their artifacts.
+
+    Newly extracted file lists are only recorded, until save() writes them to the database.
+    """
+
+    def __init__(self):
+        # The compressed file lists to be saved, by package pk:
+        self.new_entries = {}
+
+    def file_lists(self, package_pks):
+        """
+        Return the compressed file lists of the given packages by package pk.
+
+        Packages, whose file list is not cached and that have no local artifact, are omitted.
+        """
+        file_lists = {
+            package_id: bytes(paths)
+            for package_id, paths in PackageFileList.objects.filter(
+                package_id__in=package_pks
+            ).values_list("package_id", "paths")
+        }
+        missing = [pk for pk in package_pks if pk not in file_lists]
+        if not missing:
+            return file_lists
+        for content_artifact in ContentArtifact.objects.filter(
+            content_id__in=missing, artifact__isnull=False
+        ).select_related("artifact"):
+            package_pk = content_artifact.content_id
+            if package_pk in file_lists:
+                continue
+            try:
+                with content_artifact.artifact.file.open("rb") as fileobj:
+                    paths = package_file_paths(fileobj)
+            except (debfile.DebError, OSError) as e:
+                log.warning(
+                    _("Unable to list the files of package file '{}': {}").format(
+                        content_artifact.relative_path, e
+                    )
+                )
+                continue
+            file_lists[package_pk] = self.new_entries[package_pk] = zlib.compress(b"\n".join(paths))
+        return file_lists
+
+    def save(self):
+        """
+        Store the newly extracted file lists.
+        """
+        if self.new_entries:
+            PackageFileList.objects.bulk_create(
+                [
+                    PackageFileList(package_id=package_id, paths=paths)
+                    for package_id, paths in self.new_entries.items()
+                ],
+                batch_size=CONTENTS_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            self.new_entries = {}
+
+
+def _contents_lines(file_list, location):
+    paths = zlib.decompress(file_list)
+    if not paths:
+        return
+    for path in paths.split(b"\n"):
+        yield path + b"\0" + location + b"\n"
+
+
+def _write_contents_line(index_file, path, locations):
+    index_file.write(path.ljust(CONTENTS_PATH_WIDTH) + b" " + b",".join(locations) + b"\n")
+
+
+def write_contents_index(index_file, packages, file_list_cache):
+    """
+    Write the Contents index of packages, given as (package pk, location) pairs, to index_file.
+
+    The sorted file lists of CONTENTS_BATCH_SIZE packages at a time are merged into sorted runs in
+    temporary files, which are then merged into the index file. This way, memory use does not grow
+    with the number of files in the packages. Packages without file list are left out.
+    """
+    runs = []
+    try:
+        for i in range(0, len(packages), CONTENTS_BATCH_SIZE):
+            chunk = packages[i : i + CONTENTS_BATCH_SIZE]
+            file_lists = file_list_cache.file_lists([package_pk for package_pk, location in chunk])
+            run = tempfile.TemporaryFile()
+            runs.append(run)
+            run.writelines(
+                heapq.merge(
+                    *(
+                        _contents_lines(file_lists[package_pk], location.encode("utf-8"))
+                        for package_pk, location in chunk
+                        if package_pk in file_lists
+                    )
+                )
+            )
+            run.seek(0)
+
+        path, locations = None, []
+        for line in heapq.merge(*runs):
+            line_path, location = line.rstrip(b"\n").split(b"\0")
+            if line_path != path:
+                if path is not None:
+                    _write_contents_line(index_file, path, locations)
+                path, locations = line_path, []
+            if location not in locations:
+                locations.append(location)
+        if path is not None:
+            _write_contents_line(index_file, path, locations)
+    finally:
+        for run in runs:
+            run.close()
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from gettext import gettext as _
+
+import aiohttp
+from django.conf import settings
+
+from pulpcore.plugin.constants import TASK_STATES
+from pulpcore.plugin.download import DownloaderFactory, HttpDownloader
+from pulpcore.plugin.models import ProgressReport
+
+log = logging.getLogger(__name__)
+
+# The minimum number of seconds between two adjustments of the download concurrency:
+ADJUSTMENT_INTERVAL = 10
+# Throughput must improve by this factor for the download concurrency to be raised further:
+RATE_IMPROVEMENT_FACTOR = 1.05
+# The download concurrency is reduced if latency rises by more than this factor:
+LATENCY_INCREASE_FACTOR = 1.5
+
+
+def next_download_concurrency(
+    limit, maximum, saturated, rate, previous_rate, latency, previous_latency
+):
+    """
+    Returns the download concurrency to use for the next adjustment interval.
+
+    Args:
+        limit (int): The download concurrency used for the last interval.
+        maximum (int): The highest download concurrency that may be returned.
+        saturated (bool): Whether all allowed downloads were in use during the last interval.
+        rate (float): The throughput in bytes per second during the last interval.
+        previous_rate (float): The throughput during the interval before that (or None).
+        latency (float): The mean time to response headers during the last interval (or None).
+        previous_latency (float): The mean latency during the interval before that (or None).
+    """
+    if latency and previous_latency and latency > previous_latency * LATENCY_INCREASE_FACTOR:
+        return max(1, limit * 3 // 4)
+    if saturated and (previous_rate is None or rate > previous_rate * RATE_IMPROVEMENT_FACTOR):
+        return min(maximum, limit + max(1, limit // 4))
+    return limit
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    An asynchronous context manager restricting the number of concurrent downloads.
+
+    It is used in place of the download semaphore of a DownloaderFactory. The limit is raised while
+    the throughput improves, and lowered in response to 429 or 5xx responses and rising latency.
+    """
+
+    def __init__(self, initial, maximum):
+        self.maximum = maximum
+        self.limit = max(1, min(initial, maximum))
+        self.in_use = 0
+        self.progress_report = None
+        self._condition = asyncio.Condition()
+        self._last_backoff = None
+        self._previous_rate = None
+        self._previous_latency = None
+        self._reset_interval(time.monotonic())
+
+    def _reset_interval(self, now):
+        self._interval_start = now
+        self._interval_bytes = 0
+        self._interval_latencies = []
+        self._saturated = self.in_use >= self.limit
+
+    async def __aenter__(self):
+        async with self._condition:
+            if self.in_use >= self.limit:
+                self._saturated = True
+            await self._condition.wait_for(lambda: self.in_use < self.limit)
+            self.in_use += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.in_use -= 1
+            self._condition.notify_all()
+
+    def record_latency(self, latency):
+        """
+        Record the time it took to receive the response headers for one request.
+        """
+        self._interval_latencies.append(latency)
+
+    async def record_throttled(self, status):
+        """
+        Halve the download concurrency in response to a 429 or 5xx response.
+
+        Responses to requests, that were already in flight before the last backoff, are ignored.
+        """
+        now = time.monotonic()
+        if self._last_backoff is not None and now - self._last_backoff < ADJUSTMENT_INTERVAL:
+            return
+        self._last_backoff = now
+        await self._set_limit(max(1, self.limit // 2), rate=None, reason=f"HTTP {status}")
+        self._previous_rate = None
+        self._previous_latency = None
+        self._reset_interval(now)
+
+    async def record_download(self, size):
+        """
+        Record a completed download and adjust the download concurrency once per interval.
+        """
+        self._interval_bytes += size
+        now = time.monotonic()
+        elapsed = now - self._interval_start
+        if elapsed < ADJUSTMENT_INTERVAL:
+            return
+        rate = self._interval_bytes / elapsed
+        latencies = self._interval_latencies
+        latency = sum(latencies) / len(latencies) if latencies else None
+        new_limit = next_download_concurrency(
+            self.limit,
+            self.maximum,
+            self._saturated,
+            rate,
+            self._previous_rate,
+            latency,
+            self._previous_latency,
+        )
+        await self._set_limit(new_limit, rate=rate)
+        self._previous_rate = rate
+        self._previous_latency = latency
+        self._reset_interval(now)
+
+    async def _set_limit(self, limit, rate, reason=None):
+        old_limit = self.limit
+        async with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+
+        rate_suffix = _("{:.1f} KiB/s").format(rate / 1024) if rate is not None else reason
+        if limit != old_limit:
+            log.info(
+                _("Changed download concurrency from {} to {} ({}).").format(
+                    old_limit, limit, rate_suffix
+                )
+            )
+        if self.progress_report is None:
+            return
+        self.progress_report.done = limit
+        self.progress_report.suffix = rate_suffix
+        await self.progress_report.asave()
+        if limit != old_limit:
+            await ProgressReport(
+                message=_("Changed download concurrency from {} to {}").format(old_limit, limit),
+                code="sync.download_concurrency.changed",
+                state=TASK_STATES.COMPLETED,
+                total=self.maximum,
+                done=limit,
+                suffix=rate_suffix,
+            ).asave()
+
+    async def start_reporting(self):
+        """
+        Record the download concurrency in ProgressReports of the current task from now on.
+        """
+        if self.progress_report is None:
+            self.progress_report = ProgressReport(
+                message=_("Adaptive download concurrency"),
+                code="sync.download_concurrency",
+                state=TASK_STATES.RUNNING,
+                total=self.maximum,
+                done=self.limit,
+            )
+            await self.progress_report.asave()
+
+    def finish_reporting(self):
+        """
+        Mark the ProgressReport for the download concurrency as completed.
+        """
+        if self.progress_report is not None:
+            self.progress_report.state = TASK_STATES.COMPLETED
+            self.progress_report.save()
+            self.progress_report = None
+
+
+class AdaptiveHttpDownloader(HttpDownloader):
+    """
+    A HttpDownloader, that reports to the AdaptiveConcurrencyLimiter used as its semaphore.
+    """
+
+    async def _run(self, extra_data=None):
+        self._request_start = time.monotonic()
+        try:
+            result = await super()._run(extra_data=extra_data)
+        except aiohttp.ClientResponseError as e:
+            if e.status == 429 or e.status >= 500:
+                await self.semaphore.record_throttled(e.status)
+            raise
+        await self.semaphore.record_download(result.artifact_attributes.get("size") or 0)
+        return result
+
+    def raise_for_status(self, response):
+        self.semaphore.record_latency(time.monotonic() - self._request_start)
+        super().raise_for_status(response)
+
+
+class AdaptiveDownloaderFactory(DownloaderFactory):
+    """
+    A DownloaderFactory, that adapts the download concurrency of HTTP downloads.
+
+    The remote's download_concurrency is used as the initial value.
+    """
+
+    def __init__(self, remote, downloader_overrides=None):
+        downloader_overrides = {
+            "http": AdaptiveHttpDownloader,
+            "https": AdaptiveHttpDownloader,
+            **(downloader_overrides or {}),
+        }
+        super().__init__(remote, downloader_overrides=downloader_overrides)
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter(
+            initial=remote.download_concurrency or remote.DEFAULT_DOWNLOAD_CONCURRENCY,
+            maximum=settings.ADAPTIVE_DOWNLOAD_CONCURRENCY_MAX,
+        )
+        # Downloaders built by this factory acquire this in place of a plain semaphore:
+        self._semaphore = self.concurrency_limiter
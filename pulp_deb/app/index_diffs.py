@@ -0,0 +1,99 @@
+"""Helpers for generating the PDiffs (ed style patches) of index files."""
+
+import difflib
+import hashlib
+
+from pulp_deb.app.constants import CHECKSUM_TYPE_MAP
+
+# The checksum types APT supports in the Index files of PDiffs:
+DIFF_INDEX_CHECKSUMS = ("sha1", "sha256", "sha512")
+
+
+class StanzaDigests:
+    """
+    The digest, line number and byte offset of each stanza of an index file.
+
+    Stanzas include the blank line terminating them. The line number and offset lists have one
+    additional entry for the end of the file.
+    """
+
+    def __init__(self, fileobj):
+        self.digests = []
+        self.lines = [0]
+        self.offsets = [0]
+        hasher = hashlib.sha256()
+        line_count = offset = 0
+        for line in fileobj:
+            hasher.update(line)
+            line_count += 1
+            offset += len(line)
+            if line == b"\n":
+                self._add_stanza(hasher, line_count, offset)
+                hasher = hashlib.sha256()
+        if offset > self.offsets[-1]:
+            self._add_stanza(hasher, line_count, offset)
+
+    def _add_stanza(self, hasher, line_count, offset):
+        self.digests.append(hasher.digest())
+        self.lines.append(line_count)
+        self.offsets.append(offset)
+
+
+def ed_diff(old, new, new_file):
+    """
+    Return the ed script transforming the index file with StanzaDigests old into the one with
+    StanzaDigests new, whose content is read from new_file.
+
+    Whole stanzas are compared, and the commands are ordered from the end of the file to its start,
+    as required by APT.
+    """
+    commands = []
+    opcodes = difflib.SequenceMatcher(None, old.digests, new.digests, autojunk=False).get_opcodes()
+    for tag, i1, i2, j1, j2 in reversed(opcodes):
+        if tag == "equal":
+            continue
+        if tag == "insert":
+            commands.append(b"%da\n" % old.lines[i1])
+        else:
+            first, last = old.lines[i1] + 1, old.lines[i2]
+            line_range = b"%d" % first if first == last else b"%d,%d" % (first, last)
+            commands.append(line_range + (b"d\n" if tag == "delete" else b"c\n"))
+        if tag != "delete":
+            new_file.seek(new.offsets[j1])
+            commands.append(new_file.read(new.offsets[j2] - new.offsets[j1]))
+            commands.append(b".\n")
+    return b"".join(commands)
+
+
+def render_diff_index(current, history, patches, downloads, checksum_types):
+    """
+    Render the Index file of a PDiff directory in the merged format, where every patch transforms
+    an older version of the index file directly into the current one.
+
+    Args:
+        current (tuple): The (checksums, size) of the current index file.
+        history (list): The (checksums, size, patch name) of each older version of the index file.
+        patches (list): The (checksums, size, patch name) of each uncompressed patch.
+        downloads (list): The (checksums, size, file name) of each compressed patch.
+        checksum_types (list): The checksum types to list, from DIFF_INDEX_CHECKSUMS.
+
+    Returns:
+        bytes: The Index file.
+    """
+    lines = []
+    for checksum_type in checksum_types:
+        field = CHECKSUM_TYPE_MAP[checksum_type]
+        checksums, size = current
+        lines.append("{}-Current: {} {}".format(field, checksums[checksum_type], size))
+        for suffix, entries in (
+            ("History", history),
+            ("Patches", patches),
+            ("Download", downloads),
+        ):
+            lines.append("{}-{}:".format(field, suffix))
+            lines.extend(
+                " {} {} {}".format(entry_checksums[checksum_type], entry_size, name)
+                for entry_checksums, entry_size, name in entries
+            )
+    lines.append("X-Patch-Precedence: merged")
+    return ("\n".join(lines) + "\n").encode("utf-8")
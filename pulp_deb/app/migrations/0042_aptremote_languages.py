@@ -0,0 +1,23 @@
+# Generated by Django 5.2.12 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0041_package_metadata_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aptremote',
+            name='languages',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='aptremote',
+            name='translation_single_compression',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.12 on 2026-10-19 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0042_aptremote_languages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aptremote',
+            name='adaptive_download_concurrency',
+            field=models.BooleanField(default=False),
+        ),
+    ]
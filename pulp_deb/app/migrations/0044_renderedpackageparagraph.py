@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:19
+
+import django.db.models.deletion
+import django_lifecycle.mixins
+import pulpcore.app.models.base
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0043_aptremote_adaptive_download_concurrency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedPackageParagraph',
+            fields=[
+                (
+                    'pulp_id',
+                    models.UUIDField(
+                        default=pulpcore.app.models.base.pulp_uuid,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ('pulp_created', models.DateTimeField(auto_now_add=True)),
+                ('pulp_last_updated', models.DateTimeField(auto_now=True, null=True)),
+                ('component', models.TextField()),
+                (
+                    'layout',
+                    models.TextField(
+                        choices=[
+                            ('nested_alphabetically', 'nested_alphabetically'),
+                            ('nested_by_digest', 'nested_by_digest'),
+                            ('nested_by_both', 'nested_by_both'),
+                        ]
+                    ),
+                ),
+                ('basename', models.TextField()),
+                ('checksums', models.TextField()),
+                ('paragraph', models.BinaryField()),
+                (
+                    'package',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to='deb.package'
+                    ),
+                ),
+            ],
+            options={
+                'default_related_name': '%(app_label)s_%(model_name)s',
+                'indexes': [
+                    models.Index(
+                        fields=['pulp_last_updated'], name='deb_rendere_pulp_la_e3ea74_idx'
+                    )
+                ],
+                'unique_together': {('package', 'component', 'layout', 'basename', 'checksums')},
+            },
+            bases=(django_lifecycle.mixins.LifecycleModelMixin, models.Model),
+        ),
+    ]
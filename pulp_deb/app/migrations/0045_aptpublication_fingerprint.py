@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0044_renderedpackageparagraph'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aptpublication',
+            name='fingerprint',
+            field=models.TextField(db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0045_aptpublication_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aptpublication',
+            name='hybrid_format',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:34
+
+import django.db.models.deletion
+import django_lifecycle.mixins
+import pulpcore.app.models.base
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0046_aptpublication_hybrid_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aptpublication',
+            name='publish_contents',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PackageFileList',
+            fields=[
+                (
+                    'pulp_id',
+                    models.UUIDField(
+                        default=pulpcore.app.models.base.pulp_uuid,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ('pulp_created', models.DateTimeField(auto_now_add=True)),
+                ('pulp_last_updated', models.DateTimeField(auto_now=True, null=True)),
+                ('paths', models.BinaryField()),
+                (
+                    'package',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE, to='deb.package'
+                    ),
+                ),
+            ],
+            options={
+                'default_related_name': '%(app_label)s_%(model_name)s',
+            },
+            bases=(django_lifecycle.mixins.LifecycleModelMixin, models.Model),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0047_packagefilelist'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='renderedpackageparagraph',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='aptpublication',
+            name='publish_translations',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='renderedpackageparagraph',
+            name='split_description',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterUniqueTogether(
+            name='renderedpackageparagraph',
+            unique_together={
+                ('package', 'component', 'layout', 'split_description', 'basename', 'checksums')
+            },
+        ),
+    ]
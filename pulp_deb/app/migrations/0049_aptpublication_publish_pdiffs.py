@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0048_translation_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aptpublication',
+            name='publish_pdiffs',
+            field=models.BooleanField(default=False),
+        ),
+    ]
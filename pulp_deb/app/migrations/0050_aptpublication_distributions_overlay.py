@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:46
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0049_aptpublication_publish_pdiffs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aptpublication',
+            name='distributions',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.TextField(), null=True, size=None
+            ),
+        ),
+        migrations.AddField(
+            model_name='aptpublication',
+            name='overlay',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0050_aptpublication_distributions_overlay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aptpublication',
+            name='publish_legacy_release_files',
+            field=models.BooleanField(default=False),
+        ),
+    ]
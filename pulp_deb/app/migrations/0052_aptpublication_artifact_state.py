@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deb', '0051_aptpublication_publish_legacy_release_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aptpublication',
+            name='artifact_state',
+            field=models.TextField(null=True),
+        ),
+    ]
@@ -24,7 +24,13 @@ from .content.structure_content import (
 
 from .content.verbatim_metadata import ReleaseFile, PackageIndex, InstallerFileIndex, SourceIndex
 
-from .publication import AptDistribution, AptPublication, VerbatimPublication
+from .publication import (
+    AptDistribution,
+    AptPublication,
+    PackageFileList,
+    RenderedPackageParagraph,
+    VerbatimPublication,
+)
 
 from .remote import AptRemote
 
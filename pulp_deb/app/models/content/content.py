@@ -21,6 +21,28 @@ from pulp_deb.app.constants import LAYOUT_TYPES
 BOOL_CHOICES = [(True, "yes"), (False, "no")]
 
 
+def pool_filename(
+    package, source, sha256, basename, component="", layout=LAYOUT_TYPES.NESTED_ALPHABETICALLY
+):
+    """Assemble the filename of a package with the given fields in the pool directory."""
+    sourcename = source or package
+    sourcename = sourcename.split("(", 1)[0].rstrip()
+    if sourcename.startswith("lib"):
+        prefix = sourcename[0:4]
+    else:
+        prefix = sourcename[0]
+    path = os.path.join("pool", component, prefix, sourcename)
+
+    if layout == LAYOUT_TYPES.NESTED_ALPHABETICALLY:
+        return os.path.join(path, basename)
+    else:  # NESTED_BY_DIGEST or NESTED_BY_BOTH. The primary URL in BOTH is by digest.
+        return os.path.join(
+            path,
+            "by-digest",
+            "{}-{}".format(sha256[0:6], basename),
+        )
+
+
 class BasePackage(Content):
     """
     Abstract base class for package like content.
@@ -87,23 +109,8 @@ class BasePackage(Content):
         self, component="", layout=LAYOUT_TYPES.NESTED_ALPHABETICALLY, basename_override=None
     ):
         """Assemble filename in pool directory."""
-        sourcename = self.source or self.package
-        sourcename = sourcename.split("(", 1)[0].rstrip()
-        if sourcename.startswith("lib"):
-            prefix = sourcename[0:4]
-        else:
-            prefix = sourcename[0]
-        path = os.path.join("pool", component, prefix, sourcename)
-
         basename = basename_override or "{}.{}".format(self.name, self.SUFFIX)
-        if layout == LAYOUT_TYPES.NESTED_ALPHABETICALLY:
-            return os.path.join(path, basename)
-        else:  # NESTED_BY_DIGEST or NESTED_BY_BOTH. The primary URL in BOTH is by digest.
-            return os.path.join(
-                path,
-                "by-digest",
-                "{}-{}".format(self.sha256[0:6], basename),
-            )
+        return pool_filename(self.package, self.source, self.sha256, basename, component, layout)
 
     class Meta:
         default_related_name = "%(app_label)s_%(model_name)s"
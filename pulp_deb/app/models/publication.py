@@ -1,6 +1,7 @@
 from contextlib import suppress
 from datetime import timedelta
 
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.utils import timezone
 from django_lifecycle import AFTER_CREATE, AFTER_UPDATE, hook
@@ -75,6 +76,17 @@ class AptPublication(Publication, AutoAddObjPermsMixin):
     signing_service = models.ForeignKey(
         AptReleaseSigningService, on_delete=models.PROTECT, null=True
     )
+    publish_legacy_release_files = models.BooleanField(default=False)
+    hybrid_format = models.BooleanField(default=False)
+    publish_contents = models.BooleanField(default=False)
+    publish_translations = models.BooleanField(default=False)
+    publish_pdiffs = models.BooleanField(default=False)
+    distributions = ArrayField(models.TextField(), null=True)
+    overlay = models.BooleanField(default=False)
+    # Identifies the content and all options determining the published files:
+    fingerprint = models.TextField(null=True, db_index=True)
+    # Identifies the artifacts of the published (source) packages, see _artifact_state():
+    artifact_state = models.TextField(null=True)
 
     @hook(AFTER_UPDATE, when="complete", has_changed=True, is_now=True)
     def set_distributed_publication(self):
@@ -155,3 +167,44 @@ class DistributedPublication(BaseModel):
         DistributedPublication.objects.exclude(pk=self.pk).filter(
             distribution=self.distribution, expires_at__isnull=True
         ).update(expires_at=(timezone.now() + PUBLICATION_CACHE_DURATION))
+
+
+class RenderedPackageParagraph(BaseModel):
+    """
+    A cached Packages index paragraph of a package, as rendered for a publication.
+
+    Paragraphs are shared by all publications, that publish the package in the same component, with
+    the same layout, pool file name (basename), checksum types (checksums), and description format
+    (split_description). The number of cached paragraphs is bounded by the
+    PACKAGE_PARAGRAPH_CACHE_MAX_ENTRIES setting, evicting the least recently used ones.
+    """
+
+    package = models.ForeignKey("deb.Package", on_delete=models.CASCADE)
+    component = models.TextField()
+    layout = models.TextField(choices=LAYOUT_CHOICES)
+    split_description = models.BooleanField(default=False)
+    basename = models.TextField()
+    checksums = models.TextField()
+    paragraph = models.BinaryField()
+
+    class Meta:
+        default_related_name = "%(app_label)s_%(model_name)s"
+        unique_together = (
+            ("package", "component", "layout", "split_description", "basename", "checksums"),
+        )
+        indexes = [models.Index(fields=["pulp_last_updated"])]
+
+
+class PackageFileList(BaseModel):
+    """
+    The paths of the files in a package, as listed in Contents indices.
+
+    The paths are extracted once from the data tarball of the package artifact, and stored sorted,
+    newline separated and zlib compressed.
+    """
+
+    package = models.OneToOneField("deb.Package", on_delete=models.CASCADE)
+    paths = models.BinaryField()
+
+    class Meta:
+        default_related_name = "%(app_label)s_%(model_name)s"
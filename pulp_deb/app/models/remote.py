@@ -2,6 +2,8 @@ from django.db import models
 
 from pulpcore.plugin.models import AutoAddObjPermsMixin, Remote
 
+from pulp_deb.app.downloaders import AdaptiveDownloaderFactory
+
 
 class AptRemote(Remote, AutoAddObjPermsMixin):
     """
@@ -18,6 +20,22 @@ class AptRemote(Remote, AutoAddObjPermsMixin):
     sync_installer = models.BooleanField(default=False)
     gpgkey = models.TextField(null=True)
     ignore_missing_package_indices = models.BooleanField(default=False)
+    languages = models.TextField(null=True)
+    translation_single_compression = models.BooleanField(default=False)
+    adaptive_download_concurrency = models.BooleanField(default=False)
+
+    @property
+    def download_factory(self):
+        """
+        Return the DownloaderFactory, adapting the download concurrency if so configured.
+        """
+        if not self.adaptive_download_concurrency:
+            return super().download_factory
+        try:
+            return self._download_factory
+        except AttributeError:
+            self._download_factory = AdaptiveDownloaderFactory(self)
+            return self._download_factory
 
     class Meta:
         default_related_name = "%(app_label)s_%(model_name)s"
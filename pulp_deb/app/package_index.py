@@ -0,0 +1,245 @@
+"""Helpers for rendering the paragraphs of Packages indices without the Package822Serializer."""
+
+import hashlib
+
+from django.conf import settings
+from django.utils import timezone
+
+from pulp_deb.app.constants import LAYOUT_TYPES
+from pulp_deb.app.models import RenderedPackageParagraph
+from pulp_deb.app.models.content.content import pool_filename
+from pulp_deb.app.serializers.content_serializers import BasePackage822Serializer
+
+# The Package fields written to Packages indices, in the order of the Package822Serializer:
+PACKAGE_INDEX_FIELDS = tuple(BasePackage822Serializer.TRANSLATION_DICT.items())
+# The Package fields needed for rendering a Packages paragraph, for use with values():
+PACKAGE_INDEX_VALUES = ("pk", "sha256", "custom_fields", *BasePackage822Serializer.TRANSLATION_DICT)
+YES_NO_FIELDS = ("essential", "build_essential")
+# The number of cached paragraphs written or touched per query:
+PARAGRAPH_CACHE_BATCH_SIZE = 2000
+
+
+def _validate_value(value):
+    """
+    Raise ValueError for values, that python-debian refuses to add to a deb822 paragraph.
+    """
+    if "\n" not in value:
+        return
+    if value.endswith("\n"):
+        raise ValueError("value must not end in '\\n'")
+    for line in value.splitlines()[1:]:
+        if not line:
+            raise ValueError("value must not have blank lines")
+        if not line[0].isspace():
+            raise ValueError("each line must start with whitespace")
+
+
+def _representation(field, value):
+    if field in YES_NO_FIELDS:
+        return {True: "yes", False: "no"}.get(value)
+    return str(value)
+
+
+def render_package_paragraph(
+    row,
+    component,
+    artifact=None,
+    layout=LAYOUT_TYPES.NESTED_ALPHABETICALLY,
+    basename=None,
+):
+    """
+    Render the Packages paragraph of a package, excluding the blank line separating paragraphs.
+
+    The result is byte-identical to dumping the output of Package822Serializer.to822().
+
+    Args:
+        row (dict): The PACKAGE_INDEX_VALUES of the package, as returned by values().
+        component (str): The component the package is published in.
+        artifact: The Artifact or RemoteArtifact of the package, providing checksums and size.
+        layout (str): The layout of the publication.
+        basename (str): The name of the package file in the pool directory.
+
+    Returns:
+        bytes: The UTF-8 encoded paragraph.
+    """
+    # Field names are case insensitive, later values replace earlier ones in place:
+    paragraph = {}
+
+    def add(key, value):
+        _validate_value(value)
+        keyi = key.lower()
+        paragraph[keyi] = (paragraph[keyi][0] if keyi in paragraph else key, value)
+
+    for field, key in PACKAGE_INDEX_FIELDS:
+        value = row[field]
+        if value is not None:
+            value = _representation(field, value)
+        if value is not None:
+            add(key, value)
+
+    custom_fields = row["custom_fields"]
+    if custom_fields:
+        for key, value in custom_fields.items():
+            if value is not None:
+                add(str(key), str(value))
+
+    if artifact:
+        if artifact.md5:
+            add("MD5sum", artifact.md5)
+        if artifact.sha1:
+            add("SHA1", artifact.sha1)
+        add("SHA256", artifact.sha256)
+        add("Size", str(artifact.size))
+    if basename is None:
+        basename = "{}_{}_{}.deb".format(row["package"], row["version"], row["architecture"])
+    add(
+        "Filename",
+        pool_filename(row["package"], row["source"], row["sha256"], basename, component, layout),
+    )
+
+    return "".join(
+        ("{}:{}\n" if not value or value[0] == "\n" else "{}: {}\n").format(key, value)
+        for key, value in paragraph.values()
+    ).encode("utf-8")
+
+
+def split_description(row):
+    """
+    Split the long description off the PACKAGE_INDEX_VALUES row of a package.
+
+    Returns:
+        tuple: The row with the short description and its "Description-md5", and the
+            (description md5, full description) for the Translation-en index, or None if the package
+            has no long description.
+    """
+    description = row["description"]
+    if not description or "\n" not in description:
+        return row, None
+    md5 = hashlib.md5((description + "\n").encode("utf-8"), usedforsecurity=False).hexdigest()
+    short_row = {**row, "description": description.split("\n", 1)[0], "description_md5": md5}
+    return short_row, (md5, description)
+
+
+def render_translation_paragraph(package, md5, description):
+    """
+    Render the Translation-en paragraph of a package description, excluding the blank line
+    separating paragraphs.
+    """
+    return "Package: {}\nDescription-md5: {}\nDescription-en: {}\n".format(
+        package, md5, description
+    ).encode("utf-8")
+
+
+def paragraph_checksums(artifact):
+    """
+    Return the comma separated checksum types, that a paragraph rendered with artifact includes.
+    """
+    if not artifact:
+        return ""
+    return ",".join(
+        [checksum for checksum in ("md5", "sha1") if getattr(artifact, checksum)] + ["sha256"]
+    )
+
+
+class PackageParagraphCache:
+    """
+    Renders Packages paragraphs of one component, reusing paragraphs cached by earlier publications.
+
+    Paragraphs rendered for cache misses and the cache hits are only recorded, until save() writes
+    them to the database. The cache is disabled, unless PACKAGE_PARAGRAPH_CACHE_MAX_ENTRIES is
+    positive. With split_descriptions, paragraphs carry the short descriptions of split_description().
+    """
+
+    def __init__(self, component, layout, split_descriptions=False):
+        self.component = component
+        self.layout = layout
+        self.split_descriptions = split_descriptions
+        self.enabled = settings.PACKAGE_PARAGRAPH_CACHE_MAX_ENTRIES > 0
+        # The paragraphs by (package pk, basename, checksums), with the pk of their cache entry:
+        self.paragraphs = {}
+        self.new_entries = []
+        self.used_pks = set()
+
+    def __getstate__(self):
+        # Worker processes of the publish process pool only return what save() needs:
+        return {**self.__dict__, "paragraphs": {}}
+
+    def load(self, package_pks):
+        """
+        Fetch the cached paragraphs of the given packages.
+        """
+        if not self.enabled:
+            return
+        for pk, package_id, basename, checksums, paragraph in (
+            RenderedPackageParagraph.objects.filter(
+                package_id__in=package_pks,
+                component=self.component,
+                layout=self.layout,
+                split_description=self.split_descriptions,
+            )
+            .values_list("pk", "package_id", "basename", "checksums", "paragraph")
+            .iterator(chunk_size=PARAGRAPH_CACHE_BATCH_SIZE)
+        ):
+            self.paragraphs[(package_id, basename, checksums)] = (pk, bytes(paragraph))
+
+    def render(self, row, artifact, basename):
+        """
+        Return the paragraph of render_package_paragraph(), from the cache if possible.
+        """
+        key = (row["pk"], basename, paragraph_checksums(artifact))
+        if key in self.paragraphs:
+            pk, paragraph = self.paragraphs[key]
+            if pk is not None:
+                self.used_pks.add(pk)
+            return paragraph
+        if self.split_descriptions:
+            row = split_description(row)[0]
+        paragraph = render_package_paragraph(row, self.component, artifact, self.layout, basename)
+        if self.enabled:
+            self.paragraphs[key] = (None, paragraph)
+            self.new_entries.append(key + (paragraph,))
+        return paragraph
+
+    def save(self):
+        """
+        Store the newly rendered paragraphs and mark the cache hits as recently used.
+        """
+        if self.new_entries:
+            RenderedPackageParagraph.objects.bulk_create(
+                [
+                    RenderedPackageParagraph(
+                        package_id=package_id,
+                        component=self.component,
+                        layout=self.layout,
+                        split_description=self.split_descriptions,
+                        basename=basename,
+                        checksums=checksums,
+                        paragraph=paragraph,
+                    )
+                    for package_id, basename, checksums, paragraph in self.new_entries
+                ],
+                batch_size=PARAGRAPH_CACHE_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            self.new_entries = []
+        used_pks = list(self.used_pks)
+        now = timezone.now()
+        for i in range(0, len(used_pks), PARAGRAPH_CACHE_BATCH_SIZE):
+            RenderedPackageParagraph.objects.filter(
+                pk__in=used_pks[i : i + PARAGRAPH_CACHE_BATCH_SIZE]
+            ).update(pulp_last_updated=now)
+        self.used_pks = set()
+
+
+def evict_package_paragraphs():
+    """
+    Delete the least recently used cached paragraphs beyond PACKAGE_PARAGRAPH_CACHE_MAX_ENTRIES.
+    """
+    max_entries = settings.PACKAGE_PARAGRAPH_CACHE_MAX_ENTRIES
+    if max_entries <= 0:
+        RenderedPackageParagraph.objects.all().delete()
+        return
+    evicted = RenderedPackageParagraph.objects.order_by("-pulp_last_updated").values("pk")[
+        max_entries:
+    ]
+    RenderedPackageParagraph.objects.filter(pk__in=evicted).delete()
@@ -0,0 +1,223 @@
+"""Opt-in profiling of deb tasks, whose reports are attached to the task as profile artifacts."""
+
+import functools
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from gettext import gettext as _
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.utils import IntegrityError
+
+from pulpcore.plugin.models import Artifact, Task
+
+log = logging.getLogger(__name__)
+
+# The task diagnostics option requesting deb task profiling via the X-Task-Diagnostics header:
+PROFILE_OPTION = "deb-profile"
+# The names of the profile artifacts of profiled tasks:
+STACK_SAMPLES_NAME = "deb_stack_samples"
+DB_QUERIES_NAME = "deb_db_queries"
+# Modules, that are skipped when looking for the call site of a database query:
+DB_QUERY_INTERNAL_MODULES = ("django.", "psycopg", "asgiref.", __name__)
+
+
+def profiling_requested(task):
+    """
+    Whether task is to be profiled, either because APT_TASK_PROFILING is set, or because the task
+    was dispatched with the "deb-profile" task diagnostics option, which TASK_DIAGNOSTICS allows.
+    """
+    if settings.APT_TASK_PROFILING:
+        return True
+    return (
+        task is not None
+        and PROFILE_OPTION in (task.profile_options or [])
+        and PROFILE_OPTION in settings.TASK_DIAGNOSTICS
+    )
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return "{} ({}:{})".format(
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno
+    )
+
+
+def folded_stack(frame):
+    """
+    Return the call stack of frame in the folded format of flame graph tools, from the outermost
+    call to the innermost one, separated by semicolons.
+    """
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Counts the call stacks of all other threads every interval seconds, in a background thread.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="deb-stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_thread_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_thread_id:
+                    thread_name = thread_names.get(thread_id, str(thread_id))
+                    self.samples[thread_name + ";" + folded_stack(frame)] += 1
+
+    def write_report(self, report_file):
+        """
+        Write the samples as folded stacks, which flamegraph.pl or speedscope render as flame graph.
+        """
+        for stack, count in sorted(self.samples.items()):
+            report_file.write("{} {}\n".format(stack, count))
+
+
+def query_call_site(frame):
+    """
+    Return the name of the innermost caller of frame outside of the database layer.
+    """
+    while frame is not None and frame.f_globals.get("__name__", "").startswith(
+        DB_QUERY_INTERNAL_MODULES
+    ):
+        frame = frame.f_back
+    if frame is None:
+        return "<unknown>"
+    return "{}:{} {}".format(frame.f_globals.get("__name__"), frame.f_lineno, frame.f_code.co_name)
+
+
+class QueryRecorder:
+    """
+    Records the number and the duration of the database queries by call site, for all database
+    connections of the process, including those opened by other threads while recording.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self.durations = defaultdict(float)
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            call_site = query_call_site(sys._getframe(1))
+            with self._lock:
+                self.calls[call_site] += 1
+                self.durations[call_site] += duration
+
+    def start(self):
+        for connection in connections.all(initialized_only=True):
+            self._install(connection)
+        connection_created.connect(self._connection_created)
+
+    def stop(self):
+        connection_created.disconnect(self._connection_created)
+        with self._lock:
+            for connection in self._connections:
+                if self in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(self)
+            self._connections = []
+
+    def _connection_created(self, sender, connection, **kwargs):
+        self._install(connection)
+
+    def _install(self, connection):
+        with self._lock:
+            if self not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self)
+                self._connections.append(connection)
+
+    def write_report(self, report_file):
+        """
+        Write a table of the call sites, ordered by the total duration of their queries.
+        """
+        report_file.write("{:>8} {:>12} {}\n".format("queries", "seconds", "call site"))
+        report_file.write(
+            "{:>8} {:>12.3f} {}\n".format(
+                sum(self.calls.values()), sum(self.durations.values()), "<total>"
+            )
+        )
+        for call_site, duration in sorted(
+            self.durations.items(), key=lambda item: item[1], reverse=True
+        ):
+            report_file.write(
+                "{:>8} {:>12.3f} {}\n".format(self.calls[call_site], duration, call_site)
+            )
+
+
+def _attach_report(task, name, file_name, writer):
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        report_path = os.path.join(temp_dir, file_name)
+        with open(report_path, "w") as report_file:
+            writer(report_file)
+        artifact = Artifact.init_and_validate(report_path)
+        try:
+            artifact.save()
+        except IntegrityError:
+            artifact = Artifact.objects.get(sha256=artifact.sha256)
+    task.profile_artifacts.add(artifact, through_defaults={"name": name})
+
+
+def profiled_task(task_func):
+    """
+    Decorate a task function, to profile it if profiling_requested() for the current task.
+
+    The call stacks of the task process are sampled every APT_TASK_PROFILING_INTERVAL seconds, and
+    the database queries are counted and timed by call site. Both reports are attached to the task
+    as profile artifacts, even if the task fails. Worker processes started by the task are not
+    profiled.
+    """
+
+    @functools.wraps(task_func)
+    def wrapper(*args, **kwargs):
+        task = Task.current()
+        if not profiling_requested(task):
+            return task_func(*args, **kwargs)
+
+        sampler = StackSampler(settings.APT_TASK_PROFILING_INTERVAL)
+        recorder = QueryRecorder()
+        sampler.start()
+        recorder.start()
+        try:
+            return task_func(*args, **kwargs)
+        finally:
+            recorder.stop()
+            sampler.stop()
+            if task is not None:
+                # Never let the profile reports mask the outcome of the task itself.
+                try:
+                    _attach_report(task, STACK_SAMPLES_NAME, "stacks.folded", sampler.write_report)
+                    _attach_report(task, DB_QUERIES_NAME, "db_queries.txt", recorder.write_report)
+                except Exception as e:
+                    log.warning(_("Unable to attach the profile of task {}: {}").format(task.pk, e))
+                else:
+                    log.info(_("Attached the profile of task {} to it.").format(task.pk))
+
+    return wrapper
@@ -20,7 +20,9 @@ from .content_serializers import (
 )
 
 from .publication_serializers import (
+    AptDistributionResignSerializer,
     AptDistributionSerializer,
+    AptPublicationResignSerializer,
     AptPublicationSerializer,
     VerbatimPublicationSerializer,
 )
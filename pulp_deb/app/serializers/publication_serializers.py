@@ -58,6 +58,50 @@ class AptPublicationSerializer(PublicationSerializer):
         help_text="Whether or not to publish Legacy per-component-and-architecture Release files.",
         default=False,
     )
+    incremental = BooleanField(
+        help_text="Reuse the index files of the latest publication of the repository with the "
+        "same simple, structured and layout options, for all distribution, component and "
+        "architecture combinations without any changed content.",
+        default=False,
+        write_only=True,
+    )
+    hybrid_format = BooleanField(
+        help_text="Publish architecture 'all' packages in the Packages files of all architectures, "
+        "besides binary-all, and mark the Release files with "
+        "'No-Support-for-Architecture-all: Packages'. This supports clients lacking support for "
+        "binary-all indices, at the cost of larger index files.",
+        default=False,
+    )
+    publish_contents = BooleanField(
+        help_text="Whether or not to publish Contents-<arch> indices of the files in the packages. "
+        "Packages, that are neither downloaded nor listed in an earlier publication, are left out.",
+        default=False,
+    )
+    publish_translations = BooleanField(
+        help_text="Whether or not to only publish the short descriptions of packages in the Packages "
+        "files, and their long descriptions in i18n/Translation-en files.",
+        default=False,
+    )
+    publish_pdiffs = BooleanField(
+        help_text="Whether or not to publish Packages.diff directories with patches from the "
+        "Packages files of the latest publications of the repository, so APT clients can update "
+        "their package lists by downloading small diffs.",
+        default=False,
+    )
+    distributions = serializers.ListField(
+        child=serializers.CharField(),
+        help_text="Only publish these distributions of the repository version, instead of all of "
+        "them. The distribution of simple mode is called 'default'.",
+        required=False,
+        allow_null=True,
+        allow_empty=False,
+    )
+    overlay = BooleanField(
+        help_text="Also publish all other distributions of the latest publication of the "
+        "repository with the same simple, structured, layout and hybrid_format options, by "
+        "reference to its files. Requires distributions.",
+        default=False,
+    )
 
     def validate(self, data):
         """
@@ -66,6 +110,8 @@ class AptPublicationSerializer(PublicationSerializer):
         data = super().validate(data)
         if not data["simple"] and not data["structured"]:
             raise ValidationError("one of simple or structured publishing mode must be selected")
+        if data["overlay"] and not data.get("distributions"):
+            raise ValidationError("overlay requires a list of distributions to publish")
         return data
 
     class Meta:
@@ -77,10 +123,43 @@ class AptPublicationSerializer(PublicationSerializer):
             "publish_upstream_release_fields",
             "publish_legacy_release_files",
             "layout",
+            "incremental",
+            "hybrid_format",
+            "publish_contents",
+            "publish_translations",
+            "publish_pdiffs",
+            "distributions",
+            "overlay",
         )
         model = AptPublication
 
 
+class AptPublicationResignSerializer(serializers.Serializer):
+    """
+    A Serializer for re-signing the Release files of an AptPublication.
+    """
+
+    signing_service = RelatedField(
+        help_text="Sign the Release files with this signing service.",
+        many=False,
+        queryset=AptReleaseSigningService.objects.all(),
+        view_name="signing-services-detail",
+    )
+
+
+class AptDistributionResignSerializer(AptPublicationResignSerializer):
+    """
+    A Serializer for re-signing the Release files of the publications served by AptDistributions.
+    """
+
+    distributions = DetailRelatedField(
+        help_text="Re-sign the publications served by these distributions.",
+        many=True,
+        view_name_pattern=r"distributions(-.*/.*)-detail",
+        queryset=AptDistribution.objects.all(),
+    )
+
+
 class AptDistributionSerializer(DistributionSerializer):
     """
     Serializer for AptDistributions.
@@ -68,6 +68,29 @@ class AptRemoteSerializer(RemoteSerializer):
         required=False,
     )
 
+    languages = CharField(
+        help_text="Whitespace separated list of languages for which to sync translation files.\n"
+        'Translation files ("i18n/Translation-<language>") are not synchronized unless at least '
+        'one language is given here. Most users will only want "en", which holds the long '
+        "package descriptions of repositories that split them from the package indices.",
+        required=False,
+        allow_null=True,
+    )
+
+    translation_single_compression = BooleanField(
+        help_text="Only sync a single file per translation instead of every compressed variant "
+        "listed in the Release file. The most strongly compressed variant available is used.",
+        required=False,
+    )
+
+    adaptive_download_concurrency = BooleanField(
+        help_text="Adapt the download concurrency during syncs, starting from "
+        "'download_concurrency'. The concurrency is raised while the download throughput "
+        "improves, and lowered when the upstream server responds with HTTP 429 or 5xx errors, or "
+        "its response times rise. It never exceeds the ADAPTIVE_DOWNLOAD_CONCURRENCY_MAX setting.",
+        required=False,
+    )
+
     policy = ChoiceField(
         help_text="The policy to use when downloading content. The possible values include: "
         "'immediate', 'on_demand', and 'streamed'. 'immediate' is the default.",
@@ -85,6 +108,9 @@ class AptRemoteSerializer(RemoteSerializer):
             "sync_installer",
             "gpgkey",
             "ignore_missing_package_indices",
+            "languages",
+            "translation_single_compression",
+            "adaptive_download_concurrency",
         )
         model = AptRemote
 
@@ -5,7 +5,16 @@ Check `Plugin Writer's Guide`_ for more details.
     http://docs.pulpproject.org/en/3.0/nightly/plugins/plugin-writer/index.html
 """
 
+ADAPTIVE_DOWNLOAD_CONCURRENCY_MAX = 100
 APT_BY_HASH = False
+APT_INDEX_COMPRESSION_FORMATS = ["gz"]
+APT_INDEX_COMPRESSION_THREADS = 0
+APT_PDIFF_HISTORY = 14
+APT_PERSISTENT_SIGNING_SERVICES = []
+APT_PERSISTENT_SIGNING_WORKERS = 2
+APT_REUSE_IDENTICAL_PUBLICATIONS = False
+APT_TASK_PROFILING = False
+APT_TASK_PROFILING_INTERVAL = 0.005
 FORBIDDEN_CHECKSUM_WARNINGS = True
 FORCE_IGNORE_MISSING_PACKAGE_INDICES = False
 PERMISSIVE_SYNC = False
@@ -14,3 +23,5 @@ STRUCTURED_EMPTY_REPO_DISTRIBUTION = "default"
 STRUCTURED_EMPTY_REPO_COMPONENT = "empty"
 STRUCTURED_EMPTY_REPO_ARCHITECTURES = ["all"]
 MAX_PACKAGE_SIGNING_WORKERS = 5
+MAX_PUBLISH_WORKER_PROCESSES = 1
+PACKAGE_PARAGRAPH_CACHE_MAX_ENTRIES = 0
@@ -0,0 +1,177 @@
+"""Helpers for signing many files per process of a persistent signing service script."""
+
+import asyncio
+import json
+import os
+import tempfile
+from gettext import gettext as _
+
+from django.conf import settings
+from django_guid import get_guid
+
+# The environment variable telling a signing service script to run as a persistent helper:
+SIGNING_SESSION_ENV_VAR = "PULP_SIGNING_SESSION"
+
+
+def uses_signing_sessions(signing_service):
+    """
+    Return whether the signing service is configured in APT_PERSISTENT_SIGNING_SERVICES.
+    """
+    return signing_service.name in settings.APT_PERSISTENT_SIGNING_SERVICES
+
+
+def signing_session_env(signing_service):
+    """
+    Return the environment of a persistent helper of signing_service.
+
+    It holds the same variables SigningService.sign() passes to the script, and PULP_SIGNING_SESSION.
+    """
+    return {
+        **os.environ,
+        "PULP_SIGNING_KEY_FINGERPRINT": signing_service.pubkey_fingerprint,
+        "CORRELATION_ID": get_guid() or "",
+        SIGNING_SESSION_ENV_VAR: "1",
+    }
+
+
+class SigningSession:
+    """
+    A persistent helper process of a signing service script, which signs one file at a time.
+
+    The script is started without arguments and with PULP_SIGNING_SESSION=1 set. For every file to
+    sign, it reads a request line holding the JSON object {"file": <path>, "env": <env vars>} from
+    stdin, and writes a response line to stdout. The response holds the same JSON dict the script
+    returns when signing a single file, or {"error": <message>} if signing the file failed. The
+    script must exit once stdin is closed.
+    """
+
+    def __init__(self, signing_service):
+        self.signing_service = signing_service
+        self.process = None
+        self.stderr = None
+
+    async def start(self):
+        """
+        Start the helper process.
+        """
+        # The helper's stderr is only read if it fails, so it must not fill up a pipe meanwhile.
+        self.stderr = tempfile.TemporaryFile()
+        self.process = await asyncio.create_subprocess_exec(
+            self.signing_service.script,
+            env=signing_session_env(self.signing_service),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=self.stderr,
+        )
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def sign(self, filename, env_vars=None):
+        """
+        Sign the file filename, passing env_vars to the helper along with the request.
+
+        Raises:
+            RuntimeError: If the helper failed to sign the file or did not return valid JSON.
+
+        Returns:
+            The dict returned by the helper.
+        """
+        request = json.dumps({"file": filename, "env": env_vars or {}}) + "\n"
+        try:
+            self.process.stdin.write(request.encode("utf-8"))
+            await self.process.stdin.drain()
+            response = await self.process.stdout.readline()
+        except ConnectionError:
+            response = b""
+        if not response:
+            await self.process.wait()
+            raise RuntimeError(
+                _("The signing service helper exited with code {}: {}").format(
+                    self.process.returncode, self._read_stderr()
+                )
+            )
+
+        try:
+            return_value = json.loads(response)
+        except json.JSONDecodeError:
+            raise RuntimeError(_("The signing service helper did not return valid JSON!"))
+        if not isinstance(return_value, dict):
+            raise RuntimeError(_("The signing service helper did not return a JSON object!"))
+        if "error" in return_value:
+            raise RuntimeError(
+                _("The signing service helper failed to sign '{}': {}").format(
+                    filename, return_value["error"]
+                )
+            )
+        return return_value
+
+    async def close(self):
+        """
+        Close the helper's stdin and wait for it to exit.
+        """
+        if self.alive:
+            self.process.stdin.close()
+            await self.process.wait()
+        self.stderr.close()
+
+    def _read_stderr(self):
+        self.stderr.seek(0)
+        return self.stderr.read().decode("utf-8", "replace").strip()
+
+
+class SigningSessionPool:
+    """
+    Signs files with the signing services they belong to, to be used as an async context manager.
+
+    Signing services configured in APT_PERSISTENT_SIGNING_SERVICES get up to
+    APT_PERSISTENT_SIGNING_WORKERS helper processes each, which are started on demand and stay
+    alive until the pool is closed. Each helper signs one file at a time, so further files wait
+    for an idle helper. All other signing services run their script once per file, as usual.
+    """
+
+    def __init__(self, max_sessions=None):
+        self.max_sessions = max(max_sessions or settings.APT_PERSISTENT_SIGNING_WORKERS, 1)
+        self.sessions = []
+        # The semaphore limiting the concurrent requests and the idle sessions, by signing service:
+        self.semaphores = {}
+        self.idle_sessions = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def sign(self, signing_service, filename, env_vars=None):
+        """
+        Sign the file filename with signing_service, as its sign() method does.
+        """
+        if not uses_signing_sessions(signing_service):
+            return await signing_service.asign(filename, env_vars=env_vars)
+
+        semaphore = self.semaphores.setdefault(
+            signing_service.pk, asyncio.Semaphore(self.max_sessions)
+        )
+        idle_sessions = self.idle_sessions.setdefault(signing_service.pk, [])
+        async with semaphore:
+            if idle_sessions:
+                session = idle_sessions.pop()
+            else:
+                session = SigningSession(signing_service)
+                self.sessions.append(session)
+                await session.start()
+            try:
+                return await session.sign(filename, env_vars=env_vars)
+            finally:
+                # A helper that exited is replaced by a new one, when the next file is signed.
+                if session.alive:
+                    idle_sessions.append(session)
+
+    async def close(self):
+        """
+        Stop all helper processes.
+        """
+        sessions, self.sessions, self.idle_sessions = self.sessions, [], {}
+        await asyncio.gather(*[session.close() for session in sessions])
@@ -1,5 +1,5 @@
 # flake8: noqa
-from .publishing import publish, publish_verbatim
+from .publishing import publish, publish_verbatim, resign_distributions, resign_publication
 from .synchronizing import synchronize
 from .copy import copy_content
 from .signing import sign_and_create, signed_add_and_remove
@@ -15,6 +15,7 @@ from pulp_deb.app.models import (
     Release,
     ReleaseArchitecture,
 )
+from pulp_deb.app.profiling import profiled_task
 
 log = logging.getLogger(__name__)
 
@@ -67,6 +68,7 @@ def find_structured_publish_content(content, source_repo_version):
     return source_repo_version.content.filter(pk__in=combined_content_qs)
 
 
+@profiled_task
 @transaction.atomic
 def copy_content(config, structured, dependency_solving):
     """
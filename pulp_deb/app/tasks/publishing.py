@@ -1,31 +1,55 @@
 import asyncio
+import hashlib
+import json
 import logging
+import lzma
+import multiprocessing
 import os
 import random
 import shutil
 import string
+import subprocess
 import tempfile
-from contextlib import suppress
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext, suppress
 from datetime import datetime, timezone
 from gettext import gettext as _
-from gzip import GzipFile
+from gzip import GzipFile, compress
+from itertools import islice
 from pathlib import Path
 
+import django
 from debian import deb822
 from django.conf import settings
 from django.core.files import File
-from django.db import transaction
+from django.db import connection, connections, transaction
+from django.db.models import (
+    Case,
+    F,
+    Func,
+    Prefetch,
+    Q,
+    TextField,
+    UUIDField,
+    Value,
+    When,
+    prefetch_related_objects,
+)
+from django.db.models.functions import Coalesce, Collate, Concat, Left, Now
 from django.db.utils import IntegrityError
-from django.forms.models import model_to_dict
 
+from pulpcore.plugin import pulp_hashlib
 from pulpcore.plugin.models import (
     Artifact,
+    ContentArtifact,
     PublishedArtifact,
     PublishedMetadata,
     RemoteArtifact,
     RepositoryVersion,
 )
-from pulpcore.plugin.util import get_domain
+from pulpcore.plugin.util import get_domain, set_domain
 
 from pulp_deb.app.constants import (
     CHECKSUM_TYPE_MAP,
@@ -33,7 +57,19 @@ from pulp_deb.app.constants import (
     NO_MD5_WARNING_MESSAGE,
     NULL_VALUE,
 )
+from pulp_deb.app.contents_index import (
+    PackageFileListCache,
+    contents_location,
+    write_contents_index,
+)
+from pulp_deb.app.index_diffs import (
+    DIFF_INDEX_CHECKSUMS,
+    StanzaDigests,
+    ed_diff,
+    render_diff_index,
+)
 from pulp_deb.app.models import (
+    AptDistribution,
     AptPublication,
     AptReleaseSigningService,
     AptRepository,
@@ -46,13 +82,47 @@ from pulp_deb.app.models import (
     SourcePackageReleaseComponent,
     VerbatimPublication,
 )
-from pulp_deb.app.serializers import (
-    DscFile822Serializer,
-    Package822Serializer,
+from pulp_deb.app.models.content.content import pool_filename
+from pulp_deb.app.package_index import (
+    PACKAGE_INDEX_VALUES,
+    PackageParagraphCache,
+    evict_package_paragraphs,
+    render_translation_paragraph,
+    split_description,
 )
+from pulp_deb.app.profiling import profiled_task
+from pulp_deb.app.serializers import DscFile822Serializer
+from pulp_deb.app.signing_sessions import SigningSessionPool
 
 log = logging.getLogger(__name__)
 
+# The fields sorting the paragraphs of Packages and Sources indices, before the pk as tiebreaker:
+PACKAGE_INDEX_ORDER = ("package", "version", "architecture", "sha256")
+SOURCE_INDEX_ORDER = ("source", "version")
+# The format of the timestamps in the names of PDiff patches:
+RELEASE_DATE_FORMAT = "%a, %d %b %Y %H:%M:%S %z"
+PDIFF_NAME_FORMAT = "%Y-%m-%d-%H%M.%S"
+
+# The number of (source) packages fetched and rendered per batch of artifact lookups:
+PACKAGE_INDEX_CHUNK_SIZE = 2000
+# The fields of Package rows, joined with their artifact:
+PACKAGE_ROW_VALUES = (
+    *PACKAGE_INDEX_VALUES,
+    "relative_path",
+    "contentartifact__pk",
+    "contentartifact__relative_path",
+    "contentartifact__artifact__md5",
+    "contentartifact__artifact__sha1",
+    "contentartifact__artifact__sha256",
+    "contentartifact__artifact__size",
+)
+# The fields of PackageReleaseComponent rows, joined with their package and its artifact:
+PACKAGE_RELEASE_COMPONENT_ROW_VALUES = (
+    *("package__" + field for field in PACKAGE_ROW_VALUES),
+    "index_architecture",
+)
+_ArtifactChecksums = namedtuple("_ArtifactChecksums", ("md5", "sha1", "sha256", "size"))
+
 
 def publish_verbatim(repository_version_pk):
     """
@@ -76,6 +146,7 @@ def publish_verbatim(repository_version_pk):
     log.info(_("Publication (verbatim): {publication} created").format(publication=publication.pk))
 
 
+@profiled_task
 def publish(
     repository_version_pk,
     simple,
@@ -85,6 +156,13 @@ def publish(
     publish_upstream_release_fields=None,
     layout=LAYOUT_TYPES.NESTED_ALPHABETICALLY,
     publish_legacy_release_files=False,
+    incremental=False,
+    hybrid_format=False,
+    publish_contents=False,
+    publish_translations=False,
+    publish_pdiffs=False,
+    distributions=None,
+    overlay=False,
 ):
     """
     Use provided publisher to create a Publication based on a RepositoryVersion.
@@ -97,6 +175,21 @@ def publish(
         signing_service_pk (str): Use this SigningService to sign the Release files.
         layout (str): The layout determines the form the package urls take.
         publish_legacy_release_files (bool): publish legacy per architecture release files
+        incremental (bool): Reuse the index files of the latest publication with the same options
+            for all (distribution, component, architecture) combinations that did not change.
+        hybrid_format (bool): Also list architecture "all" packages in the Packages files of all
+            other architectures, and mark the Release files with
+            "No-Support-for-Architecture-all: Packages".
+        publish_contents (bool): Publish Contents-<arch> indices of the files in the packages.
+        publish_translations (bool): Only publish the short descriptions of packages in the
+            Packages files, and their long descriptions in i18n/Translation-en files.
+        publish_pdiffs (bool): Publish Packages.diff directories with patches from the Packages
+            files of the latest APT_PDIFF_HISTORY publications of the repository.
+        distributions (list): Only publish these distributions, instead of all distributions of the
+            repository version. The distribution of simple mode is called "default".
+        overlay (bool): Also publish all other distributions of the latest publication with the
+            same simple, structured, layout and hybrid_format options, by reference to its files.
+
 
     """
 
@@ -119,6 +212,65 @@ def publish(
             publish_legacy_release_files=publish_legacy_release_files,
         )
     )
+    repository = AptRepository.objects.get(pk=repo_version.repository.pk)
+    overlay_publication = (
+        _latest_publication(
+            repository,
+            simple,
+            structured,
+            layout,
+            hybrid_format,
+            publish_contents,
+            publish_translations,
+        )
+        if overlay
+        else None
+    )
+    fingerprint = _publication_fingerprint(
+        repo_version,
+        repository,
+        simple=simple,
+        structured=structured,
+        signing_service=signing_service,
+        publish_upstream_release_fields=publish_upstream_release_fields,
+        layout=layout,
+        publish_legacy_release_files=publish_legacy_release_files,
+        hybrid_format=hybrid_format,
+        publish_contents=publish_contents,
+        publish_translations=publish_translations,
+        publish_pdiffs=publish_pdiffs,
+        distributions=sorted(distributions) if distributions is not None else None,
+        overlay=str(overlay_publication.pk) if overlay_publication else None,
+    )
+    identical_publication = (
+        _identical_publication(repository, fingerprint)
+        if settings.APT_REUSE_IDENTICAL_PUBLICATIONS and not checkpoint
+        else None
+    )
+    if identical_publication:
+        with AptPublication.create(repo_version, pass_through=False) as publication:
+            publication.simple = simple
+            publication.structured = structured
+            publication.signing_service = signing_service
+            publication.publish_legacy_release_files = publish_legacy_release_files
+            publication.layout = layout
+            publication.hybrid_format = hybrid_format
+            publication.publish_contents = publish_contents
+            publication.publish_translations = publish_translations
+            publication.publish_pdiffs = publish_pdiffs
+            publication.distributions = distributions
+            publication.overlay = overlay
+            publication.fingerprint = fingerprint
+            publication.artifact_state = identical_publication.artifact_state
+            _clone_publication(identical_publication, publication)
+        log.info(
+            _("Publication: {publication} created from identical publication {other}").format(
+                publication=publication.pk, other=identical_publication.pk
+            )
+        )
+        return
+
+    artifact_state = _artifact_state(repo_version)
     with tempfile.TemporaryDirectory(".") as temp_dir:
         with AptPublication.create(
             repo_version, pass_through=False, checkpoint=checkpoint
@@ -128,9 +280,30 @@ def publish(
             publication.signing_service = signing_service
             publication.publish_legacy_release_files = publish_legacy_release_files
             publication.layout = layout
-            repository = AptRepository.objects.get(pk=repo_version.repository.pk)
+            publication.hybrid_format = hybrid_format
+            publication.publish_contents = publish_contents
+            publication.publish_translations = publish_translations
+            publication.publish_pdiffs = publish_pdiffs
+            publication.distributions = distributions
+            publication.overlay = overlay
+            publication.fingerprint = fingerprint
+            publication.artifact_state = artifact_state
+            previous_publication = (
+                _PreviousPublication.find(
+                    repo_version,
+                    artifact_state,
+                    simple,
+                    structured,
+                    layout,
+                    hybrid_format,
+                    publish_contents,
+                    publish_translations,
+                )
+                if incremental
+                else None
+            )
 
-            if simple:
+            if simple and (distributions is None or "default" in distributions):
                 release = Release(
                     distribution="default",
                     codename="default",
@@ -157,20 +330,19 @@ def publish(
                     architectures=architectures,
                     temp_dir=temp_dir,
                     signing_service=repository.signing_service,
+                    previous_publication=previous_publication,
                 )
 
-                packages = Package.objects.filter(
-                    pk__in=repo_version.content.order_by("-pulp_created")
-                ).prefetch_related("contentartifact_set", "_artifacts")
-                artifact_dict, remote_artifact_dict = _batch_fetch_artifacts(packages)
                 release_helper.components[component].add_packages(
-                    packages, artifact_dict, remote_artifact_dict
+                    Package.objects.filter(pk__in=repo_version.content)
                 )
 
-                source_packages = SourcePackage.objects.filter(
-                    pk__in=repo_version.content.order_by("-pulp_created"),
+                source_packages = SourcePackage.objects.filter(pk__in=repo_version.content)
+                release_helper.components[component].add_source_packages(
+                    source_packages.order_by(*_index_order(SOURCE_INDEX_ORDER)).iterator(
+                        chunk_size=PACKAGE_INDEX_CHUNK_SIZE
+                    )
                 )
-                release_helper.components[component].add_source_packages(source_packages)
 
                 release_helper.finish()
 
@@ -179,20 +351,36 @@ def publish(
                     pk__in=repo_version.content.order_by("-pulp_created")
                 )
 
-                distributions = list(
+                release_distributions = list(
                     release_components.distinct("distribution").values_list(
                         "distribution", flat=True
                     )
                 )
-                has_structured_distribution = bool(distributions)
+                has_structured_distribution = bool(release_distributions)
 
-                if simple and "default" in distributions:
+                if simple and "default" in release_distributions:
                     message = (
                         'Ignoring structured "default" distribution for publication that also '
                         "uses simple mode."
                     )
                     log.warning(_(message))
-                    distributions.remove("default")
+                    release_distributions.remove("default")
+
+                if distributions is not None:
+                    missing = set(distributions) - set(release_distributions)
+                    if simple:
+                        missing.discard("default")
+                    if missing:
+                        log.warning(
+                            _("Distributions not found in the repository version: {}").format(
+                                ", ".join(sorted(missing))
+                            )
+                        )
+                    release_distributions = [
+                        distribution
+                        for distribution in release_distributions
+                        if distribution in distributions
+                    ]
 
                 release_helpers = []
 
@@ -229,128 +417,535 @@ def publish(
                     release_helpers.append(release_helper)
 
                 else:
-                    for distribution in distributions:
-                        release_arch_qs = ReleaseArchitecture.objects.filter(
-                            pk__in=repo_version.content.order_by("-pulp_created"),
-                            distribution=distribution,
-                        )
-                        architectures = list(
-                            release_arch_qs.distinct("architecture").values_list(
-                                "architecture", flat=True
-                            )
-                        )
-                        if "all" not in architectures:
-                            architectures.append("all")
-
-                        release = Release.objects.filter(
-                            pk__in=repo_version.content.order_by("-pulp_created"),
-                            distribution=distribution,
-                        ).first()
-                        publish_upstream = (
-                            publish_upstream_release_fields
-                            if publish_upstream_release_fields is not None
-                            else repository.publish_upstream_release_fields
-                        )
-                        if not release:
-                            codename = distribution.strip("/").split("/")[0]
-                            release = Release(
+                    with _publish_process_pool() or nullcontext() as process_pool:
+                        pending_jobs = []
+                        for distribution in release_distributions:
+                            release_arch_qs = ReleaseArchitecture.objects.filter(
+                                pk__in=repo_version.content.order_by("-pulp_created"),
                                 distribution=distribution,
-                                codename=codename,
-                                suite=codename,
-                                origin="Pulp 3",
                             )
-                            if repository.description:
-                                release.description = repository.description
-                        elif not publish_upstream:
-                            release = Release(
-                                distribution=release.distribution,
-                                codename=release.codename,
-                                suite=release.suite,
-                                origin="Pulp 3",
-                            )
-                            if repository.description:
-                                release.description = repository.description
-
-                        release_components_filtered = release_components.filter(
-                            distribution=distribution
-                        )
-                        components = list(
-                            release_components_filtered.distinct("component").values_list(
-                                "component", flat=True
+                            architectures = list(
+                                release_arch_qs.distinct("architecture").values_list(
+                                    "architecture", flat=True
+                                )
                             )
-                        )
-
-                        signing_service = repository.release_signing_service(release)
+                            if "all" not in architectures:
+                                architectures.append("all")
 
-                        release_helper = _ReleaseHelper(
-                            publication=publication,
-                            components=components,
-                            architectures=architectures,
-                            release=release,
-                            temp_dir=temp_dir,
-                            signing_service=signing_service,
-                        )
-
-                        package_release_components = PackageReleaseComponent.objects.filter(
-                            pk__in=repo_version.content.order_by("-pulp_created"),
-                            release_component__in=release_components_filtered,
-                        ).select_related("release_component", "package")
-
-                        source_package_release_components = (
-                            SourcePackageReleaseComponent.objects.filter(
+                            release = Release.objects.filter(
                                 pk__in=repo_version.content.order_by("-pulp_created"),
-                                release_component__in=release_components_filtered,
-                            ).select_related("release_component", "source_package")
-                        )
+                                distribution=distribution,
+                            ).first()
+                            publish_upstream = (
+                                publish_upstream_release_fields
+                                if publish_upstream_release_fields is not None
+                                else repository.publish_upstream_release_fields
+                            )
+                            if not release:
+                                codename = distribution.strip("/").split("/")[0]
+                                release = Release(
+                                    distribution=distribution,
+                                    codename=codename,
+                                    suite=codename,
+                                    origin="Pulp 3",
+                                )
+                                if repository.description:
+                                    release.description = repository.description
+                            elif not publish_upstream:
+                                release = Release(
+                                    distribution=release.distribution,
+                                    codename=release.codename,
+                                    suite=release.suite,
+                                    origin="Pulp 3",
+                                )
+                                if repository.description:
+                                    release.description = repository.description
 
-                        for component in components:
-                            prcs_for_component = [
-                                prc
-                                for prc in package_release_components
-                                if prc.release_component.component == component
-                            ]
-                            packages = Package.objects.filter(
-                                pk__in=[prc.package.pk for prc in prcs_for_component]
-                            ).prefetch_related("contentartifact_set", "_artifacts")
-                            artifact_dict, remote_artifact_dict = _batch_fetch_artifacts(packages)
-
-                            pkg_by_pk = {package.pk: package for package in packages}
-                            package_pairs = [
-                                (
-                                    pkg_by_pk[prc.package.pk],
-                                    prc.index_architecture
-                                    or pkg_by_pk[prc.package.pk].architecture,
+                            release_components_filtered = release_components.filter(
+                                distribution=distribution
+                            )
+                            components = list(
+                                release_components_filtered.distinct("component").values_list(
+                                    "component", flat=True
                                 )
-                                for prc in prcs_for_component
-                                if prc.package.pk in pkg_by_pk
-                            ]
-                            release_helper.components[component].add_packages(
-                                package_pairs,
-                                artifact_dict,
-                                remote_artifact_dict,
                             )
 
-                            source_packages = [
-                                drc.source_package
-                                for drc in source_package_release_components
-                                if drc.release_component.component == component
-                            ]
-                            release_helper.components[component].add_source_packages(
-                                source_packages
+                            signing_service = repository.release_signing_service(release)
+
+                            release_helper = _ReleaseHelper(
+                                publication=publication,
+                                components=components,
+                                architectures=architectures,
+                                release=release,
+                                temp_dir=temp_dir,
+                                signing_service=signing_service,
+                                previous_publication=previous_publication,
                             )
 
-                        release_helper.save_unsigned_metadata()
-                        release_helpers.append(release_helper)
+                            for component in components:
+                                component_release_components = release_components_filtered.filter(
+                                    component=component
+                                )
+                                prcs_for_component, sprcs_for_component = _component_content(
+                                    repo_version, component_release_components
+                                )
+                                component_helper = release_helper.components[component]
+                                if component_helper.reuses_all_indices:
+                                    for content_pks in (
+                                        prcs_for_component.values("package_id"),
+                                        sprcs_for_component.values("source_package_id"),
+                                    ):
+                                        previous_publication.copy_published_artifacts(
+                                            publication, component, content_pks
+                                        )
+                                elif process_pool:
+                                    if _insert_select_supported():
+                                        component_helper.insert_package_published_artifacts(
+                                            Package.objects.filter(
+                                                pk__in=prcs_for_component.values("package_id")
+                                            )
+                                        )
+                                    job = _ComponentJob(
+                                        component_helper,
+                                        repo_version.pk,
+                                        list(
+                                            component_release_components.values_list(
+                                                "pk", flat=True
+                                            )
+                                        ),
+                                    )
+                                    pending_jobs.append(
+                                        (component_helper, process_pool.submit(job))
+                                    )
+                                else:
+                                    component_helper.add_package_release_components(
+                                        prcs_for_component
+                                    )
+                                    component_helper.add_source_package_release_components(
+                                        sprcs_for_component
+                                    )
+
+                            if not process_pool:
+                                release_helper.save_unsigned_metadata()
+                            release_helpers.append(release_helper)
+
+                        # Create the PublishedArtifacts of the components rendered by worker processes
+                        for component_helper, future in pending_jobs:
+                            (
+                                published_artifacts,
+                                paragraph_cache,
+                                file_list_cache,
+                                written_indices,
+                            ) = future.result()
+                            component_helper.create_published_artifacts(published_artifacts)
+                            paragraph_cache.save()
+                            file_list_cache.save()
+                            component_helper.written_indices = written_indices
+                        if process_pool:
+                            for release_helper in release_helpers:
+                                release_helper.save_unsigned_metadata()
 
                 asyncio.run(_concurrently_sign_metadata(release_helpers))
                 for release_helper in release_helpers:
                     release_helper.save_signed_metadata()
 
+            if overlay_publication:
+                _overlay_publication(overlay_publication, publication)
+            elif overlay:
+                log.info(_("No previous publication to overlay."))
+
+    evict_package_paragraphs()
     log.info(_("Publication: {publication} created").format(publication=publication.pk))
 
 
+def resign_publication(publication_pk, signing_service_pk):
+    """
+    Create a copy of an AptPublication with newly signed Release files.
+
+    The index files and packages are published by reference to the files of the existing
+    publication. Only the Date field of the Release files is updated before they are signed.
+
+    Args:
+        publication_pk (str): Re-sign the Release files of this AptPublication.
+        signing_service_pk (str): Use this SigningService to sign the Release files.
+    """
+    source = AptPublication.objects.get(pk=publication_pk)
+    signing_service = AptReleaseSigningService.objects.get(pk=signing_service_pk)
+    _resign_publication(source, signing_service)
+
+
+def resign_distributions(distribution_pks, signing_service_pk):
+    """
+    Re-sign the AptPublications currently served by AptDistributions.
+
+    Distributions serving a publication explicitly are updated to serve its re-signed copy, while
+    distributions serving the latest publication of a repository (version) serve it as is. Every
+    publication is re-signed once, even if it is served by several distributions.
+
+    Args:
+        distribution_pks (list): Re-sign the publications served by these AptDistributions.
+        signing_service_pk (str): Use this SigningService to sign the Release files.
+    """
+    signing_service = AptReleaseSigningService.objects.get(pk=signing_service_pk)
+    resigned_publications = {}
+    for distribution in AptDistribution.objects.filter(pk__in=distribution_pks).order_by("name"):
+        if distribution.checkpoint:
+            log.warning(
+                _("Skipping checkpoint distribution '{}'.").format(distribution.name),
+            )
+            continue
+        source = distribution.get_repository_publication_and_version()[2]
+        if not isinstance(source, AptPublication):
+            log.warning(
+                _("Distribution '{}' serves no APT publication, skipping it.").format(
+                    distribution.name
+                )
+            )
+            continue
+        if source.pk not in resigned_publications:
+            resigned_publications[source.pk] = _resign_publication(source, signing_service)
+        if distribution.publication_id:
+            distribution.publication = resigned_publications[source.pk]
+            distribution.save()
+
+
+# The content types, whose artifacts determine their paragraphs in the Packages and Sources indices:
+INDEXED_CONTENT_TYPES = (Package.get_pulp_type(), SourcePackage.get_pulp_type())
+# The artifact states of repository versions are sums modulo:
+ARTIFACT_STATE_MODULUS = 2**256
+# Settings affecting the files of publications, besides the publish options:
+FINGERPRINT_SETTINGS = (
+    "ALLOWED_CONTENT_CHECKSUMS",
+    "APT_BY_HASH",
+    "APT_INDEX_COMPRESSION_FORMATS",
+    "STRUCTURED_EMPTY_REPO_ARCHITECTURES",
+    "STRUCTURED_EMPTY_REPO_COMPONENT",
+    "STRUCTURED_EMPTY_REPO_DISTRIBUTION",
+)
+
+
+def _publication_fingerprint(repo_version, repository, **options):
+    """
+    Return a digest of the content of repo_version and of everything else determining the files of
+    a publication of it with the given publish options.
+    """
+
+    def signing_key(signing_service):
+        return signing_service.pubkey_fingerprint if signing_service else None
+
+    hasher = hashlib.sha256()
+    for content_pk in (
+        repo_version.content.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=10000)
+    ):
+        hasher.update(content_pk.bytes)
+
+    if options["publish_upstream_release_fields"] is None:
+        options["publish_upstream_release_fields"] = repository.publish_upstream_release_fields
+    options["signing_service"] = signing_key(options["signing_service"])
+    options["repository_description"] = repository.description
+    options["repository_signing_service"] = signing_key(repository.signing_service)
+    options["release_signing_services"] = sorted(
+        (override.release_distribution, signing_key(override.signing_service))
+        for override in repository.signing_service_release_overrides.select_related(
+            "signing_service"
+        )
+    )
+    options["settings"] = {name: getattr(settings, name, None) for name in FINGERPRINT_SETTINGS}
+    hasher.update(json.dumps(options, sort_keys=True).encode())
+    return hasher.hexdigest()
+
+
+def _artifact_state_term(*values):
+    return int.from_bytes(hashlib.sha256(json.dumps(values).encode()).digest(), "big")
+
+
+def _artifact_state_sum(content):
+    """
+    Return the sum of the digests of the ContentArtifacts of the (source) packages in content.
+    """
+    return sum(
+        _artifact_state_term(
+            str(content_id), relative_path, str(artifact_id) if artifact_id else None
+        )
+        for content_id, relative_path, artifact_id in ContentArtifact.objects.filter(
+            content__in=content, content__pulp_type__in=INDEXED_CONTENT_TYPES
+        )
+        .values_list("content_id", "relative_path", "artifact_id")
+        .iterator(chunk_size=10000)
+    )
+
+
+def _artifact_state(repo_version):
+    """
+    Return the artifact state of repo_version, the sum of the digests of the ContentArtifacts of
+    all its (source) packages and of the settings affecting their index paragraphs.
+
+    Since it is a sum, the state of the content shared by two repository versions can be derived
+    from both their states, by subtracting the states of the content added or removed in between.
+    """
+    state = _artifact_state_term(
+        {name: getattr(settings, name, None) for name in FINGERPRINT_SETTINGS}
+    ) + _artifact_state_sum(repo_version.content)
+    return format(state % ARTIFACT_STATE_MODULUS, "x")
+
+
+def _unchanged_artifacts(publication, repo_version, artifact_state):
+    """
+    Whether the (source) packages, that repo_version shares with the repository version of
+    publication, still have the same artifacts, and the settings affecting their index paragraphs
+    are the same, given the artifact_state of repo_version.
+
+    Removed content, whose artifacts changed since publication, is counted as a change, too.
+    """
+    if publication.artifact_state is None:
+        return False
+    previous_version = publication.repository_version
+    shared_before = int(publication.artifact_state, 16) - _artifact_state_sum(
+        repo_version.removed(base_version=previous_version)
+    )
+    shared_now = int(artifact_state, 16) - _artifact_state_sum(
+        repo_version.added(base_version=previous_version)
+    )
+    return (shared_before - shared_now) % ARTIFACT_STATE_MODULUS == 0
+
+
+def _identical_publication(repository, fingerprint):
+    """
+    Return the latest complete publication of repository with the given fingerprint, or None.
+    """
+    return (
+        AptPublication.objects.filter(
+            repository_version__repository=repository, complete=True, fingerprint=fingerprint
+        )
+        .order_by("-pulp_created")
+        .first()
+    )
+
+
+def _clone_publication(source, publication, exclude_paths=()):
+    """
+    Add all files of the complete publication source to publication, without regenerating them.
+
+    Metadata files at exclude_paths are left out.
+    """
+    metadata = PublishedMetadata.objects.filter(publication=source)
+    for previous_metadata in metadata.exclude(relative_path__in=exclude_paths).prefetch_related(
+        "contentartifact_set__artifact"
+    ):
+        _add_published_metadata(
+            publication,
+            previous_metadata.relative_path,
+            previous_metadata.contentartifact_set.all()[0].artifact,
+        )
+    _copy_published_artifacts(
+        PublishedArtifact.objects.filter(publication=source).exclude(
+            content_artifact__content__in=metadata
+        ),
+        publication,
+    )
+
+
+def _copy_published_artifacts(published_artifacts, publication):
+    """
+    Add copies of the PublishedArtifacts of the queryset published_artifacts to publication.
+    """
+    if _insert_select_supported():
+        _insert_published_artifacts(
+            publication, published_artifacts, F("relative_path"), F("content_artifact_id")
+        )
+        return
+    rows = published_artifacts.values_list("relative_path", "content_artifact_id").iterator(
+        chunk_size=PACKAGE_INDEX_CHUNK_SIZE
+    )
+    for chunk in _chunks(rows, PACKAGE_INDEX_CHUNK_SIZE):
+        PublishedArtifact.objects.bulk_create(
+            [
+                PublishedArtifact(
+                    relative_path=relative_path,
+                    content_artifact_id=content_artifact_id,
+                    publication=publication,
+                )
+                for relative_path, content_artifact_id in chunk
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def _latest_publication(
+    repository,
+    simple,
+    structured,
+    layout,
+    hybrid_format=False,
+    publish_contents=False,
+    publish_translations=False,
+):
+    """
+    Return the latest complete publication of repository with identical index options, or None.
+    """
+    return (
+        AptPublication.objects.filter(
+            repository_version__repository=repository,
+            complete=True,
+            simple=simple,
+            structured=structured,
+            layout=layout,
+            hybrid_format=hybrid_format,
+            publish_contents=publish_contents,
+            publish_translations=publish_translations,
+        )
+        .select_related("repository_version")
+        .order_by("-pulp_created")
+        .first()
+    )
+
+
+def _dists_subfolder(distribution):
+    """
+    Return the folder below dists/ that distribution is published in.
+    """
+    return distribution.strip("/") if distribution != "/" else "flat-repo"
+
+
+def _distribution_release_files(publication):
+    """
+    Return the directory and the parsed Release file of every distribution of publication.
+    """
+    release_files = []
+    for metadata in PublishedMetadata.objects.filter(
+        publication=publication, relative_path__endswith="/Release"
+    ).prefetch_related("contentartifact_set__artifact"):
+        with metadata.contentartifact_set.all()[0].artifact.file.open("rb") as release_file:
+            release = deb822.Release(release_file)
+        # Legacy per component and architecture Release files have a Component field instead:
+        if "Components" in release:
+            release_files.append((os.path.dirname(metadata.relative_path), release))
+    return release_files
+
+
+def _release_dir(relative_path, release_dirs):
+    """
+    Return the innermost of the distribution directories release_dirs, that contains the file at
+    relative_path, or None.
+    """
+    return max(
+        (
+            release_dir
+            for release_dir in release_dirs
+            if relative_path.startswith(release_dir + "/")
+        ),
+        key=len,
+        default=None,
+    )
+
+
+def _overlay_publication(base, publication):
+    """
+    Add the distributions of the complete publication base, that are not published by publication
+    itself, to publication by reference to the files of base.
+
+    The files in the dists/ directories of these distributions and the pool files of their packages
+    are copied. Files of nested distributions, like "stable/updates" within "stable", belong to the
+    innermost one.
+    """
+    published_dirs = {
+        release_dir for release_dir, release in _distribution_release_files(publication)
+    }
+    base_dirs = {release_dir for release_dir, release in _distribution_release_files(base)}
+    overlay_dirs = base_dirs - published_dirs
+    if not overlay_dirs:
+        return
+    release_dirs = published_dirs | base_dirs
+
+    for metadata in PublishedMetadata.objects.filter(
+        publication=base, relative_path__startswith="dists/"
+    ).prefetch_related("contentartifact_set__artifact"):
+        if _release_dir(metadata.relative_path, release_dirs) in overlay_dirs:
+            _add_published_metadata(
+                publication,
+                metadata.relative_path,
+                metadata.contentartifact_set.all()[0].artifact,
+            )
+
+    base_content = base.repository_version.content
+    if base.simple and os.path.join("dists", "default") in overlay_dirs:
+        # The "default" distribution of simple mode lists all packages.
+        overlaid_content = Q(content_artifact__content__in=base_content)
+    else:
+        overlay_distributions = [
+            distribution
+            for distribution in ReleaseComponent.objects.filter(pk__in=base_content)
+            .distinct("distribution")
+            .values_list("distribution", flat=True)
+            if os.path.join("dists", _dists_subfolder(distribution)) in overlay_dirs
+        ]
+        overlaid_content = Q(
+            content_artifact__content__in=PackageReleaseComponent.objects.filter(
+                pk__in=base_content, release_component__distribution__in=overlay_distributions
+            ).values("package_id")
+        ) | Q(
+            content_artifact__content__in=SourcePackageReleaseComponent.objects.filter(
+                pk__in=base_content, release_component__distribution__in=overlay_distributions
+            ).values("source_package_id")
+        )
+    _copy_published_artifacts(
+        PublishedArtifact.objects.filter(overlaid_content, publication=base), publication
+    )
+    log.info(_("Overlaid {} distributions of publication {}.").format(len(overlay_dirs), base.pk))
+
+
+def _resign_publication(source, signing_service):
+    """
+    Return a new publication with the files of the complete publication source, whose Release files
+    are updated with the current date and signed with signing_service.
+
+    All other files are published by reference to the files of source.
+    """
+    release_files = _distribution_release_files(source)
+    with tempfile.TemporaryDirectory(".") as temp_dir:
+        with AptPublication.create(source.repository_version, pass_through=False) as publication:
+            publication.simple = source.simple
+            publication.structured = source.structured
+            publication.signing_service = signing_service
+            publication.layout = source.layout
+            publication.hybrid_format = source.hybrid_format
+            publication.publish_contents = source.publish_contents
+            publication.publish_translations = source.publish_translations
+            publication.publish_legacy_release_files = source.publish_legacy_release_files
+            publication.publish_pdiffs = source.publish_pdiffs
+            publication.distributions = source.distributions
+            publication.overlay = source.overlay
+            publication.artifact_state = source.artifact_state
+            _clone_publication(
+                source,
+                publication,
+                exclude_paths=[
+                    os.path.join(release_dir, file_name)
+                    for release_dir, release in release_files
+                    for file_name in ("Release", "InRelease", "Release.gpg")
+                ],
+            )
+            release_signers = [
+                _ResignedRelease(publication, release_dir, release, temp_dir, signing_service)
+                for release_dir, release in release_files
+            ]
+            for release_signer in release_signers:
+                release_signer.save_unsigned_metadata()
+            asyncio.run(_concurrently_sign_metadata(release_signers))
+            for release_signer in release_signers:
+                release_signer.save_signed_metadata()
+
+    log.info(
+        _("Publication: {publication} created by re-signing publication {other}").format(
+            publication=publication.pk, other=source.pk
+        )
+    )
+    return publication
+
+
 async def _concurrently_sign_metadata(release_helpers):
-    await asyncio.gather(*[x.sign_metadata() for x in release_helpers])
+    async with SigningSessionPool() as signing_sessions:
+        await asyncio.gather(*[x.sign_metadata(signing_sessions) for x in release_helpers])
 
 
 class _ComponentHelper:
@@ -358,9 +953,32 @@ class _ComponentHelper:
         self.parent = parent
         self.component = component
         self.plain_component = os.path.basename(component)
-        self.package_index_files = {}
-        self.source_index_file_info = None
+        self.package_index_paths = {}
+        self.source_index_path = None
+        self.index_files = {}
+        # The (size, digests) of all written index files by path, once they are closed:
+        self.written_indices = None
         self.release_file_paths = {}
+        # Index files reused from the previous publication, by index architecture, "source", or
+        # "i18n" for the Translation-en index:
+        self.reused_indices = {}
+        # Set to a list to collect the PublishedArtifacts instead of saving them:
+        self.published_artifacts = None
+        self.paragraph_cache = PackageParagraphCache(
+            component,
+            self.parent.publication.layout,
+            split_descriptions=self.parent.publication.publish_translations,
+        )
+        # The rows of a package are adjacent in the PACKAGE_INDEX_ORDER, so only the
+        # PublishedArtifacts and index entries of the current package are remembered, to skip
+        # duplicates:
+        self.seen_package_pk = None
+        self.seen_published_artifacts = set()
+        self.seen_package_index_entries = set()
+        # The Contents indices to write, and the (package pk, location) pairs they list:
+        self.contents_index_paths = {}
+        self.contents_packages = {}
+        self.file_list_cache = PackageFileListCache()
 
         for architecture in self.parent.architectures:
             package_index_path = os.path.join(
@@ -370,11 +988,16 @@ class _ComponentHelper:
                 "binary-{}".format(architecture),
                 "Packages",
             )
-            os.makedirs(os.path.dirname(package_index_path), exist_ok=True)
-            self.package_index_files[architecture] = (
-                open(package_index_path, "wb"),
-                package_index_path,
-            )
+            index_paths = [package_index_path]
+            if self.parent.publication.publish_contents:
+                index_paths.append(self.contents_index_path(architecture))
+            if self.parent.reuses_index(component, architecture, *index_paths):
+                self.reused_indices[architecture] = package_index_path
+            else:
+                self.package_index_paths[architecture] = package_index_path
+                if self.parent.publication.publish_contents:
+                    self.contents_index_paths[architecture] = self.contents_index_path(architecture)
+                    self.contents_packages[architecture] = []
 
             if self.parent.publication.publish_legacy_release_files:
                 self.release_file_paths[architecture] = _write_legacy_release_file(
@@ -389,106 +1012,330 @@ class _ComponentHelper:
             "source",
             "Sources",
         )
-        os.makedirs(os.path.dirname(source_index_path), exist_ok=True)
-        self.source_index_file_info = (
-            open(source_index_path, "wb"),
-            source_index_path,
+        if self.parent.reuses_index(component, "source", source_index_path):
+            self.reused_indices["source"] = source_index_path
+        else:
+            self.source_index_path = source_index_path
+
+        # The Translation-en index lists the packages of all architectures:
+        self.translation_index_path = None
+        # The description md5s of the current package name, which come first in the
+        # PACKAGE_INDEX_ORDER:
+        self.seen_translations_package = None
+        self.seen_translations = set()
+        if self.parent.publication.publish_translations:
+            translation_index_path = os.path.join(
+                "dists",
+                self.parent.dists_subfolder,
+                self.plain_component,
+                "i18n",
+                "Translation-en",
+            )
+            if not self.package_index_paths and self.parent.reuses_index(
+                component, "i18n", translation_index_path
+            ):
+                self.reused_indices["i18n"] = translation_index_path
+            else:
+                self.translation_index_path = translation_index_path
+
+    def contents_index_path(self, architecture):
+        return os.path.join(
+            "dists",
+            self.parent.dists_subfolder,
+            self.plain_component,
+            "Contents-{}".format(architecture),
         )
 
-    def add_packages(self, package_pairs, artifact_dict, remote_artifact_dict):
-        published_artifacts = []
+    @property
+    def reuses_all_indices(self):
+        """
+        Whether all index files of this component are reused from the previous publication.
+        """
+        return (
+            not self.package_index_paths
+            and self.source_index_path is None
+            and self.translation_index_path is None
+        )
 
-        normalized_pairs = []
-        for item in package_pairs:
-            if isinstance(item, tuple):
-                package, index_arch = item
-            else:
-                package = item
-                index_arch = package.architecture
-            normalized_pairs.append((package, index_arch))
+    def index_file(self, index_path):
+        """
+        Return the _IndexFile at index_path, opening it on first use.
+        """
+        if index_path not in self.index_files:
+            self.index_files[index_path] = _IndexFile(index_path)
+        return self.index_files[index_path]
 
-        packages = [p for (p, _idx) in normalized_pairs]
+    def close_indices(self):
+        """
+        Close and compress all index files, that are not reused from the previous publication.
+        """
+        for architecture, contents_index_path in self.contents_index_paths.items():
+            write_contents_index(
+                self.index_file(contents_index_path),
+                self.contents_packages.pop(architecture),
+                self.file_list_cache,
+            )
+        if self.published_artifacts is None:
+            self.file_list_cache.save()
+        index_paths = list(self.package_index_paths.values())
+        index_paths.extend(self.contents_index_paths.values())
+        if self.source_index_path is not None:
+            index_paths.append(self.source_index_path)
+        if self.translation_index_path is not None:
+            index_paths.append(self.translation_index_path)
+        self.written_indices = {}
+        for index_path in index_paths:
+            self.written_indices.update(self.index_file(index_path).close())
+
+    def save_published_artifacts(self, published_artifacts):
+        if self.published_artifacts is not None:
+            self.published_artifacts.extend(published_artifacts)
+            return
+        with transaction.atomic():
+            if published_artifacts:
+                PublishedArtifact.objects.bulk_create(published_artifacts, ignore_conflicts=True)
 
-        content_artifacts = {
-            package.pk: list(package.contentartifact_set.all()) for package in packages
-        }
-        layout = self.parent.publication.layout
-        seen_published_artifacts = set()
-        seen_package_index_entries = set()
+    def create_published_artifacts(self, published_artifacts):
+        """
+        Create the PublishedArtifacts rendered by a _ComponentJob.
+        """
+        self.save_published_artifacts(
+            [
+                PublishedArtifact(
+                    relative_path=relative_path,
+                    publication=self.parent.publication,
+                    content_artifact_id=content_artifact_id,
+                )
+                for relative_path, content_artifact_id in published_artifacts
+            ]
+        )
 
-        for package, index_arch in normalized_pairs:
-            content_artifact = content_artifacts.get(package.pk, [None])[0]
-            if content_artifact is None:
-                continue
-            upstream_basename = os.path.basename(content_artifact.relative_path)
-            primary_relpath = package.filename(
-                self.component, layout=layout, basename_override=upstream_basename
+    def add_package_release_components(self, package_release_components):
+        """
+        Add the packages of a QuerySet of PackageReleaseComponents to the component.
+
+        The packages are streamed from a single query in the PACKAGE_INDEX_ORDER, which also joins
+        their ContentArtifacts and Artifacts. On PostgreSQL, their PublishedArtifacts are created
+        by a single INSERT ... SELECT instead, see insert_package_published_artifacts().
+        """
+        in_database = _insert_select_supported()
+        if in_database and self.published_artifacts is None:
+            self.insert_package_published_artifacts(
+                Package.objects.filter(pk__in=package_release_components.values("package_id"))
             )
-            published_artifact_key = (content_artifact.pk, primary_relpath)
-            if published_artifact_key not in seen_published_artifacts:
-                seen_published_artifacts.add(published_artifact_key)
-                published_artifacts.append(
-                    PublishedArtifact(
-                        relative_path=primary_relpath,
-                        publication=self.parent.publication,
-                        content_artifact=content_artifact,
-                    )
-                )
+        rows = (
+            package_release_components.filter(package__contentartifact__isnull=False)
+            .order_by(*_index_order(PACKAGE_INDEX_ORDER, "package__"))
+            .values_list(*PACKAGE_RELEASE_COMPONENT_ROW_VALUES)
+            .iterator(chunk_size=PACKAGE_INDEX_CHUNK_SIZE)
+        )
+        self.add_package_rows(
+            (_package_release_component_row(values) for values in rows),
+            publish_artifacts=not in_database,
+        )
 
-            # In the NESTED_BY_BOTH layout, we want to _also_ publish the package under the
-            # alphabetical path but _not_ reference it in the repo metadata.
-            if layout == LAYOUT_TYPES.NESTED_BY_BOTH:
-                alt_relpath = package.filename(
-                    self.component,
-                    layout=LAYOUT_TYPES.NESTED_ALPHABETICALLY,
-                    basename_override=upstream_basename,
-                )
-                alt_published_artifact_key = (content_artifact.pk, alt_relpath)
-                if alt_published_artifact_key not in seen_published_artifacts:
-                    seen_published_artifacts.add(alt_published_artifact_key)
-                    published_artifacts.append(
-                        PublishedArtifact(
-                            relative_path=alt_relpath,
-                            publication=self.parent.publication,
-                            content_artifact=content_artifact,
-                        )
-                    )
+    def insert_package_published_artifacts(self, packages):
+        """
+        Create the PublishedArtifacts of a QuerySet of Packages in the database, computing their
+        pool paths server side.
+        """
+        layout = self.parent.publication.layout
+        _insert_package_published_artifacts(
+            self.parent.publication, packages, self.component, layout
+        )
+        # In the NESTED_BY_BOTH layout, packages are also published under the alphabetical path:
+        if layout == LAYOUT_TYPES.NESTED_BY_BOTH:
+            _insert_package_published_artifacts(
+                self.parent.publication,
+                packages,
+                self.component,
+                LAYOUT_TYPES.NESTED_ALPHABETICALLY,
+            )
 
-            metadata_arch = "all" if package.architecture == "all" else index_arch
-            package_index_entry = (package.pk, metadata_arch)
-            if package_index_entry in seen_package_index_entries:
-                continue
-            seen_package_index_entries.add(package_index_entry)
+    def add_packages(self, packages):
+        """
+        Add the packages of a QuerySet of Packages to the component, with their own architecture.
 
-            package_serializer = Package822Serializer(package, context={"request": None})
-            try:
-                package_serializer.to822(
-                    self.component,
-                    artifact_dict,
-                    remote_artifact_dict,
-                    layout=layout,
-                    basename_override=upstream_basename,
-                ).dump(self.package_index_files[metadata_arch][0])
-            except KeyError:
+        Like add_package_release_components(), the packages are streamed from a single query
+        joining their ContentArtifacts and Artifacts, so the memory used does not grow with the
+        number of packages.
+        """
+        in_database = _insert_select_supported()
+        if in_database and self.published_artifacts is None:
+            self.insert_package_published_artifacts(packages)
+        rows = (
+            packages.filter(contentartifact__isnull=False)
+            .order_by(*_index_order(PACKAGE_INDEX_ORDER))
+            .values_list(*PACKAGE_ROW_VALUES)
+            .iterator(chunk_size=PACKAGE_INDEX_CHUNK_SIZE)
+        )
+        self.add_package_rows(
+            (_package_row(values) for values in rows), publish_artifacts=not in_database
+        )
+
+    def add_package_rows(self, rows, publish_artifacts=True):
+        """
+        Add packages, given as rows of their PACKAGE_INDEX_VALUES, to the component.
+
+        Besides the PACKAGE_INDEX_VALUES and the "relative_path", each row has the
+        "index_architecture" of the package, its "content_artifact" as (pk, relative_path), and the
+        "artifact" providing its checksums. Rows without artifact are looked up in the
+        RemoteArtifacts. The rows are consumed in chunks of PACKAGE_INDEX_CHUNK_SIZE.
+
+        If publish_artifacts is False, the PublishedArtifacts of the packages are created elsewhere.
+        """
+        for chunk in _chunks(rows, PACKAGE_INDEX_CHUNK_SIZE):
+            remote_artifacts = _fetch_remote_artifacts(
+                [row["sha256"] for row in chunk if row["artifact"] is None]
+            )
+            self.paragraph_cache.load([row["pk"] for row in chunk])
+            published_artifacts = []
+            for row in chunk:
+                if row["artifact"] is None:
+                    row["artifact"] = remote_artifacts.get(row["sha256"])
+                self.add_package_row(row, published_artifacts if publish_artifacts else None)
+            self.save_published_artifacts(published_artifacts)
+        if self.published_artifacts is None:
+            self.paragraph_cache.save()
+
+    def add_package_row(self, package, published_artifacts):
+        package_pk = package["pk"]
+        if package_pk != self.seen_package_pk:
+            self.seen_package_pk = package_pk
+            self.seen_published_artifacts.clear()
+            self.seen_package_index_entries.clear()
+        upstream_basename = os.path.basename(package["content_artifact"][1])
+        if published_artifacts is not None:
+            self.add_package_published_artifacts(package, upstream_basename, published_artifacts)
+        if self.translation_index_path is not None:
+            self.add_translation(package)
+
+        architecture = package["architecture"]
+        if architecture == "all" and self.parent.publication.hybrid_format:
+            metadata_archs = self.parent.architectures
+        else:
+            metadata_archs = [
+                "all" if architecture == "all" else package["index_architecture"] or architecture
+            ]
+        paragraph = None
+        for metadata_arch in metadata_archs:
+            package_index_entry = (package_pk, metadata_arch)
+            if package_index_entry in self.seen_package_index_entries:
+                continue
+            self.seen_package_index_entries.add(package_index_entry)
+            if metadata_arch in self.reused_indices:
+                continue
+            if metadata_arch not in self.package_index_paths:
                 log.warning(
                     "Published package '%s' with index architecture '%s' was not added to "
                     "component '%s' in distribution '%s' because it lacks this architecture!",
-                    getattr(package, "relative_path", None) or getattr(package, "pk", None),
+                    package["relative_path"] or package_pk,
                     metadata_arch,
                     self.component,
                     self.parent.distribution,
                 )
-            else:
-                self.package_index_files[metadata_arch][0].write(b"\n")
+                continue
+            if paragraph is None:
+                paragraph = self.paragraph_cache.render(
+                    package, package["artifact"], upstream_basename
+                )
+            self.index_file(self.package_index_paths[metadata_arch]).write(paragraph + b"\n")
+            if metadata_arch in self.contents_packages:
+                self.contents_packages[metadata_arch].append(
+                    (package_pk, contents_location(package["section"], package["package"]))
+                )
 
-        with transaction.atomic():
-            if published_artifacts:
-                PublishedArtifact.objects.bulk_create(published_artifacts, ignore_conflicts=True)
+    def add_translation(self, package):
+        """
+        Add the long description of the package to the Translation-en index, unless it has none.
+        """
+        translation = split_description(package)[1]
+        if translation is None:
+            return
+        md5, description = translation
+        if package["package"] != self.seen_translations_package:
+            self.seen_translations_package = package["package"]
+            self.seen_translations.clear()
+        if md5 in self.seen_translations:
+            return
+        self.seen_translations.add(md5)
+        self.index_file(self.translation_index_path).write(
+            render_translation_paragraph(package["package"], md5, description) + b"\n"
+        )
+
+    def add_package_published_artifacts(self, package, upstream_basename, published_artifacts):
+        """
+        Append the PublishedArtifacts of the package in the pool directory to published_artifacts.
+        """
+        layout = self.parent.publication.layout
+        content_artifact_pk = package["content_artifact"][0]
+        primary_relpath = pool_filename(
+            package["package"],
+            package["source"],
+            package["sha256"],
+            upstream_basename,
+            self.component,
+            layout,
+        )
+        published_artifact_key = (content_artifact_pk, primary_relpath)
+        if published_artifact_key not in self.seen_published_artifacts:
+            self.seen_published_artifacts.add(published_artifact_key)
+            published_artifacts.append(
+                PublishedArtifact(
+                    relative_path=primary_relpath,
+                    publication=self.parent.publication,
+                    content_artifact_id=content_artifact_pk,
+                )
+            )
+
+        # In the NESTED_BY_BOTH layout, we want to _also_ publish the package under the
+        # alphabetical path but _not_ reference it in the repo metadata.
+        if layout == LAYOUT_TYPES.NESTED_BY_BOTH:
+            alt_relpath = pool_filename(
+                package["package"],
+                package["source"],
+                package["sha256"],
+                upstream_basename,
+                self.component,
+                LAYOUT_TYPES.NESTED_ALPHABETICALLY,
+            )
+            alt_published_artifact_key = (content_artifact_pk, alt_relpath)
+            if alt_published_artifact_key not in self.seen_published_artifacts:
+                self.seen_published_artifacts.add(alt_published_artifact_key)
+                published_artifacts.append(
+                    PublishedArtifact(
+                        relative_path=alt_relpath,
+                        publication=self.parent.publication,
+                        content_artifact_id=content_artifact_pk,
+                    )
+                )
+
+    def add_source_package_release_components(self, source_package_release_components):
+        """
+        Add the source packages of a QuerySet of SourcePackageReleaseComponents to the component.
+        """
+        self.add_source_packages(
+            sprc.source_package
+            for sprc in source_package_release_components.select_related("source_package")
+            .order_by(*_index_order(SOURCE_INDEX_ORDER, "source_package__"))
+            .iterator(chunk_size=PACKAGE_INDEX_CHUNK_SIZE)
+        )
 
-    # Publish DSC file and setup to create Sources Indices file
     def add_source_packages(self, source_packages):
+        """
+        Add source packages, in the order of the Sources index, to the component.
+
+        The source packages are consumed and their artifacts prefetched in chunks of
+        PACKAGE_INDEX_CHUNK_SIZE.
+        """
+        for chunk in _chunks(source_packages, PACKAGE_INDEX_CHUNK_SIZE):
+            self.add_source_package_chunk(chunk)
+
+    # Publish DSC file and setup to create Sources Indices file
+    def add_source_package_chunk(self, source_packages):
         published_artifacts = []
         source_package_data = []
+        _prefetch_source_package_artifacts(source_packages)
 
         for source_package in source_packages:
             with suppress(IntegrityError):
@@ -504,88 +1351,183 @@ class _ComponentHelper:
                     published_artifacts.append(published_artifact)
                 source_package_data.append(source_package)
 
-        with transaction.atomic():
-            if published_artifacts:
-                PublishedArtifact.objects.bulk_create(published_artifacts, ignore_conflicts=True)
+        self.save_published_artifacts(published_artifacts)
 
+        if self.source_index_path is None:
+            return
         for source_package in source_package_data:
             dsc_file_822_serializer = DscFile822Serializer(
                 source_package, context={"request": None}
             )
             dsc_file_822_serializer.to822(self.component, paragraph=True).dump(
-                self.source_index_file_info[0]
+                self.index_file(self.source_index_path)
             )
-            self.source_index_file_info[0].write(b"\n")
+            self.index_file(self.source_index_path).write(b"\n")
 
     def finish(self):
+        if self.written_indices is None:
+            self.close_indices()
         # Publish Packages files
-        for package_index_file, package_index_path in self.package_index_files.values():
-            package_index_file.close()
-            gz_package_index_path = _zip_file(package_index_path)
-            package_index = PublishedMetadata.create_from_file(
-                publication=self.parent.publication, file=File(open(package_index_path, "rb"))
-            )
-            package_index.save()
-            gz_package_index = PublishedMetadata.create_from_file(
-                publication=self.parent.publication, file=File(open(gz_package_index_path, "rb"))
+        for architecture in self.parent.architectures:
+            if architecture in self.reused_indices:
+                self.reuse_index(self.reused_indices[architecture])
+                if self.parent.publication.publish_pdiffs:
+                    self.publish_package_diffs(
+                        self.reused_indices[architecture],
+                        self.parent.previous_publication.artifact(
+                            self.reused_indices[architecture]
+                        ),
+                    )
+                if self.parent.publication.publish_contents:
+                    self.reuse_index(self.contents_index_path(architecture))
+            else:
+                # The diffs are computed before publish_index() moves the file into the storage:
+                if self.parent.publication.publish_pdiffs:
+                    self.publish_package_diffs(self.package_index_paths[architecture])
+                self.publish_index(self.package_index_paths[architecture])
+                if architecture in self.contents_index_paths:
+                    self.publish_index(self.contents_index_paths[architecture])
+        # Publish Sources Indices file
+        if "source" in self.reused_indices:
+            self.reuse_index(self.reused_indices["source"])
+        elif self.source_index_path is not None:
+            self.publish_index(self.source_index_path)
+        # Publish Translation-en file
+        if "i18n" in self.reused_indices:
+            self.reuse_index(self.reused_indices["i18n"])
+        elif self.translation_index_path is not None:
+            self.publish_index(self.translation_index_path)
+
+        # Publish per-component/architecture Release files
+        for release_path in self.release_file_paths.values():
+            release = PublishedMetadata.create_from_file(
+                publication=self.parent.publication, file=File(open(release_path, "rb"))
             )
-            gz_package_index.save()
+            self.parent.add_metadata(release)
 
+    def publish_index(self, index_path):
+        for path in _IndexFile.variant_paths(index_path):
+            size, digests = self.written_indices[path]
+            index, artifact = _create_published_metadata(
+                self.parent.publication, path, size, digests
+            )
             # Generating metadata files using checksum
             if settings.APT_BY_HASH:
-                self.generate_by_hash(
-                    package_index_path, package_index, gz_package_index_path, gz_package_index
-                )
+                for hashed_index_path in _by_hash_paths(path, artifact):
+                    _add_published_metadata(self.parent.publication, hashed_index_path, artifact)
+            self.parent.add_metadata(index, artifact)
 
-            self.parent.add_metadata(package_index)
-            self.parent.add_metadata(gz_package_index)
-        # Publish Sources Indices file
-        if self.source_index_file_info is not None:
-            source_index_file, source_index_path = self.source_index_file_info
-            source_index_file.close()
-            gz_source_index_path = _zip_file(source_index_path)
-            source_index = PublishedMetadata.create_from_file(
-                publication=self.parent.publication, file=File(open(source_index_path, "rb"))
-            )
-            source_index.save()
-            gz_source_index = PublishedMetadata.create_from_file(
-                publication=self.parent.publication, file=File(open(gz_source_index_path, "rb"))
-            )
-            gz_source_index.save()
+    def publish_package_diffs(self, index_path, artifact=None):
+        """
+        Publish the PDiffs of the Packages file at index_path, patching each of its versions in the
+        latest APT_PDIFF_HISTORY publications of the repository into the current one.
 
-            # Generating metadata files using checksum
-            if settings.APT_BY_HASH:
-                self.generate_by_hash(
-                    source_index_path, source_index, gz_source_index_path, gz_source_index
+        The current file is read from artifact, if it is reused from the previous publication.
+        """
+        history = self.parent.pdiff_history(index_path)
+        if not history:
+            return
+        if artifact is None:
+            size, digests = self.written_indices[index_path]
+            current_file = open(index_path, "rb")
+        else:
+            size = artifact.size
+            digests = {name: getattr(artifact, name) for name in Artifact.DIGEST_FIELDS}
+            current_file = artifact.file.open("rb")
+        checksum_types = [
+            name for name in DIFF_INDEX_CHECKSUMS if name in settings.ALLOWED_CONTENT_CHECKSUMS
+        ]
+        diff_dir = index_path + ".diff"
+        target = self.parent.publication.pulp_created.strftime(PDIFF_NAME_FORMAT)
+        history_entries, patches, downloads = [], [], []
+        with current_file:
+            current = StanzaDigests(current_file)
+            for created, old_artifact in history:
+                if old_artifact.sha256 == digests["sha256"]:
+                    continue
+                with old_artifact.file.open("rb") as old_file:
+                    patch = ed_diff(StanzaDigests(old_file), current, current_file)
+                # Downloading the whole file is cheaper than a patch of the same size:
+                if len(patch) >= size:
+                    continue
+                name = "T-{}-F-{}".format(target, created.strftime(PDIFF_NAME_FORMAT))
+                os.makedirs(diff_dir, exist_ok=True)
+                writer = _HashingWriter(os.path.join(diff_dir, name + ".gz"))
+                writer.write(compress(patch, mtime=0))
+                download_size, download_digests = writer.close()
+                _create_published_metadata(
+                    self.parent.publication, writer.file.name, download_size, download_digests
+                )
+                history_entries.append(
+                    (
+                        {checksum: getattr(old_artifact, checksum) for checksum in checksum_types},
+                        old_artifact.size,
+                        name,
+                    )
+                )
+                patches.append(
+                    (
+                        {
+                            checksum: pulp_hashlib.new(checksum, patch).hexdigest()
+                            for checksum in checksum_types
+                        },
+                        len(patch),
+                        name,
+                    )
                 )
+                downloads.append((download_digests, download_size, name + ".gz"))
+        if not patches:
+            return
 
-            self.parent.add_metadata(source_index)
-            self.parent.add_metadata(gz_source_index)
+        writer = _HashingWriter(os.path.join(diff_dir, "Index"))
+        writer.write(
+            render_diff_index((digests, size), history_entries, patches, downloads, checksum_types)
+        )
+        index, index_artifact = _create_published_metadata(
+            self.parent.publication, writer.file.name, *writer.close()
+        )
+        if settings.APT_BY_HASH:
+            for hashed_index_path in _by_hash_paths(index.relative_path, index_artifact):
+                _add_published_metadata(self.parent.publication, hashed_index_path, index_artifact)
+        self.parent.add_metadata(index, index_artifact)
+
+    def reuse_index(self, index_path):
+        previous_publication = self.parent.previous_publication
+        for path in _IndexFile.variant_paths(index_path):
+            index, artifact = previous_publication.reuse_metadata(self.parent.publication, path)
+            if settings.APT_BY_HASH:
+                for hashed_index_path in _by_hash_paths(path, artifact):
+                    _add_published_metadata(self.parent.publication, hashed_index_path, artifact)
+            self.parent.add_metadata(index, artifact)
 
-        # Publish per-component/architecture Release files
-        for release_path in self.release_file_paths.values():
-            release = PublishedMetadata.create_from_file(
-                publication=self.parent.publication, file=File(open(release_path, "rb"))
+
+class _ReleaseSigner:
+    """
+    Signs the Release file at release_path, and publishes the signatures in release_dir.
+
+    Subclasses set the publication, signing_service, temp_env, release_dir and release_path.
+    """
+
+    async def sign_metadata(self, signing_sessions):
+        self.signed = {"signatures": {}}
+        if self.signing_service:
+            self.signed = await signing_sessions.sign(
+                self.signing_service, self.release_path, env_vars=self.temp_env
             )
-            self.parent.add_metadata(release)
 
-    def generate_by_hash(self, index_path, index, gz_index_path, gz_index):
-        for path, index in (
-            (index_path, index),
-            (gz_index_path, gz_index),
-        ):
-            for checksum in settings.ALLOWED_CONTENT_CHECKSUMS:
-                if checksum in CHECKSUM_TYPE_MAP:
-                    hashed_index_path = _fetch_file_checksum(path, index, checksum)
-                    hashed_index = PublishedMetadata.create_from_file(
-                        publication=self.parent.publication,
-                        file=File(open(path, "rb")),
-                        relative_path=hashed_index_path,
-                    )
-                    hashed_index.save()
+    def save_signed_metadata(self):
+        for signature_file in self.signed["signatures"].values():
+            file_name = os.path.basename(signature_file)
+            relative_path = os.path.join(self.release_dir, file_name)
+            metadata = PublishedMetadata.create_from_file(
+                publication=self.publication,
+                file=File(open(signature_file, "rb")),
+                relative_path=relative_path,
+            )
+            metadata.save()
 
 
-class _ReleaseHelper:
+class _ReleaseHelper(_ReleaseSigner):
     def __init__(
         self,
         publication,
@@ -594,12 +1536,14 @@ class _ReleaseHelper:
         release,
         temp_dir,
         signing_service=None,
+        previous_publication=None,
     ):
         self._release = release
         self.publication = publication
+        self.previous_publication = previous_publication
         self.temp_env = {"PULP_TEMP_WORKING_DIR": _create_random_directory(temp_dir)}
         self.distribution = distribution = release.distribution
-        self.dists_subfolder = distribution.strip("/") if distribution != "/" else "flat-repo"
+        self.dists_subfolder = _dists_subfolder(distribution)
         if distribution[-1] == "/":
             message = "Using dists subfolder '{}' for structured publish of originally flat repo!"
             log.info(_(message).format(self.dists_subfolder))
@@ -618,7 +1562,9 @@ class _ReleaseHelper:
         if not release.codename:
             release.codename = distribution.split("/")[0] if distribution != "/" else "flat-repo"
         self.release["Codename"] = release.codename
-        self.release["Date"] = datetime.now(tz=timezone.utc).strftime("%a, %d %b %Y %H:%M:%S %z")
+        self.release["Date"] = datetime.now(tz=timezone.utc).strftime(RELEASE_DATE_FORMAT)
+        if publication.hybrid_format:
+            self.release["No-Support-for-Architecture-all"] = "Packages"
         self.release["Architectures"] = " ".join(architectures)
         self.release["Components"] = ""  # Will be set later
         if release.description != NULL_VALUE:
@@ -630,11 +1576,53 @@ class _ReleaseHelper:
                 self.release[deb_field] = []
 
         self.architectures = architectures
+        self._pdiff_publication_pks = None
         self.components = {component: _ComponentHelper(self, component) for component in components}
         self.signing_service = publication.signing_service or signing_service
 
-    def add_metadata(self, metadata):
-        artifact = metadata._artifacts.get()
+    def reuses_index(self, component, architecture, *index_paths):
+        """
+        Whether the index files at index_paths are reused from the previous publication.
+        """
+        return bool(self.previous_publication) and self.previous_publication.has_unchanged_index(
+            self.distribution, component, architecture, *index_paths
+        )
+
+    def pdiff_history(self, index_path):
+        """
+        Return the (publication creation time, artifact) of the distinct versions of the file at
+        index_path in the latest APT_PDIFF_HISTORY earlier publications of the repository, newest
+        first.
+        """
+        if self._pdiff_publication_pks is None:
+            self._pdiff_publication_pks = list(
+                AptPublication.objects.filter(
+                    repository_version__repository=self.publication.repository_version.repository,
+                    complete=True,
+                )
+                .exclude(pk=self.publication.pk)
+                .order_by("-pulp_created")
+                .values_list("pk", flat=True)[: settings.APT_PDIFF_HISTORY]
+            )
+        history = []
+        seen_sha256 = set()
+        for metadata in (
+            PublishedMetadata.objects.filter(
+                publication_id__in=self._pdiff_publication_pks, relative_path=index_path
+            )
+            .select_related("publication")
+            .prefetch_related("contentartifact_set__artifact")
+            .order_by("-publication__pulp_created")
+        ):
+            artifact = metadata.contentartifact_set.all()[0].artifact
+            if artifact.sha256 not in seen_sha256:
+                seen_sha256.add(artifact.sha256)
+                history.append((metadata.publication.pulp_created, artifact))
+        return history
+
+    def add_metadata(self, metadata, artifact=None):
+        if artifact is None:
+            artifact = metadata._artifacts.get()
         release_file_folder = os.path.join("dists", self.dists_subfolder)
         release_file_relative_path = os.path.relpath(metadata.relative_path, release_file_folder)
 
@@ -642,7 +1630,7 @@ class _ReleaseHelper:
             if checksum_type in settings.ALLOWED_CONTENT_CHECKSUMS:
                 self.release[deb_field].append(
                     {
-                        deb_field.lower(): model_to_dict(artifact)[checksum_type],
+                        deb_field.lower(): getattr(artifact, checksum_type),
                         "size": artifact.size,
                         "name": release_file_relative_path,
                     }
@@ -651,11 +1639,12 @@ class _ReleaseHelper:
     def finish(self):
         """
         You must *either* call finish (as the simple publications still do), or you must call
-        save_unsigned_metadata, sign_metadata, and save_signed_metadata, in order. The benefit of
-        doing it the other way is that you can sign the metadata for all releases concurrently.
+        save_unsigned_metadata, _concurrently_sign_metadata, and save_signed_metadata, in order.
+        The benefit of doing it the other way is that you can sign the metadata for all releases
+        concurrently.
         """
         self.save_unsigned_metadata()
-        asyncio.run(self.sign_metadata())
+        asyncio.run(_concurrently_sign_metadata([self]))
         self.save_signed_metadata()
 
     def save_unsigned_metadata(self):
@@ -675,51 +1664,641 @@ class _ReleaseHelper:
         )
         release_metadata.save()
 
-    async def sign_metadata(self):
-        self.signed = {"signatures": {}}
-        if self.signing_service:
-            self.signed = await self.signing_service.asign(
-                self.release_path, env_vars=self.temp_env
+
+class _ResignedRelease(_ReleaseSigner):
+    """
+    The Release file of a distribution of a re-signed publication, as parsed from the original.
+    """
+
+    def __init__(self, publication, release_dir, release, temp_dir, signing_service):
+        self.publication = publication
+        self.release_dir = release_dir
+        self.release = release
+        self.signing_service = signing_service
+        self.temp_env = {"PULP_TEMP_WORKING_DIR": _create_random_directory(temp_dir)}
+
+    def save_unsigned_metadata(self):
+        self.release["Date"] = datetime.now(tz=timezone.utc).strftime(RELEASE_DATE_FORMAT)
+        os.makedirs(self.release_dir, exist_ok=True)
+        self.release_path = os.path.join(self.release_dir, "Release")
+        with open(self.release_path, "wb") as release_file:
+            self.release.dump(release_file)
+        PublishedMetadata.create_from_file(
+            publication=self.publication,
+            file=File(open(self.release_path, "rb")),
+        ).save()
+
+
+class _ComponentJob:
+    """
+    Renders the index files of one component in a worker process of the publish process pool.
+
+    It stands in for the _ReleaseHelper as the parent of the _ComponentHelper used by the worker,
+    which leaves all database writes to the parent process.
+    """
+
+    def __init__(self, component_helper, repository_version_pk, release_component_pks):
+        release_helper = component_helper.parent
+        self.publication_pk = release_helper.publication.pk
+        self.distribution = release_helper.distribution
+        self.dists_subfolder = release_helper.dists_subfolder
+        self.architectures = release_helper.architectures
+        self.component = component_helper.component
+        self.reused_architectures = set(component_helper.reused_indices)
+        self.repository_version_pk = repository_version_pk
+        self.release_component_pks = release_component_pks
+        self.domain = get_domain()
+
+    def reuses_index(self, component, architecture, *index_paths):
+        return architecture in self.reused_architectures
+
+    def __call__(self):
+        """
+        Return the (relative_path, content_artifact_id) of all PublishedArtifacts of the component,
+        the PackageParagraphCache with the paragraphs to save, the PackageFileListCache with the
+        file lists to save, and the written index files.
+        """
+        set_domain(self.domain)
+        self.publication = AptPublication.objects.get(pk=self.publication_pk)
+        # The legacy Release files are written by the parent process:
+        self.publication.publish_legacy_release_files = False
+
+        package_release_components, source_package_release_components = _component_content(
+            RepositoryVersion.objects.get(pk=self.repository_version_pk),
+            ReleaseComponent.objects.filter(pk__in=self.release_component_pks),
+        )
+        component_helper = _ComponentHelper(self, self.component)
+        component_helper.published_artifacts = []
+        component_helper.add_package_release_components(package_release_components)
+        component_helper.add_source_package_release_components(source_package_release_components)
+        component_helper.close_indices()
+        return (
+            [
+                (published_artifact.relative_path, published_artifact.content_artifact_id)
+                for published_artifact in component_helper.published_artifacts
+            ],
+            component_helper.paragraph_cache,
+            component_helper.file_list_cache,
+            component_helper.written_indices,
+        )
+
+
+def _index_order(fields, prefix=""):
+    """
+    Return the order_by() arguments sorting content by fields, and then by pk.
+
+    Text is compared bytewise, so that the same content always yields byte identical indices,
+    independent of the collation of the database.
+    """
+    return [Collate(prefix + field, "C") for field in fields] + [prefix + "pk"]
+
+
+def _component_content(repo_version, release_components):
+    """
+    Return the PackageReleaseComponents and SourcePackageReleaseComponents of repo_version, that
+    belong to any of release_components.
+    """
+    return (
+        PackageReleaseComponent.objects.filter(
+            pk__in=repo_version.content, release_component__in=release_components
+        ),
+        SourcePackageReleaseComponent.objects.filter(
+            pk__in=repo_version.content, release_component__in=release_components
+        ),
+    )
+
+
+def _publish_process_pool():
+    """
+    Return a process pool for rendering index files, or None to render them in this process.
+    """
+    if settings.MAX_PUBLISH_WORKER_PROCESSES <= 1:
+        return None
+    # Forking this process is unsafe, since other threads, like the StackSampler of a profiled
+    # task, may hold locks. Spawned worker processes set up Django themselves and open their own
+    # database connections, and they inherit the working directory and the environment.
+    connections.close_all()
+    return ProcessPoolExecutor(
+        max_workers=settings.MAX_PUBLISH_WORKER_PROCESSES,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    )
+
+
+class _PreviousPublication:
+    """
+    The latest publication of the same repository with the same options, used by incremental
+    publishes to reuse the index files of all unchanged (distribution, component, architecture)
+    combinations.
+
+    An index file is unchanged, if none of the content determining its paragraphs was added or
+    removed between the repository version of the previous publication and the one being published.
+    Release files are always generated anew, since they carry the publication date. If the
+    artifacts of any content shared by both repository versions changed, for example because they
+    were downloaded since, nothing is reused.
+    """
+
+    def __init__(self, publication, repo_version):
+        self.publication = publication
+        self.metadata = {
+            metadata.relative_path: metadata
+            for metadata in PublishedMetadata.objects.filter(
+                publication=publication
+            ).prefetch_related("contentartifact_set__artifact")
+        }
+        previous_version = publication.repository_version
+        changed = Q(pk__in=repo_version.added(base_version=previous_version)) | Q(
+            pk__in=repo_version.removed(base_version=previous_version)
+        )
+        self.changed_indices = _changed_indices(
+            simple=publication.simple,
+            packages=Package.objects.filter(changed).values_list("architecture"),
+            package_release_components=PackageReleaseComponent.objects.filter(changed).values_list(
+                "release_component__distribution",
+                "release_component__component",
+                "package__architecture",
+                "index_architecture",
+            ),
+            source_package_release_components=SourcePackageReleaseComponent.objects.filter(
+                changed
+            ).values_list("release_component__distribution", "release_component__component"),
+            has_changed_source_packages=publication.simple
+            and SourcePackage.objects.filter(changed).exists(),
+        )
+        log.info(
+            _("Publishing incrementally, based on publication {} ({} changed indices).").format(
+                publication.pk, len(self.changed_indices)
             )
+        )
 
-    def save_signed_metadata(self):
-        for signature_file in self.signed["signatures"].values():
-            file_name = os.path.basename(signature_file)
-            relative_path = os.path.join(self.release_dir, file_name)
-            metadata = PublishedMetadata.create_from_file(
-                publication=self.publication,
-                file=File(open(signature_file, "rb")),
+    @classmethod
+    def find(cls, repo_version, artifact_state, simple, structured, layout, *index_options):
+        """
+        Return the latest complete publication with identical index options and unchanged
+        artifacts, or None.
+
+        The signing service and the options affecting the Release files only are not compared,
+        since Release files are never reused.
+        """
+        publication = _latest_publication(
+            repo_version.repository, simple, structured, layout, *index_options
+        )
+        if publication is None:
+            log.info(_("No previous publication to publish incrementally from."))
+            return None
+        if not _unchanged_artifacts(publication, repo_version, artifact_state):
+            log.info(
+                _(
+                    "Not publishing incrementally, the artifacts or settings changed since "
+                    "publication {}."
+                ).format(publication.pk)
+            )
+            return None
+        return cls(publication, repo_version)
+
+    def has_unchanged_index(self, distribution, component, architecture, *index_paths):
+        """
+        Whether the indices at index_paths can be reused for distribution, component and
+        architecture.
+        """
+        if (distribution, component, architecture) in self.changed_indices:
+            return False
+        # Hybrid format Packages files of all architectures also list the "all" packages:
+        if (
+            self.publication.hybrid_format
+            and architecture != "source"
+            and (distribution, component, "all") in self.changed_indices
+        ):
+            return False
+        return all(
+            path in self.metadata
+            for index_path in index_paths
+            for path in _IndexFile.variant_paths(index_path)
+        )
+
+    def artifact(self, relative_path):
+        """
+        Return the Artifact of the previous PublishedMetadata at relative_path.
+        """
+        return self.metadata[relative_path].contentartifact_set.all()[0].artifact
+
+    def reuse_metadata(self, publication, relative_path):
+        """
+        Add the artifact of the previous PublishedMetadata at relative_path to publication.
+
+        Returns:
+            tuple: The new PublishedMetadata and its Artifact.
+        """
+        artifact = self.artifact(relative_path)
+        return _add_published_metadata(publication, relative_path, artifact), artifact
+
+    def copy_published_artifacts(self, publication, component, content_pks):
+        """
+        Copy the PublishedArtifacts of content_pks (a list or values() QuerySet) in the pool
+        directory of component.
+        """
+        published_artifacts = [
+            PublishedArtifact(
                 relative_path=relative_path,
+                content_artifact_id=content_artifact_id,
+                publication=publication,
             )
-            metadata.save()
+            for relative_path, content_artifact_id in PublishedArtifact.objects.filter(
+                publication=self.publication,
+                content_artifact__content__in=content_pks,
+                relative_path__startswith=os.path.join("pool", component, ""),
+            ).values_list("relative_path", "content_artifact_id")
+        ]
+        with transaction.atomic():
+            PublishedArtifact.objects.bulk_create(published_artifacts, ignore_conflicts=True)
+
+
+def _changed_indices(
+    simple,
+    packages,
+    package_release_components,
+    source_package_release_components,
+    has_changed_source_packages,
+):
+    """
+    Return the set of (distribution, component, architecture) combinations, whose index files are
+    affected by changed content. The architecture "source" denotes the Sources index.
+
+    Args:
+        simple (bool): Whether the changes also apply to the "default" distribution of a simple
+            publication.
+        packages (iterable): The (architecture,) of each changed Package.
+        package_release_components (iterable): The (distribution, component, package architecture,
+            index architecture) of each changed PackageReleaseComponent.
+        source_package_release_components (iterable): The (distribution, component) of each
+            changed SourcePackageReleaseComponent.
+        has_changed_source_packages (bool): Whether any SourcePackage changed.
+    """
+    changed = set()
+    if simple:
+        changed.update(("default", "all", architecture) for (architecture,) in packages)
+        if has_changed_source_packages:
+            changed.add(("default", "all", "source"))
+    for distribution, component, architecture, index_architecture in package_release_components:
+        if architecture != "all" and index_architecture:
+            architecture = index_architecture
+        changed.add((distribution, component, architecture))
+    for distribution, component in source_package_release_components:
+        changed.add((distribution, component, "source"))
+    return changed
+
+
+class _HashingWriter:
+    """
+    A binary file, that computes the size and digests of the data written to it.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.size = 0
+        self.hashers = {name: pulp_hashlib.new(name) for name in Artifact.DIGEST_FIELDS}
 
+    def write(self, data):
+        self.file.write(data)
+        self.size += len(data)
+        for hasher in self.hashers.values():
+            hasher.update(data)
+        return len(data)
 
-def _zip_file(file_path):
-    gz_file_path = file_path + ".gz"
-    with open(file_path, "rb") as f_in:
-        with GzipFile(gz_file_path, "wb") as f_out:
-            shutil.copyfileobj(f_in, f_out)
-    return gz_file_path
+    def flush(self):
+        self.file.flush()
 
+    def close(self):
+        self.file.close()
+        return self.size, {name: hasher.hexdigest() for name, hasher in self.hashers.items()}
 
-def _fetch_file_checksum(file_path, index, checksum):
-    digest = getattr(index.contentartifact_set.first().artifact, checksum)
-    checksum_type = CHECKSUM_TYPE_MAP[checksum]
-    hashed_path = Path(file_path).parents[0] / "by-hash" / checksum_type / digest
-    return hashed_path
 
+class _CompressorPipe:
+    """
+    Compresses the data written to it with an external, multithreaded compressor command.
+
+    The compressed output is copied to fileobj by a separate thread.
+    """
+
+    def __init__(self, args, fileobj):
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.fileobj = fileobj
+        self.error = None
+        self.thread = threading.Thread(target=self._copy_output, daemon=True)
+        self.thread.start()
+
+    def _copy_output(self):
+        try:
+            while chunk := self.process.stdout.read(1048576):
+                self.fileobj.write(chunk)
+        except Exception as e:
+            self.error = e
+
+    def write(self, data):
+        self.process.stdin.write(data)
+        return len(data)
+
+    def close(self):
+        self.process.stdin.close()
+        self.thread.join()
+        self.process.stdout.close()
+        if self.process.wait() != 0:
+            raise subprocess.CalledProcessError(self.process.returncode, self.process.args)
+        if self.error:
+            raise self.error
+
+
+def _compressor(compression, path, fileobj):
+    """
+    Return a writable stream, compressing the index file at path into fileobj.
+    """
+    threads = str(settings.APT_INDEX_COMPRESSION_THREADS)
+    if compression == "gz":
+        # Without a fixed mtime, the same index would be compressed differently by every publish.
+        return GzipFile(filename=path, mode="wb", fileobj=fileobj, mtime=0)
+    if compression == "xz":
+        if shutil.which("xz"):
+            return _CompressorPipe(["xz", "--threads", threads, "--stdout", "--quiet"], fileobj)
+        return lzma.LZMAFile(fileobj, mode="wb")
+    if compression == "zst":
+        if shutil.which("zstd"):
+            return _CompressorPipe(["zstd", "-T" + threads, "--stdout", "--quiet"], fileobj)
+        raise RuntimeError(_("Publishing zst compressed index files requires the zstd command."))
+    raise ValueError(_("Unsupported index file compression '{}'.").format(compression))
+
+
+class _IndexFile:
+    """
+    An index file, written together with its compressed variants in a single pass.
+
+    The compressed variants are those in the APT_INDEX_COMPRESSION_FORMATS setting. The size and
+    digests of all variants are computed while writing, so none of them needs to be read again for
+    publishing.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.writers = {
+            variant_path: _HashingWriter(variant_path) for variant_path in self.variant_paths(path)
+        }
+        self.streams = [self.writers[path]]
+        for compression in settings.APT_INDEX_COMPRESSION_FORMATS:
+            compressed_path = "{}.{}".format(path, compression)
+            self.streams.append(
+                _compressor(compression, compressed_path, self.writers[compressed_path])
+            )
+
+    @staticmethod
+    def variant_paths(path):
+        """
+        Return the paths of the uncompressed index file at path and of its compressed variants.
+        """
+        return [path] + [
+            "{}.{}".format(path, compression)
+            for compression in settings.APT_INDEX_COMPRESSION_FORMATS
+        ]
 
-def _batch_fetch_artifacts(packages):
-    sha256_values = [package.sha256 for package in packages if package.sha256]
-    artifacts = Artifact.objects.filter(sha256__in=sha256_values, pulp_domain=get_domain())
-    artifact_dict = {artifact.sha256: artifact for artifact in artifacts}
+    def write(self, data):
+        for stream in self.streams:
+            stream.write(data)
+        return len(data)
 
-    remote_artifacts = RemoteArtifact.objects.filter(
-        sha256__in=sha256_values, pulp_domain=get_domain()
+    def close(self):
+        """
+        Close all variants and return their (size, digests) by path.
+        """
+        for stream in self.streams[1:]:
+            stream.close()
+        return {path: writer.close() for path, writer in self.writers.items()}
+
+
+def _create_published_metadata(publication, relative_path, size, digests):
+    """
+    Create a PublishedMetadata for the file at relative_path, given its size and digests.
+
+    This is equivalent to PublishedMetadata.create_from_file(), except that the file is not read
+    for hashing, and is moved into the artifact storage instead of being copied.
+
+    Returns:
+        tuple: The PublishedMetadata and its Artifact.
+    """
+    domain = publication.pulp_domain
+    file_path = os.path.abspath(relative_path)
+    with transaction.atomic():
+        try:
+            artifact = Artifact.objects.get(sha256=digests["sha256"], pulp_domain=domain)
+            if not domain.get_storage().exists(artifact.file.name):
+                artifact.file = file_path
+                artifact.save()
+            artifact.touch()
+        except Artifact.DoesNotExist:
+            artifact = Artifact(file=file_path, size=size, pulp_domain=domain, **digests)
+            try:
+                with transaction.atomic():
+                    artifact.save()
+            except IntegrityError:
+                artifact = Artifact.objects.get(sha256=digests["sha256"], pulp_domain=domain)
+                artifact.touch()
+        return _add_published_metadata(publication, relative_path, artifact), artifact
+
+
+def _add_published_metadata(publication, relative_path, artifact):
+    """
+    Create a PublishedMetadata at relative_path for an existing artifact.
+    """
+    with transaction.atomic():
+        metadata = PublishedMetadata(relative_path=relative_path, publication=publication)
+        metadata.save()
+        content_artifact = ContentArtifact(
+            relative_path=relative_path, content=metadata, artifact=artifact
+        )
+        content_artifact.save()
+        PublishedArtifact(
+            relative_path=relative_path,
+            content_artifact=content_artifact,
+            publication=publication,
+        ).save()
+    return metadata
+
+
+def _by_hash_paths(file_path, artifact):
+    """
+    Return the by-hash paths of the file at file_path, for all checksum types of Release files.
+    """
+    return [
+        str(
+            Path(file_path).parent
+            / "by-hash"
+            / CHECKSUM_TYPE_MAP[checksum]
+            / getattr(artifact, checksum)
+        )
+        for checksum in settings.ALLOWED_CONTENT_CHECKSUMS
+        if checksum in CHECKSUM_TYPE_MAP
+    ]
+
+
+def _prefetch_source_package_artifacts(source_packages):
+    """
+    Fetch the ContentArtifacts, Artifacts and RemoteArtifacts of all source_packages at once.
+
+    The checksum properties of SourcePackage, used to render the Sources paragraphs, then no longer
+    query the database for every source package.
+    """
+    prefetch_related_objects(
+        source_packages,
+        Prefetch(
+            "contentartifact_set", queryset=ContentArtifact.objects.select_related("artifact")
+        ),
+        # The properties use remoteartifact_set.first(), which needs an ordered prefetch:
+        Prefetch(
+            "contentartifact_set__remoteartifact_set",
+            queryset=RemoteArtifact.objects.order_by("pk"),
+        ),
+    )
+
+
+def _insert_select_supported():
+    """
+    Whether PublishedArtifacts can be created by INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    """
+    return connection.vendor == "postgresql"
+
+
+def _insert_package_published_artifacts(publication, packages, component, layout):
+    """
+    Create the PublishedArtifacts of packages in one INSERT ... SELECT statement.
+
+    The relative paths are computed by the database, and are identical to those of pool_filename().
+    Existing PublishedArtifacts with the same relative path are kept, like with ignore_conflicts.
+    """
+    packages = packages.filter(contentartifact__isnull=False).annotate(
+        sourcename=Func(
+            Func(
+                Coalesce("source", "package"),
+                Value("("),
+                Value(1),
+                function="split_part",
+                output_field=TextField(),
+            ),
+            Value(r"\s+$"),
+            Value(""),
+            function="regexp_replace",
+            output_field=TextField(),
+        ),
+        basename=Func(
+            F("contentartifact__relative_path"),
+            Value("^.*/"),
+            Value(""),
+            function="regexp_replace",
+            output_field=TextField(),
+        ),
+    )
+    path = [
+        Value(os.path.join("pool", component, "")),
+        Case(
+            When(sourcename__startswith="lib", then=Left("sourcename", 4)),
+            default=Left("sourcename", 1),
+        ),
+        Value("/"),
+        F("sourcename"),
+        Value("/"),
+    ]
+    if layout != LAYOUT_TYPES.NESTED_ALPHABETICALLY:
+        path += [Value("by-digest/"), Left("sha256", 6), Value("-")]
+    _insert_published_artifacts(
+        publication,
+        packages,
+        Concat(*path, F("basename"), output_field=TextField()),
+        F("contentartifact__pk"),
+    )
+
+
+def _insert_published_artifacts(publication, queryset, relative_path, content_artifact):
+    """
+    Create PublishedArtifacts in publication, with one INSERT ... SELECT statement from queryset.
+
+    Args:
+        publication: The publication to add the PublishedArtifacts to.
+        queryset: The rows to create PublishedArtifacts for.
+        relative_path: The expression for the relative path of the row's PublishedArtifact.
+        content_artifact: The expression for the pk of the row's ContentArtifact.
+    """
+    rows = queryset.values_list(
+        Func(function="gen_random_uuid", output_field=UUIDField()),
+        Now(),
+        Now(),
+        relative_path,
+        content_artifact,
+        Value(publication.pk, output_field=UUIDField()),
     )
-    remote_artifact_dict = {artifact.sha256: artifact for artifact in remote_artifacts}
+    select_sql, params = rows.query.sql_with_params()
+    columns = ", ".join(
+        connection.ops.quote_name(PublishedArtifact._meta.get_field(field).column)
+        for field in (
+            "pulp_id",
+            "pulp_created",
+            "pulp_last_updated",
+            "relative_path",
+            "content_artifact",
+            "publication",
+        )
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO {} ({}) {} ON CONFLICT DO NOTHING".format(
+                connection.ops.quote_name(PublishedArtifact._meta.db_table), columns, select_sql
+            ),
+            params,
+        )
+
 
-    return artifact_dict, remote_artifact_dict
+def _package_release_component_row(values):
+    """
+    Turn the PACKAGE_RELEASE_COMPONENT_ROW_VALUES of a PackageReleaseComponent into a package row.
+    """
+    return _package_row(values[:-1], index_architecture=values[-1])
+
+
+def _package_row(values, index_architecture=None):
+    """
+    Turn the PACKAGE_ROW_VALUES of a Package into a package row.
+    """
+    fields_count = len(PACKAGE_INDEX_VALUES)
+    row = dict(zip(PACKAGE_INDEX_VALUES, values[:fields_count]))
+    relative_path, content_artifact_pk, content_artifact_path = values[
+        fields_count : fields_count + 3
+    ]
+    artifact = _ArtifactChecksums(*values[fields_count + 3 :])
+    row.update(
+        relative_path=relative_path,
+        index_architecture=index_architecture,
+        content_artifact=(content_artifact_pk, content_artifact_path),
+        artifact=artifact if artifact.sha256 else None,
+    )
+    return row
+
+
+def _fetch_remote_artifacts(sha256_values):
+    """
+    Return the checksums of RemoteArtifacts in the current domain, by sha256.
+    """
+    if not sha256_values:
+        return {}
+    return {
+        sha256: _ArtifactChecksums(md5, sha1, sha256, size)
+        for md5, sha1, sha256, size in RemoteArtifact.objects.filter(
+            sha256__in=sha256_values, pulp_domain=get_domain()
+        ).values_list("md5", "sha1", "sha256", "size")
+    }
+
+
+def _chunks(iterable, size):
+    """
+    Yield lists of up to size consecutive items of iterable.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 
 def _create_random_directory(path):
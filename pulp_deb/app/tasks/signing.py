@@ -25,6 +25,7 @@ from pulp_deb.app.models.signing_service import (
     AptPackageSigningService,
     DebPackageSigningResult,
 )
+from pulp_deb.app.profiling import profiled_task
 
 log = logging.getLogger(__name__)
 
@@ -204,6 +205,7 @@ def _sign_package(package, signing_service, signing_fingerprint, package_release
         return (package_id, str(signed_package.pk), prcs_to_update)
 
 
+@profiled_task
 def signed_add_and_remove(
     repository_pk, add_content_units, remove_content_units, base_version_pk=None, overwrite=True
 ):
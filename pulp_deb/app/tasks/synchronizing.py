@@ -6,8 +6,9 @@ import logging
 import lzma
 import os
 import shutil
-from collections import defaultdict
+from collections import defaultdict, deque
 from gettext import gettext as _
+from itertools import islice
 from tempfile import NamedTemporaryFile
 from urllib.parse import quote, urlparse, urlunparse
 
@@ -21,8 +22,11 @@ from rest_framework.exceptions import ValidationError
 from pulpcore.plugin.exceptions import DigestValidationError, InvalidSignatureError, SyncError
 from pulpcore.plugin.models import (
     Artifact,
+    Content,
+    ContentArtifact,
     ProgressReport,
     Remote,
+    RemoteArtifact,
 )
 from pulpcore.plugin.stages import (
     ACSArtifactHandler,
@@ -43,6 +47,7 @@ from pulpcore.plugin.util import get_domain, gpg_verify
 from pulp_deb.app.constants import (
     CHECKSUM_TYPE_MAP,
     NO_MD5_WARNING_MESSAGE,
+    TRANSLATION_COMPRESSION_PREFERENCE,
     VARIANT_TO_BASE_ARCHITECTURE_MAP,
 )
 from pulp_deb.app.exceptions import (
@@ -73,6 +78,7 @@ from pulp_deb.app.models import (
     SourcePackageReleaseComponent,
 )
 from pulp_deb.app.package_metadata import calculate_package_metadata_sha256
+from pulp_deb.app.profiling import profiled_task
 from pulp_deb.app.serializers import (
     DscFile822Serializer,
     InstallerPackage822Serializer,
@@ -81,7 +87,18 @@ from pulp_deb.app.serializers import (
 
 log = logging.getLogger(__name__)
 
+# The number of source packages put into the pipeline before the SourcePackageReleaseComponent of
+# the oldest one is emitted. This bounds the number of unresolved source packages held in memory.
+SOURCE_PACKAGE_RESOLUTION_WINDOW = 500
+# The number of Sources paragraphs, whose already known source packages are loaded per query:
+SOURCE_PACKAGE_LOOKUP_BATCH_SIZE = 500
 
+# SourcePackage fields (and Sources paragraph fields), that DscFile822Serializer requires:
+REQUIRED_SOURCE_PACKAGE_FIELDS = ("format", "source", "version", "maintainer", "standards_version")
+SOURCE_PACKAGE_CHECKSUM_FIELDS = ("checksums_sha1", "checksums_sha256", "checksums_sha512", "files")
+
+
+@profiled_task
 def synchronize(remote_pk, repository_pk, mirror, optimize):
     """
     Sync content from the remote repository.
@@ -105,11 +122,13 @@ def synchronize(remote_pk, repository_pk, mirror, optimize):
     if not remote.url:
         raise SyncError(_("A remote must have a url specified to synchronize."))
 
+    previous_indices = PreviousVersionIndices(previous_repo_version) if optimize else None
+
     if optimize and mirror:
         skip_dist = []
         for dist in remote.distributions.split():
             artifact_set_sha256 = get_distribution_release_file_artifact_set_sha256(dist, remote)
-            previous_release_file = get_previous_release_file(previous_repo_version, dist)
+            previous_release_file = previous_indices.release_file(dist)
             if (
                 previous_release_file
                 and previous_release_file.artifact_set_sha256 == artifact_set_sha256
@@ -135,8 +154,14 @@ def synchronize(remote_pk, repository_pk, mirror, optimize):
                 asyncio.run(pb.aincrement())
             return
 
-    first_stage = DebFirstStage(remote, optimize, mirror, previous_repo_version)
-    DebDeclarativeVersion(first_stage, repository, mirror=mirror).create()
+    first_stage = DebFirstStage(
+        remote, optimize, mirror, previous_repo_version, previous_indices=previous_indices
+    )
+    try:
+        DebDeclarativeVersion(first_stage, repository, mirror=mirror).create()
+    finally:
+        if first_stage.concurrency_limiter:
+            first_stage.concurrency_limiter.finish_reporting()
 
 
 class DeclarativeFailsafeArtifact(DeclarativeArtifact):
@@ -305,6 +330,39 @@ def _filter_split_components(release_file_string, remote_string, distribution):
     return sorted(set(filtered_components))
 
 
+def _filter_translation_paths(paths, translation_dir, languages, single_compression=False):
+    """
+    Returns the sorted list of translation file paths from paths, that are located in
+    translation_dir and belong to one of the whitespace separated languages. Other files in the
+    translation dir (like the 'Index' file) are always retained. If single_compression is set, only
+    the most strongly compressed variant of each translation file is retained.
+    """
+    wanted_languages = set(languages.split()) if languages else set()
+    translations = defaultdict(dict)
+    filtered_paths = []
+    for path in paths:
+        if os.path.dirname(path) != translation_dir:
+            continue
+        name, ext = os.path.splitext(os.path.basename(path))
+        if ext not in TRANSLATION_COMPRESSION_PREFERENCE:
+            name, ext = os.path.basename(path), ""
+        if not name.startswith("Translation-"):
+            filtered_paths.append(path)
+            continue
+        if name[len("Translation-") :] not in wanted_languages:
+            continue
+        translations[name][ext] = path
+
+    for variants in translations.values():
+        if single_compression:
+            ext = next(ext for ext in TRANSLATION_COMPRESSION_PREFERENCE if ext in variants)
+            filtered_paths.append(variants[ext])
+        else:
+            filtered_paths.extend(variants.values())
+
+    return sorted(filtered_paths)
+
+
 class DebUpdateReleaseFileAttributes(Stage):
     """
     This stage handles ReleaseFile content.
@@ -498,7 +556,16 @@ class DebFirstStage(Stage):
     The first stage of a pulp_deb sync pipeline.
     """
 
-    def __init__(self, remote, optimize, mirror, previous_repo_version, *args, **kwargs):
+    def __init__(
+        self,
+        remote,
+        optimize,
+        mirror,
+        previous_repo_version,
+        *args,
+        previous_indices=None,
+        **kwargs,
+    ):
         """
         The first stage of a pulp_deb sync pipeline.
 
@@ -506,6 +573,8 @@ class DebFirstStage(Stage):
             remote (AptRemote): The remote data to be used when syncing
             optimize (Boolean): If optimize mode is enabled or not
             previous_repo_version repository (RepositoryVersion): The previous RepositoryVersion.
+            previous_indices (PreviousVersionIndices): The metadata of the previous
+                RepositoryVersion used to skip unchanged metadata in optimize mode.
         """
         super().__init__(*args, **kwargs)
         self.remote = remote
@@ -517,6 +586,8 @@ class DebFirstStage(Stage):
             "optimize": optimize,
             "mirror": mirror,
         }
+        # The RemoteArtifacts of known source packages are only reused for the same remote URL:
+        self.sync_info["remote_url"] = remote.url
         self.parsed_url = urlparse(remote.url)
         if self.optimize:
             previous_sync_info = defaultdict(dict, self.previous_repo_version.info)
@@ -535,6 +606,12 @@ class DebFirstStage(Stage):
                 log.info(_("See https://github.com/pulp/pulp_deb/issues/631 for more information."))
                 self.optimize = False
                 self.sync_info["sync_options"]["optimize"] = False
+        if self.optimize and previous_indices is None:
+            previous_indices = PreviousVersionIndices(self.previous_repo_version)
+        self.previous_indices = previous_indices if self.optimize else None
+        self.concurrency_limiter = None
+        self._known_source_packages = None
+        self._known_source_packages_lock = asyncio.Lock()
 
     async def run(self):
         """
@@ -543,6 +620,10 @@ class DebFirstStage(Stage):
         if "md5" not in settings.ALLOWED_CONTENT_CHECKSUMS and settings.FORBIDDEN_CHECKSUM_WARNINGS:
             log.warning(_(NO_MD5_WARNING_MESSAGE))
 
+        if self.remote.adaptive_download_concurrency:
+            self.concurrency_limiter = self.remote.download_factory.concurrency_limiter
+            await self.concurrency_limiter.start_reporting()
+
         await asyncio.gather(
             *[self._handle_distribution(dist) for dist in self.remote.distributions.split()]
         )
@@ -585,12 +666,13 @@ class DebFirstStage(Stage):
         if release_file is None:
             return
         if self.optimize:
-            previous_release_file = await _get_previous_release_file(
-                self.previous_repo_version, stored_distribution
-            )
-            if previous_release_file.artifact_set_sha256 == release_file.artifact_set_sha256:
+            previous_release_file = self.previous_indices.release_file(stored_distribution)
+            if (
+                previous_release_file
+                and previous_release_file.artifact_set_sha256 == release_file.artifact_set_sha256
+            ):
                 await _readd_previous_package_indices(
-                    self.previous_repo_version, self.new_version, stored_distribution
+                    self.previous_indices, self.new_version, stored_distribution
                 )
                 message = 'ReleaseFile has not changed for distribution="{}". Skipping.'
                 log.info(_(message).format(distribution))
@@ -795,6 +877,11 @@ class DebFirstStage(Stage):
             pending_tasks.extend(
                 [self._handle_source_index(release_file, release_component, file_references)]
             )
+        # Handle translation files
+        if self.remote.languages:
+            pending_tasks.extend(
+                [self._handle_translation_files(release_file, release_component, file_references)]
+            )
         await asyncio.gather(*pending_tasks)
 
     async def _handle_flat_repo(
@@ -900,10 +987,11 @@ class DebFirstStage(Stage):
                 raise NoPackageIndexFile(relative_dir=package_index_dir)
 
         if self.optimize:
-            previous_package_index = await _get_previous_package_index(
-                self.previous_repo_version, relative_path
-            )
-            if previous_package_index.artifact_set_sha256 == package_index.artifact_set_sha256:
+            previous_package_index = self.previous_indices.package_index(relative_path)
+            if (
+                previous_package_index
+                and previous_package_index.artifact_set_sha256 == package_index.artifact_set_sha256
+            ):
                 message = 'PackageIndex has not changed for relative_path="{}". Skipped.'
                 log.info(_(message).format(relative_path))
                 async with ProgressReport(
@@ -1093,54 +1181,124 @@ class DebFirstStage(Stage):
             return
         # Interpret policy to download Artifacts or not
         deferred_download = self.remote.policy != Remote.IMMEDIATE
+        known_source_packages = await self._get_known_source_packages()
 
         # parse source_index
-        source_package_content_futures = []
+        pending_source_package_dcs = deque()
         source_index_artifact = await _get_main_artifact_blocking(source_index)
-        for source_paragraph in deb822.Sources.iter_paragraphs(
+        source_paragraphs = deb822.Sources.iter_paragraphs(
             source_index_artifact.file, use_apt_pkg=False
-        ):
-            try:
-                source_dir = source_paragraph["Directory"]
-                source_relpath = os.path.join(source_dir, "blah")
-                serializer = DscFile822Serializer.from822(data=source_paragraph)
-                serializer.is_valid(raise_exception=True)
-                source_content_unit = SourcePackage(
-                    relative_path=source_relpath,
-                    **serializer.validated_data,
+        )
+        while batch := list(islice(source_paragraphs, SOURCE_PACKAGE_LOOKUP_BATCH_SIZE)):
+            parsed_paragraphs = []
+            for source_paragraph in batch:
+                try:
+                    source_dir = source_paragraph["Directory"]
+                    source_relpath = os.path.join(source_dir, "blah")
+                    source_package_fields = _parse_source_paragraph(source_paragraph)
+                    known_source_package_pk = known_source_packages.get(
+                        (
+                            source_relpath,
+                            source_package_fields["source"],
+                            source_package_fields["version"],
+                            frozenset(
+                                (source_file["name"], source_file["sha256"])
+                                for source_file in source_paragraph["Checksums-Sha256"]
+                            ),
+                        )
+                    )
+                except (KeyError, ValidationError):
+                    log.warning(_("Ignoring invalid source paragraph. {}").format(source_paragraph))
+                    continue
+                parsed_paragraphs.append(
+                    (
+                        source_paragraph,
+                        source_dir,
+                        source_relpath,
+                        source_package_fields,
+                        known_source_package_pk,
+                    )
                 )
-                # Handle the dsc file content
-                source_das = []
-                for source_file in source_paragraph["Checksums-Sha256"]:
-                    source_relpath = os.path.join(source_dir, source_file["name"])
-                    log.debug(_("Downloading dsc content file {}.").format(source_file["name"]))
-
-                    source_path = os.path.join(self.parsed_url.path, source_relpath)
-                    source_da = DeclarativeArtifact(
-                        artifact=Artifact(
-                            size=int(source_file["size"]),
-                            **_get_source_checksums(source_paragraph, source_file["name"]),
-                        ),
-                        url=urlunparse(self.parsed_url._replace(path=source_path)),
-                        relative_path=source_relpath,
-                        remote=self.remote,
-                        deferred_download=deferred_download,
+            # Only the known source packages, that are emitted again, are loaded:
+            loaded_source_packages = await _load_source_packages(
+                [parsed[-1] for parsed in parsed_paragraphs if parsed[-1]]
+            )
+
+            for (
+                source_paragraph,
+                source_dir,
+                source_relpath,
+                source_package_fields,
+                known_source_package_pk,
+            ) in parsed_paragraphs:
+                if known_source_package_pk in loaded_source_packages:
+                    # Neither the source package nor its artifacts need processing again
+                    source_dc = DeclarativeContent(
+                        content=loaded_source_packages[known_source_package_pk]
+                    )
+                else:
+                    source_dc = self._to_source_package_dc(
+                        source_paragraph,
+                        SourcePackage(relative_path=source_relpath, **source_package_fields),
+                        source_dir,
+                        deferred_download,
                     )
-                    source_das.append(source_da)
-                source_dc = DeclarativeContent(content=source_content_unit, d_artifacts=source_das)
-                source_package_content_futures.append(source_dc)
+                pending_source_package_dcs.append(source_dc)
                 await self.put(source_dc)
-            except (KeyError, ValidationError):
-                log.warning(_("Ignoring invalid source paragraph. {}").format(source_paragraph))
-        # Assign dsc files to this release_component
-        for source_package_content_future in source_package_content_futures:
-            source_package = await source_package_content_future.resolution()
-            source_package_release_component_dc = DeclarativeContent(
-                content=SourcePackageReleaseComponent(
-                    source_package=source_package, release_component=release_component
-                )
+                # Assign dsc files to this release_component
+                if len(pending_source_package_dcs) > SOURCE_PACKAGE_RESOLUTION_WINDOW:
+                    await self._put_source_package_release_component(
+                        pending_source_package_dcs.popleft(), release_component
+                    )
+        while pending_source_package_dcs:
+            await self._put_source_package_release_component(
+                pending_source_package_dcs.popleft(), release_component
+            )
+
+    def _to_source_package_dc(self, source_paragraph, source_content_unit, source_dir, deferred):
+        # Handle the dsc file content
+        source_das = []
+        for source_file in source_paragraph["Checksums-Sha256"]:
+            source_relpath = os.path.join(source_dir, source_file["name"])
+            log.debug(_("Downloading dsc content file {}.").format(source_file["name"]))
+
+            source_path = os.path.join(self.parsed_url.path, source_relpath)
+            source_da = DeclarativeArtifact(
+                artifact=Artifact(
+                    size=int(source_file["size"]),
+                    **_get_source_checksums(source_paragraph, source_file["name"]),
+                ),
+                url=urlunparse(self.parsed_url._replace(path=source_path)),
+                relative_path=source_relpath,
+                remote=self.remote,
+                deferred_download=deferred,
+            )
+            source_das.append(source_da)
+        return DeclarativeContent(content=source_content_unit, d_artifacts=source_das)
+
+    async def _put_source_package_release_component(self, source_dc, release_component):
+        source_package = await source_dc.resolution()
+        source_package_release_component_dc = DeclarativeContent(
+            content=SourcePackageReleaseComponent(
+                source_package=source_package, release_component=release_component
             )
-            await self.put(source_package_release_component_dc)
+        )
+        await self.put(source_package_release_component_dc)
+
+    async def _get_known_source_packages(self):
+        async with self._known_source_packages_lock:
+            if self._known_source_packages is None:
+                previous_sync_info = self.previous_repo_version.info or {}
+                if previous_sync_info.get("remote_url") != self.remote.url:
+                    log.info(_("Processing all source packages, since the remote URL changed."))
+                    self._known_source_packages = {}
+                else:
+                    self._known_source_packages = await _get_known_source_packages(
+                        self.previous_repo_version,
+                        self.remote,
+                        deferred_download=self.remote.policy != Remote.IMMEDIATE,
+                    )
+        return self._known_source_packages
 
     async def _handle_installer_file_index(
         self, release_file, release_component, architecture, file_references
@@ -1161,7 +1319,6 @@ class DebFirstStage(Stage):
                 d_artifacts.append(self._to_d_artifact(relative_path, file_references[path]))
         if not d_artifacts:
             return
-        log.info(_("Downloading installer files from {}").format(installer_file_index_dir))
         content_unit = InstallerFileIndex(
             component=release_component.component,
             architecture=architecture,
@@ -1170,40 +1327,65 @@ class DebFirstStage(Stage):
         )
         d_content = DeclarativeContent(content=content_unit, d_artifacts=d_artifacts)
         installer_file_index = await self._create_unit(d_content)
+        if installer_file_index is None:
+            return
+        if self.optimize:
+            previous_index = self.previous_indices.installer_file_index(
+                installer_file_index.relative_path
+            )
+            if previous_index is not None and previous_index.pk == installer_file_index.pk:
+                log.info(
+                    _("Skipping installer files from unchanged {}").format(
+                        installer_file_index.relative_path
+                    )
+                )
+                return
+        log.info(_("Downloading installer files from {}").format(installer_file_index_dir))
         # Interpret policy to download Artifacts or not
         deferred_download = self.remote.policy != Remote.IMMEDIATE
-        # Parse installer file index
-        file_list = defaultdict(dict)
-        async for content_artifact in installer_file_index.contentartifact_set.all():
-            algorithm = InstallerFileIndex.FILE_ALGORITHM.get(
-                os.path.basename(content_artifact.relative_path)
+        # Parse the installer file index, reading all SUMS files alongside each other
+        sums_files = await _get_installer_sums_files(installer_file_index)
+        installer_file_digests = InstallerFileDigests(sums_files.keys())
+        for algorithm, filename, digest in _iter_installer_sums_files(sums_files):
+            digests = installer_file_digests.add(filename, algorithm, digest)
+            if digests is not None:
+                await self._put_installer_file(
+                    installer_file_index, filename, digests, deferred_download
+                )
+        for filename, digests in installer_file_digests.incomplete():
+            await self._put_installer_file(
+                installer_file_index, filename, digests, deferred_download
             )
-            if not algorithm:
-                continue
-            for line in await _get_content_artifact_file(content_artifact):
-                digest, filename = line.decode().strip().split(maxsplit=1)
-                filename = os.path.normpath(filename)
-                if filename in InstallerFileIndex.FILE_ALGORITHM:  # strangely they may appear here
-                    continue
-                file_list[filename][algorithm] = digest
-
-        for filename, digests in file_list.items():
-            relpath = os.path.join(installer_file_index.relative_path, filename)
-            urlpath = quote(os.path.join(self.parsed_url.path, relpath), safe=":/")
-            content_unit = GenericContent(sha256=digests["sha256"], relative_path=relpath)
-            d_artifact = DeclarativeArtifact(
-                artifact=Artifact(**digests),
-                url=urlunparse(self.parsed_url._replace(path=urlpath)),
-                relative_path=relpath,
-                remote=self.remote,
-                deferred_download=deferred_download,
+
+    async def _put_installer_file(self, installer_file_index, filename, digests, deferred_download):
+        if "sha256" not in digests:
+            log.warning(
+                _("Ignoring installer file {} without sha256 digest in {}").format(
+                    filename, installer_file_index.relative_path
+                )
             )
-            d_content = DeclarativeContent(content=content_unit, d_artifacts=[d_artifact])
-            await self.put(d_content)
+            return
+        relpath = os.path.join(installer_file_index.relative_path, filename)
+        urlpath = quote(os.path.join(self.parsed_url.path, relpath), safe=":/")
+        content_unit = GenericContent(sha256=digests["sha256"], relative_path=relpath)
+        d_artifact = DeclarativeArtifact(
+            artifact=Artifact(**digests),
+            url=urlunparse(self.parsed_url._replace(path=urlpath)),
+            relative_path=relpath,
+            remote=self.remote,
+            deferred_download=deferred_download,
+        )
+        d_content = DeclarativeContent(content=content_unit, d_artifacts=[d_artifact])
+        await self.put(d_content)
 
     async def _handle_translation_files(self, release_file, release_component, file_references):
         translation_dir = os.path.join(release_component.plain_component, "i18n")
-        paths = [path for path in file_references.keys() if path.startswith(translation_dir)]
+        paths = _filter_translation_paths(
+            file_references.keys(),
+            translation_dir,
+            self.remote.languages,
+            self.remote.translation_single_compression,
+        )
         translations = {}
         for path in paths:
             relative_path = os.path.join(os.path.dirname(release_file.relative_path), path)
@@ -1216,51 +1398,206 @@ class DebFirstStage(Stage):
             translations[key]["d_artifacts"].append(d_artifact)
 
         for relative_path, translation in translations.items():
-            content_unit = GenericContent(sha256=translation["sha256"], relative_path=relative_path)
+            # If the uncompressed file is not referenced, we identify the translation by the
+            # checksum of the compressed variant we are syncing instead:
+            sha256 = translation["sha256"] or translation["d_artifacts"][0].artifact.sha256
+            content_unit = GenericContent(sha256=sha256, relative_path=relative_path)
             await self.put(
                 DeclarativeContent(content=content_unit, d_artifacts=translation["d_artifacts"])
             )
 
 
 @sync_to_async
-def _get_content_artifact_file(content_artifact):
-    return content_artifact.artifact.file
+def _get_installer_sums_files(installer_file_index):
+    """
+    Map the algorithms of installer_file_index to the files of the corresponding SUMS artifacts.
+    """
+    sums_files = {}
+    for content_artifact in installer_file_index.contentartifact_set.select_related("artifact"):
+        algorithm = InstallerFileIndex.FILE_ALGORITHM.get(
+            os.path.basename(content_artifact.relative_path)
+        )
+        if algorithm:
+            sums_files[algorithm] = content_artifact.artifact.file
+    return sums_files
 
 
-@sync_to_async
-def _readd_previous_package_indices(previous_version, new_version, distribution):
-    new_version.add_content(
-        previous_version.get_content(
-            PackageIndex.objects.filter(relative_path__contains=distribution)
+def _iter_installer_sums_files(sums_files):
+    """
+    Yield (algorithm, filename, digest) for the lines of all SUMS files.
+
+    The files are read alongside each other, one line at a time, since they usually list the
+    installer files in the same order. That way, the digests of most files are complete early on.
+    """
+    iterators = {algorithm: iter(sums_file) for algorithm, sums_file in sums_files.items()}
+    while iterators:
+        for algorithm, iterator in list(iterators.items()):
+            line = next(iterator, None)
+            if line is None:
+                del iterators[algorithm]
+                continue
+            if not line.strip():
+                continue
+            digest, filename = line.decode().strip().split(maxsplit=1)
+            filename = os.path.normpath(filename)
+            if filename in InstallerFileIndex.FILE_ALGORITHM:  # strangely they may appear here
+                continue
+            yield algorithm, filename, digest
+
+
+class InstallerFileDigests:
+    """
+    Merges the digests of installer files, that are listed in several SUMS files.
+    """
+
+    def __init__(self, algorithms):
+        self.algorithms = frozenset(algorithms)
+        self.pending = defaultdict(dict)
+
+    def add(self, filename, algorithm, digest):
+        """
+        Record digest for filename and return all its digests once every algorithm is known.
+        """
+        digests = self.pending[filename]
+        digests[algorithm] = digest
+        if self.algorithms.issubset(digests):
+            return self.pending.pop(filename)
+        return None
+
+    def incomplete(self):
+        """
+        Return (filename, digests) for the files, that were not listed in every SUMS file.
+        """
+        pending, self.pending = self.pending, defaultdict(dict)
+        return list(pending.items())
+
+
+class PreviousVersionIndices:
+    """
+    The ReleaseFile and index content of the previous RepositoryVersion.
+
+    All units are loaded up front, so the skip decisions of optimized syncs can be answered using
+    exact lookups without issuing any further queries.
+    """
+
+    def __init__(self, previous_version):
+        self.release_files = defaultdict(list)
+        for release_file in previous_version.get_content(ReleaseFile.objects.all()):
+            self.release_files[release_file.distribution].append(release_file)
+
+        self.indices = defaultdict(list)
+        for index_class in (PackageIndex, InstallerFileIndex, SourceIndex):
+            for index in previous_version.get_content(index_class.objects.all()):
+                self.indices[index.relative_path].append(index)
+
+    def release_file(self, distribution):
+        """
+        Return the previous ReleaseFile for distribution, or None if there is none.
+        """
+        release_files = self.release_files.get(distribution, [])
+        if len(release_files) > 1:
+            raise DuplicateReleaseFile(count=len(release_files))
+        return next(iter(release_files), None)
+
+    def package_index(self, relative_path):
+        """
+        Return the previous PackageIndex at relative_path, or None if there is none.
+        """
+        package_indices = [
+            index
+            for index in self.indices.get(relative_path, [])
+            if isinstance(index, PackageIndex)
+        ]
+        if len(package_indices) > 1:
+            raise DuplicatePackageIndex(count=len(package_indices))
+        return next(iter(package_indices), None)
+
+    def installer_file_index(self, relative_path):
+        """
+        Return the previous InstallerFileIndex at relative_path, or None if there is none.
+        """
+        return next(
+            (
+                index
+                for index in self.indices.get(relative_path, [])
+                if isinstance(index, InstallerFileIndex)
+            ),
+            None,
         )
-    )
+
+    def index_pks_for_distribution(self, distribution):
+        """
+        Return the pks of all previous PackageIndex and InstallerFileIndex units, that are located
+        below the directory of the previous ReleaseFile for distribution.
+        """
+        release_file = self.release_file(distribution)
+        if release_file is None:
+            return []
+        release_dir = os.path.dirname(release_file.relative_path)
+        prefix = release_dir + "/" if release_dir else ""
+        return [
+            index.pk
+            for relative_path, indices in self.indices.items()
+            if relative_path.startswith(prefix)
+            for index in indices
+            if isinstance(index, (PackageIndex, InstallerFileIndex))
+        ]
+
+
+@sync_to_async
+def _readd_previous_package_indices(previous_indices, new_version, distribution):
     new_version.add_content(
-        previous_version.get_content(
-            InstallerFileIndex.objects.filter(relative_path__contains=distribution)
-        )
+        Content.objects.filter(pk__in=previous_indices.index_pks_for_distribution(distribution))
     )
 
 
-def get_previous_release_file(previous_version, distribution):
-    previous_release_file_qs = previous_version.get_content(
-        ReleaseFile.objects.filter(distribution=distribution)
-    )
-    if previous_release_file_qs.count() > 1:
-        raise DuplicateReleaseFile(count=previous_release_file_qs.count())
-    return previous_release_file_qs.first()
+@sync_to_async
+def _get_known_source_packages(previous_version, remote, deferred_download):
+    """
+    Map the source packages of previous_version by their relative_path, source, version and the set
+    of their file names and sha256 digests, to their pks.
+
+    Source packages are only included if each of their files is either available locally, or, if
+    the sync uses deferred_download, can be downloaded using remote. Such source packages need not
+    be processed again by a sync. Syncs with the immediate policy must download all files, that
+    are not available locally.
+    """
+    source_package_pks = previous_version.get_content(SourcePackage.objects.all()).values("pk")
+    files = defaultdict(set)
+    missing_files = {}
+    for content_artifact_pk, content_pk, relative_path, sha256 in ContentArtifact.objects.filter(
+        content__in=source_package_pks
+    ).values_list("pk", "content_id", "relative_path", "artifact__sha256"):
+        if sha256:
+            files[content_pk].add((os.path.basename(relative_path), sha256))
+        else:
+            missing_files[content_artifact_pk] = (content_pk, os.path.basename(relative_path))
 
+    if deferred_download:
+        for content_artifact_pk, sha256 in RemoteArtifact.objects.filter(
+            content_artifact__in=list(missing_files), remote=remote
+        ).values_list("content_artifact_id", "sha256"):
+            if content_artifact_pk in missing_files and sha256:
+                content_pk, name = missing_files.pop(content_artifact_pk)
+                files[content_pk].add((name, sha256))
 
-_get_previous_release_file = sync_to_async(get_previous_release_file)
+    incomplete_pks = {content_pk for content_pk, _name in missing_files.values()}
+    return {
+        (relative_path, source, version, frozenset(files[pk])): pk
+        for pk, relative_path, source, version in SourcePackage.objects.filter(
+            pk__in=files.keys() - incomplete_pks
+        ).values_list("pk", "relative_path", "source", "version")
+    }
 
 
 @sync_to_async
-def _get_previous_package_index(previous_version, relative_path):
-    previous_package_index_qs = previous_version.get_content(
-        PackageIndex.objects.filter(relative_path=relative_path)
-    )
-    if previous_package_index_qs.count() > 1:
-        raise DuplicatePackageIndex(count=previous_package_index_qs.count())
-    return previous_package_index_qs.first()
+def _load_source_packages(pks):
+    """
+    Return the SourcePackages with the given pks, by pk.
+    """
+    if not pks:
+        return {}
+    return SourcePackage.objects.in_bulk(pks)
 
 
 @sync_to_async
@@ -1366,6 +1703,44 @@ def _get_artifact_set_sha256(d_content, supported_artifacts):
     return hashlib.sha256(hash_string.encode("utf-8")).hexdigest()
 
 
+def _parse_source_paragraph(source_paragraph):
+    """
+    Returns the SourcePackage fields for a paragraph from a Sources index.
+
+    Well formed paragraphs are translated directly, which is much cheaper than validating them
+    using the DscFile822Serializer. Anything else falls back to the serializer, which raises a
+    ValidationError for invalid paragraphs.
+    """
+    fields = {}
+    for field_name, deb_field in DscFile822Serializer.TRANSLATION_DICT.items():
+        if field_name in SOURCE_PACKAGE_CHECKSUM_FIELDS:
+            continue
+        if field_name == "source":
+            # Sources index paragraphs use 'Package' instead of 'Source'
+            deb_field = "Package"
+        if deb_field not in source_paragraph:
+            continue
+        value = source_paragraph[deb_field].strip()
+        if not value or "\x00" in value:
+            break
+        fields[field_name] = value
+    else:
+        if (
+            all(field_name in fields for field_name in REQUIRED_SOURCE_PACKAGE_FIELDS)
+            and "Files" in source_paragraph
+            and "Checksums-Sha256" in source_paragraph
+        ):
+            return fields
+
+    serializer = DscFile822Serializer.from822(data=source_paragraph)
+    serializer.is_valid(raise_exception=True)
+    return {
+        field_name: value
+        for field_name, value in serializer.validated_data.items()
+        if field_name not in SOURCE_PACKAGE_CHECKSUM_FIELDS
+    }
+
+
 def _get_checksums(unit_dict):
     """
     Filters the unit_dict provided to retain only checksum fields present in the
@@ -1434,6 +1809,8 @@ def gen_remote_options(remote):
         "sync_installer": remote.sync_installer,
         "gpgkey": remote.gpgkey,
         "ignore_missing_package_indices": remote.ignore_missing_package_indices,
+        "languages": remote.languages,
+        "translation_single_compression": remote.translation_single_compression,
     }
 
 
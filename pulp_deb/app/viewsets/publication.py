@@ -1,6 +1,7 @@
 from gettext import gettext as _  # noqa
 
 from drf_spectacular.utils import extend_schema
+from rest_framework.decorators import action
 
 from pulpcore.plugin.serializers import AsyncOperationResponseSerializer
 from pulpcore.plugin.tasking import dispatch
@@ -156,6 +157,15 @@ class AptPublicationViewSet(PublicationViewSet, RolesMixin):
                 "effect": "allow",
                 "condition": "has_model_or_domain_or_obj_perms:deb.view_aptpublication",
             },
+            {
+                "action": ["resign"],
+                "principal": "authenticated",
+                "effect": "allow",
+                "condition": [
+                    "has_model_or_domain_perms:deb.add_aptpublication",
+                    "has_model_or_domain_or_obj_perms:deb.view_aptpublication",
+                ],
+            },
             {
                 "action": ["destroy"],
                 "principal": "authenticated",
@@ -218,6 +228,13 @@ class AptPublicationViewSet(PublicationViewSet, RolesMixin):
         )
         publish_legacy_release_files = serializer.validated_data.get("publish_legacy_release_files")
         layout = serializer.validated_data.get("layout")
+        incremental = serializer.validated_data.get("incremental")
+        hybrid_format = serializer.validated_data.get("hybrid_format")
+        publish_contents = serializer.validated_data.get("publish_contents")
+        publish_translations = serializer.validated_data.get("publish_translations")
+        publish_pdiffs = serializer.validated_data.get("publish_pdiffs")
+        distributions = serializer.validated_data.get("distributions")
+        overlay = serializer.validated_data.get("overlay")
 
         kwargs = {
             "repository_version_pk": repository_version.pk,
@@ -228,6 +245,20 @@ class AptPublicationViewSet(PublicationViewSet, RolesMixin):
             "publish_legacy_release_files": publish_legacy_release_files,
             "layout": layout,
         }
+        if incremental:
+            kwargs["incremental"] = True
+        if hybrid_format:
+            kwargs["hybrid_format"] = True
+        if publish_contents:
+            kwargs["publish_contents"] = True
+        if publish_translations:
+            kwargs["publish_translations"] = True
+        if publish_pdiffs:
+            kwargs["publish_pdiffs"] = True
+        if distributions:
+            kwargs["distributions"] = distributions
+        if overlay:
+            kwargs["overlay"] = True
         if checkpoint:
             kwargs["checkpoint"] = True
         result = dispatch(
@@ -237,6 +268,31 @@ class AptPublicationViewSet(PublicationViewSet, RolesMixin):
         )
         return OperationPostponedResponse(result, request)
 
+    @extend_schema(
+        description="Trigger an asynchronous task to create a copy of the publication with newly "
+        "signed Release files",
+        summary="Re-sign a publication",
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    @action(
+        detail=True, methods=["post"], serializer_class=serializers.AptPublicationResignSerializer
+    )
+    def resign(self, request, pk, **kwargs):
+        """
+        Dispatches a task re-signing the publication.
+        """
+        publication = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        signing_service = serializer.validated_data["signing_service"]
+
+        result = dispatch(
+            func=tasks.resign_publication,
+            shared_resources=[publication.repository_version.repository],
+            kwargs={"publication_pk": publication.pk, "signing_service_pk": signing_service.pk},
+        )
+        return OperationPostponedResponse(result, request)
+
 
 class AptDistributionViewSet(DistributionViewSet, RolesMixin):
     # The doc string is a top level element of the user facing REST API documentation:
@@ -289,6 +345,15 @@ class AptDistributionViewSet(DistributionViewSet, RolesMixin):
                     "deb.view_aptrepository",
                 ],
             },
+            {
+                "action": ["resign"],
+                "principal": "authenticated",
+                "effect": "allow",
+                "condition": [
+                    "has_model_or_domain_perms:deb.add_aptpublication",
+                    "has_model_or_domain_perms:deb.change_aptdistribution",
+                ],
+            },
             {
                 "action": ["destroy"],
                 "principal": "authenticated",
@@ -328,3 +393,31 @@ class AptDistributionViewSet(DistributionViewSet, RolesMixin):
             "deb.view_aptdistribution",
         ],
     }
+
+    @extend_schema(
+        description="Trigger an asynchronous task to re-sign the Release files of the "
+        "publications served by the distributions",
+        summary="Re-sign the publications of distributions",
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    @action(
+        detail=False, methods=["post"], serializer_class=serializers.AptDistributionResignSerializer
+    )
+    def resign(self, request, **kwargs):
+        """
+        Dispatches a task re-signing the publications served by the distributions.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        distributions = serializer.validated_data["distributions"]
+        signing_service = serializer.validated_data["signing_service"]
+
+        result = dispatch(
+            func=tasks.resign_distributions,
+            exclusive_resources=distributions,
+            kwargs={
+                "distribution_pks": [distribution.pk for distribution in distributions],
+                "signing_service_pk": signing_service.pk,
+            },
+        )
+        return OperationPostponedResponse(result, request)
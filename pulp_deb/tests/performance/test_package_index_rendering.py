@@ -0,0 +1,80 @@
+"""Benchmark rendering Packages paragraphs with and without the Package822Serializer."""
+
+import time
+from io import BytesIO
+
+from django.test import TestCase
+
+from pulpcore.plugin.models import RemoteArtifact
+
+from pulp_deb.app.constants import LAYOUT_TYPES
+from pulp_deb.app.models import Package
+from pulp_deb.app.package_index import PACKAGE_INDEX_VALUES, render_package_paragraph
+from pulp_deb.app.serializers import Package822Serializer
+
+PACKAGE_COUNT = 1000
+
+
+class BenchmarkRenderPackageParagraph(TestCase):
+    """
+    Compare the time needed to render the Packages paragraphs of PACKAGE_COUNT packages.
+    """
+
+    def setUp(self):
+        """Setup database fixtures."""
+        for number in range(PACKAGE_COUNT):
+            Package(
+                package=f"package{number}",
+                source="benchmark",
+                version="1.0-1",
+                architecture="amd64",
+                section="misc",
+                priority="optional",
+                installed_size=number,
+                maintainer="Benchmark <benchmark@example.com>",
+                description="A benchmark package\n with a long description.",
+                depends="libc6 (>= 2.36)",
+                custom_fields={"Phased-Update-Percentage": "20"},
+                sha256=f"{number:064x}",
+                relative_path=f"package{number}_1.0-1_amd64.deb",
+            ).save()
+        self.packages = Package.objects.filter(source="benchmark").order_by("pk")
+        self.remote_artifact_dict = {
+            package.sha256: RemoteArtifact(size=1024, sha256=package.sha256)
+            for package in self.packages
+        }
+
+    def test_benchmark(self):
+        start = time.perf_counter()
+        expected = BytesIO()
+        for package in self.packages:
+            Package822Serializer(package, context={"request": None}).to822(
+                "main",
+                remote_artifact_dict=self.remote_artifact_dict,
+                layout=LAYOUT_TYPES.NESTED_ALPHABETICALLY,
+                basename_override=package.relative_path,
+            ).dump(expected)
+            expected.write(b"\n")
+        serializer_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rendered = BytesIO()
+        for row in self.packages.values(*PACKAGE_INDEX_VALUES, "relative_path"):
+            rendered.write(
+                render_package_paragraph(
+                    row,
+                    "main",
+                    self.remote_artifact_dict[row["sha256"]],
+                    LAYOUT_TYPES.NESTED_ALPHABETICALLY,
+                    row["relative_path"],
+                )
+                + b"\n"
+            )
+        renderer_time = time.perf_counter() - start
+
+        print(
+            f"\n->  Rendering {PACKAGE_COUNT} Packages paragraphs => "
+            f"Package822Serializer (s): {serializer_time:.3f} | "
+            f"render_package_paragraph (s): {renderer_time:.3f}"
+        )
+        self.assertEqual(rendered.getvalue(), expected.getvalue())
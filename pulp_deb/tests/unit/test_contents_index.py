@@ -0,0 +1,90 @@
+import io
+import tarfile
+import zlib
+
+from django.test import TestCase
+
+from pulp_deb.app.contents_index import (
+    contents_location,
+    package_file_paths,
+    write_contents_index,
+)
+
+
+def _ar_member(name, data):
+    header = "{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n".format(name, 0, 0, 0, 100644, len(data))
+    return header.encode() + data + (b"\n" if len(data) % 2 else b"")
+
+
+def _deb(paths):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz") as tar:
+        for path in paths:
+            if path.endswith("/"):
+                member = tarfile.TarInfo(path.rstrip("/"))
+                member.type = tarfile.DIRTYPE
+                tar.addfile(member)
+            else:
+                member = tarfile.TarInfo(path)
+                tar.addfile(member, io.BytesIO(b""))
+    control = io.BytesIO()
+    with tarfile.open(fileobj=control, mode="w:gz") as tar:
+        paragraph = b"Package: aegir\nVersion: 1.0\nArchitecture: all\n"
+        member = tarfile.TarInfo("./control")
+        member.size = len(paragraph)
+        tar.addfile(member, io.BytesIO(paragraph))
+    return io.BytesIO(
+        b"!<arch>\n"
+        + _ar_member("debian-binary", b"2.0\n")
+        + _ar_member("control.tar.gz", control.getvalue())
+        + _ar_member("data.tar.gz", data.getvalue())
+    )
+
+
+class _FakeFileListCache:
+    def __init__(self, file_lists):
+        self.file_lists_by_pk = {
+            pk: zlib.compress(b"\n".join(paths)) for pk, paths in file_lists.items()
+        }
+
+    def file_lists(self, package_pks):
+        return {pk: self.file_lists_by_pk[pk] for pk in package_pks if pk in self.file_lists_by_pk}
+
+
+class TestContentsIndex(TestCase):
+    """
+    Tests for listing the files of packages and merging them into Contents indices.
+    """
+
+    def test_package_file_paths(self):
+        deb = _deb(["./", "./usr/", "./usr/bin/", "./usr/bin/aegir", "./etc/aegir.conf"])
+        self.assertEqual(package_file_paths(deb), [b"etc/aegir.conf", b"usr/bin/aegir"])
+
+    def test_contents_location(self):
+        self.assertEqual(contents_location("utils", "aegir"), "utils/aegir")
+        self.assertEqual(contents_location("non-free/games", "aegir"), "non-free/games/aegir")
+        self.assertEqual(contents_location(None, "aegir"), "aegir")
+
+    def test_write_contents_index(self):
+        file_list_cache = _FakeFileListCache(
+            {
+                1: [b"etc/fenrir", b"usr/bin/fenrir", b"usr/share/doc/common"],
+                2: [b"usr/bin/aegir", b"usr/share/doc/common"],
+                3: [],
+            }
+        )
+        index_file = io.BytesIO()
+        write_contents_index(
+            index_file,
+            [(1, "utils/fenrir"), (2, "games/aegir"), (3, "misc/empty"), (4, "misc/remote")],
+            file_list_cache,
+        )
+        self.assertEqual(
+            [line.split() for line in index_file.getvalue().splitlines()],
+            [
+                [b"etc/fenrir", b"utils/fenrir"],
+                [b"usr/bin/aegir", b"games/aegir"],
+                [b"usr/bin/fenrir", b"utils/fenrir"],
+                [b"usr/share/doc/common", b"games/aegir,utils/fenrir"],
+            ],
+        )
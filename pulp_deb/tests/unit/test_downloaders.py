@@ -0,0 +1,59 @@
+import asyncio
+
+from django.test import TestCase
+
+from pulp_deb.app.downloaders import AdaptiveConcurrencyLimiter, next_download_concurrency
+
+
+class TestNextDownloadConcurrency(TestCase):
+    """
+    Tests the next_download_concurrency() helper function.
+    """
+
+    def test_raise_while_throughput_improves(self):
+        """
+        Test that the concurrency is raised while the throughput improves.
+        """
+        self.assertEqual(next_download_concurrency(10, 100, True, 2000, None, 0.1, None), 12)
+        self.assertEqual(next_download_concurrency(12, 100, True, 3000, 2000, 0.1, 0.1), 15)
+        self.assertEqual(next_download_concurrency(98, 100, True, 3000, 2000, 0.1, 0.1), 100)
+
+    def test_hold_without_improvement(self):
+        """
+        Test that the concurrency is retained if throughput stagnates or is not limited by it.
+        """
+        self.assertEqual(next_download_concurrency(12, 100, True, 2010, 2000, 0.1, 0.1), 12)
+        self.assertEqual(next_download_concurrency(12, 100, False, 3000, 2000, 0.1, 0.1), 12)
+
+    def test_back_off_on_rising_latency(self):
+        """
+        Test that the concurrency is lowered if the latency rises sharply.
+        """
+        self.assertEqual(next_download_concurrency(12, 100, True, 3000, 2000, 0.5, 0.1), 9)
+        self.assertEqual(next_download_concurrency(1, 100, True, 3000, 2000, 0.5, 0.1), 1)
+
+
+class TestAdaptiveConcurrencyLimiter(TestCase):
+    """
+    Tests the AdaptiveConcurrencyLimiter.
+    """
+
+    def test_initial_limit(self):
+        """
+        Test that the initial limit is bound by the maximum.
+        """
+        self.assertEqual(AdaptiveConcurrencyLimiter(initial=10, maximum=100).limit, 10)
+        self.assertEqual(AdaptiveConcurrencyLimiter(initial=200, maximum=100).limit, 100)
+
+    def test_back_off_on_throttling(self):
+        """
+        Test that the limit is halved only once for a burst of throttled responses.
+        """
+        limiter = AdaptiveConcurrencyLimiter(initial=20, maximum=100)
+
+        async def throttle():
+            await limiter.record_throttled(429)
+            await limiter.record_throttled(503)
+
+        asyncio.run(throttle())
+        self.assertEqual(limiter.limit, 10)
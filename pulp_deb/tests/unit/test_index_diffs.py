@@ -0,0 +1,83 @@
+import io
+import re
+
+from django.test import TestCase
+
+from pulp_deb.app.index_diffs import StanzaDigests, ed_diff, render_diff_index
+
+
+def _apply_ed_script(data, script):
+    """Apply an ed script, as written by ed_diff(), to data like APT's rred method does."""
+    lines = data.splitlines(keepends=True)
+    script_lines = io.BytesIO(script).readlines()
+    i = 0
+    while i < len(script_lines):
+        first, last, command = re.fullmatch(rb"(\d+)(?:,(\d+))?([acd])\n", script_lines[i]).groups()
+        first = int(first)
+        last = int(last) if last else first
+        i += 1
+        text = []
+        if command != b"d":
+            while script_lines[i] != b".\n":
+                text.append(script_lines[i])
+                i += 1
+            i += 1
+        if command == b"a":
+            lines[first:first] = text
+        else:
+            lines[first - 1 : last] = text
+    return b"".join(lines)
+
+
+def _packages_file(*names):
+    return b"".join(
+        b"Package: %s\nVersion: 1.0\nDescription: The %s.\n .\n second paragraph\n\n" % (name, name)
+        for name in names
+    )
+
+
+class TestIndexDiffs(TestCase):
+    """
+    Tests for computing and listing the PDiffs of index files.
+    """
+
+    def assertPatches(self, old, new):
+        new_file = io.BytesIO(new)
+        script = ed_diff(StanzaDigests(io.BytesIO(old)), StanzaDigests(new_file), new_file)
+        self.assertEqual(_apply_ed_script(old, script), new)
+        return script
+
+    def test_stanza_digests(self):
+        stanzas = StanzaDigests(io.BytesIO(_packages_file(b"aegir", b"fenrir")))
+        self.assertEqual(len(stanzas.digests), 2)
+        self.assertEqual(stanzas.lines, [0, 6, 12])
+        self.assertEqual(stanzas.offsets[-1], len(_packages_file(b"aegir", b"fenrir")))
+
+    def test_ed_diff(self):
+        old = _packages_file(b"aegir", b"fenrir", b"hel", b"loki")
+        self.assertEqual(self.assertPatches(old, old), b"")
+        self.assertEqual(
+            self.assertPatches(old, _packages_file(b"aegir", b"hel", b"loki")), b"7,12d\n"
+        )
+        self.assertPatches(old, _packages_file(b"aegir", b"baldr", b"fenrir", b"hel", b"loki"))
+        self.assertPatches(old, _packages_file(b"baldr", b"fenrir", b"hel", b"odin"))
+        self.assertPatches(old, _packages_file(b"tyr"))
+        self.assertPatches(old, b"")
+        self.assertPatches(b"", old)
+
+    def test_render_diff_index(self):
+        index = render_diff_index(
+            ({"sha256": "cc"}, 300),
+            [({"sha256": "aa"}, 200, "T-2-F-1")],
+            [({"sha256": "bb"}, 100, "T-2-F-1")],
+            [({"sha256": "dd"}, 50, "T-2-F-1.gz")],
+            ["sha256"],
+        )
+        self.assertEqual(
+            index.decode(),
+            "SHA256-Current: cc 300\n"
+            "SHA256-History:\n aa 200 T-2-F-1\n"
+            "SHA256-Patches:\n bb 100 T-2-F-1\n"
+            "SHA256-Download:\n dd 50 T-2-F-1.gz\n"
+            "X-Patch-Precedence: merged\n",
+        )
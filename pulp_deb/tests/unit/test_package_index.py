@@ -0,0 +1,184 @@
+import pickle
+from io import BytesIO
+
+from django.test import TestCase, override_settings
+
+from pulpcore.plugin.models import Artifact, RemoteArtifact
+
+from pulp_deb.app.constants import LAYOUT_CHOICES, LAYOUT_TYPES
+from pulp_deb.app.models import Package, RenderedPackageParagraph
+from pulp_deb.app.package_index import (
+    PACKAGE_INDEX_VALUES,
+    PackageParagraphCache,
+    evict_package_paragraphs,
+    paragraph_checksums,
+    render_package_paragraph,
+)
+from pulp_deb.app.serializers import Package822Serializer
+
+
+class TestRenderPackageParagraph(TestCase):
+    """
+    Tests, that render_package_paragraph() is equivalent to the Package822Serializer.
+    """
+
+    def setUp(self):
+        """Setup database fixtures."""
+        self.packages = [
+            Package(
+                package="aegir",
+                version="0.1-edda0",
+                architecture="sea",
+                essential=True,
+                maintainer="Utgardloki",
+                description="A sea jötunn associated with the ocean.",
+                sha256="eeff11",
+                relative_path="aegir_0.1-edda0_sea.deb",
+            ),
+            Package(
+                package="libfenrir1",
+                source="fenrir (1:2.0-1)",
+                version="1:2.0-1+b1",
+                architecture="amd64",
+                section="wolves",
+                priority="optional",
+                essential=False,
+                build_essential=True,
+                installed_size=1024,
+                maintainer="Loki <loki@asgard.example>",
+                description="A monstrous wolf\n which is bound until Ragnarök.\n .\n Beware.",
+                depends="libc6 (>= 2.36), gleipnir",
+                multi_arch="same",
+                custom_fields={
+                    "Section": "chains",
+                    "Phased-Update-Percentage": "20",
+                    "X-Empty": "",
+                },
+                sha256="aabbcc",
+                relative_path="libfenrir1_2.0-1+b1_amd64.deb",
+            ),
+        ]
+        for package in self.packages:
+            package.save()
+        self.artifact_dict = {
+            "eeff11": Artifact(size=42, md5="aabb", sha1="ccdd", sha256="eeff11"),
+        }
+        self.remote_artifact_dict = {
+            "aabbcc": RemoteArtifact(size=4711, sha256="aabbcc"),
+        }
+
+    def assert_equivalent(self, package, component, layout, basename):
+        # The database reorders the keys of custom_fields, so serialize the saved package:
+        package = Package.objects.get(pk=package.pk)
+        expected = BytesIO()
+        Package822Serializer(package, context={"request": None}).to822(
+            component,
+            self.artifact_dict,
+            self.remote_artifact_dict,
+            layout=layout,
+            basename_override=basename,
+        ).dump(expected)
+        row = Package.objects.filter(pk=package.pk).values(*PACKAGE_INDEX_VALUES).get()
+        artifact = self.artifact_dict.get(package.sha256) or self.remote_artifact_dict.get(
+            package.sha256
+        )
+        self.assertEqual(
+            render_package_paragraph(row, component, artifact, layout, basename),
+            expected.getvalue(),
+        )
+
+    def test_equivalence(self):
+        for package in self.packages:
+            for layout, _ in LAYOUT_CHOICES:
+                for component in ("", "main", "updates/main"):
+                    for basename in (None, package.relative_path):
+                        with self.subTest(
+                            package=package.package,
+                            layout=layout,
+                            component=component,
+                            basename=basename,
+                        ):
+                            self.assert_equivalent(package, component, layout, basename)
+
+    def test_without_artifact(self):
+        self.artifact_dict = {}
+        self.remote_artifact_dict = {}
+        self.assert_equivalent(self.packages[0], "main", LAYOUT_TYPES.NESTED_ALPHABETICALLY, None)
+
+    def test_invalid_value(self):
+        row = Package.objects.filter(pk=self.packages[0].pk).values(*PACKAGE_INDEX_VALUES).get()
+        row["description"] = "A sea jötunn.\n\n Blank lines are not allowed."
+        with self.assertRaises(ValueError):
+            render_package_paragraph(row, "main")
+
+
+@override_settings(PACKAGE_PARAGRAPH_CACHE_MAX_ENTRIES=2)
+class TestPackageParagraphCache(TestCase):
+    """
+    Tests for the PackageParagraphCache.
+    """
+
+    def setUp(self):
+        """Setup database fixtures."""
+        self.packages = [
+            Package(
+                package=name,
+                version="1.0",
+                architecture="all",
+                maintainer="Odin",
+                description="A raven.",
+                sha256=sha256,
+                relative_path="{}_1.0_all.deb".format(name),
+            )
+            for name, sha256 in (("huginn", "aa11"), ("muninn", "bb22"), ("geri", "cc33"))
+        ]
+        for package in self.packages:
+            package.save()
+        self.rows = list(
+            Package.objects.filter(pk__in=[package.pk for package in self.packages])
+            .order_by("package")
+            .values(*PACKAGE_INDEX_VALUES, "relative_path")
+        )
+        self.artifact = Artifact(size=42, md5="aabb", sha1="ccdd", sha256="aa11")
+
+    def render_all(self, component="main"):
+        cache = PackageParagraphCache(component, LAYOUT_TYPES.NESTED_ALPHABETICALLY)
+        cache.load([row["pk"] for row in self.rows])
+        paragraphs = [cache.render(row, self.artifact, row["relative_path"]) for row in self.rows]
+        cache.save()
+        return paragraphs
+
+    def test_paragraph_checksums(self):
+        self.assertEqual(paragraph_checksums(None), "")
+        self.assertEqual(paragraph_checksums(self.artifact), "md5,sha1,sha256")
+        self.assertEqual(paragraph_checksums(RemoteArtifact(size=1, sha256="aa11")), "sha256")
+
+    def test_cached_paragraphs_are_reused(self):
+        expected = [
+            render_package_paragraph(row, "main", self.artifact, basename=row["relative_path"])
+            for row in self.rows
+        ]
+        self.assertEqual(self.render_all(), expected)
+        self.assertEqual(RenderedPackageParagraph.objects.count(), len(self.rows))
+
+        RenderedPackageParagraph.objects.update(paragraph=b"Package: cached")
+        self.assertEqual(self.render_all(), [b"Package: cached"] * len(self.rows))
+        # A different component is a cache miss:
+        self.assertEqual(
+            self.render_all("contrib")[0], expected[0].replace(b"/main/", b"/contrib/")
+        )
+
+    def test_pickled_cache_keeps_pending_entries_only(self):
+        cache = PackageParagraphCache("main", LAYOUT_TYPES.NESTED_ALPHABETICALLY)
+        cache.render(self.rows[0], self.artifact, self.rows[0]["relative_path"])
+        unpickled = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(unpickled.paragraphs, {})
+        self.assertEqual(unpickled.new_entries, cache.new_entries)
+
+    def test_eviction(self):
+        self.render_all()
+        evict_package_paragraphs()
+        self.assertEqual(RenderedPackageParagraph.objects.count(), 2)
+        with override_settings(PACKAGE_PARAGRAPH_CACHE_MAX_ENTRIES=0):
+            evict_package_paragraphs()
+        self.assertFalse(RenderedPackageParagraph.objects.exists())
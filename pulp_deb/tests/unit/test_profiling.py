@@ -0,0 +1,78 @@
+import io
+import sys
+import time
+from types import SimpleNamespace
+
+from django.test import TestCase
+
+from pulp_deb.app.profiling import (
+    QueryRecorder,
+    StackSampler,
+    folded_stack,
+    profiling_requested,
+    query_call_site,
+)
+
+
+def _busy_wait(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+class TestProfiling(TestCase):
+    """
+    Tests for sampling call stacks and recording database queries of profiled tasks.
+    """
+
+    def test_profiling_requested(self):
+        task = SimpleNamespace(profile_options=["deb-profile"])
+        with self.settings(APT_TASK_PROFILING=False, TASK_DIAGNOSTICS=[]):
+            self.assertFalse(profiling_requested(task))
+        with self.settings(APT_TASK_PROFILING=False, TASK_DIAGNOSTICS=["deb-profile"]):
+            self.assertTrue(profiling_requested(task))
+            self.assertFalse(profiling_requested(SimpleNamespace(profile_options=None)))
+            self.assertFalse(profiling_requested(None))
+        with self.settings(APT_TASK_PROFILING=True, TASK_DIAGNOSTICS=[]):
+            self.assertTrue(profiling_requested(None))
+
+    def test_folded_stack(self):
+        def inner():
+            return folded_stack(sys._getframe())
+
+        names = inner().split(";")
+        self.assertTrue(names[-1].startswith("inner (test_profiling.py:"))
+        self.assertTrue(names[-2].startswith("test_folded_stack (test_profiling.py:"))
+
+    def test_stack_sampler(self):
+        sampler = StackSampler(0.001)
+        sampler.start()
+        _busy_wait(0.2)
+        sampler.stop()
+        report = io.StringIO()
+        sampler.write_report(report)
+        busy_samples = [line for line in report.getvalue().splitlines() if "_busy_wait (" in line]
+        self.assertTrue(busy_samples)
+        self.assertTrue(all(int(line.rsplit(" ", 1)[1]) > 0 for line in busy_samples))
+
+    def test_query_call_site(self):
+        namespace = {"__name__": "django.db.backends.utils", "sys": sys}
+        exec("def execute(call_site):\n    return call_site(sys._getframe())\n", namespace)
+        self.assertRegex(
+            namespace["execute"](query_call_site),
+            r"^pulp_deb\.tests\.unit\.test_profiling:\d+ test_query_call_site$",
+        )
+
+    def test_query_recorder(self):
+        recorder = QueryRecorder()
+        for _ in range(3):
+            self.assertEqual(
+                recorder(lambda sql, params, many, context: "rows", "SELECT 1", (), False, {}),
+                "rows",
+            )
+        report = io.StringIO()
+        recorder.write_report(report)
+        lines = report.getvalue().splitlines()
+        self.assertEqual(lines[1].split()[0], "3")
+        self.assertEqual(lines[2].split()[0], "3")
+        self.assertTrue(lines[2].endswith(" test_query_recorder"))
@@ -0,0 +1,854 @@
+import gzip
+import hashlib
+import lzma
+import os
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+from debian import deb822
+from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from pulpcore.plugin.models import (
+    Artifact,
+    Content,
+    ContentArtifact,
+    PublishedArtifact,
+    PublishedMetadata,
+    RemoteArtifact,
+)
+
+from pulp_deb.app.constants import LAYOUT_CHOICES
+from pulp_deb.app.models import (
+    AptPublication,
+    AptRemote,
+    AptRepository,
+    Package,
+    PackageReleaseComponent,
+    ReleaseComponent,
+    SourcePackage,
+)
+from pulp_deb.app.models.content.content import pool_filename
+from pulp_deb.app.package_index import PACKAGE_INDEX_VALUES
+from pulp_deb.app.tasks.publishing import (
+    PACKAGE_INDEX_ORDER,
+    PACKAGE_RELEASE_COMPONENT_ROW_VALUES,
+    PACKAGE_ROW_VALUES,
+    _artifact_state,
+    _by_hash_paths,
+    _changed_indices,
+    _chunks,
+    _ComponentHelper,
+    _identical_publication,
+    _index_order,
+    _IndexFile,
+    _insert_package_published_artifacts,
+    _latest_publication,
+    _package_release_component_row,
+    _package_row,
+    _prefetch_source_package_artifacts,
+    _publication_fingerprint,
+    _publish_process_pool,
+    _release_dir,
+    _resign_publication,
+    _ResignedRelease,
+    _unchanged_artifacts,
+    publish,
+)
+
+
+class TestChangedIndices(TestCase):
+    """
+    Tests the _changed_indices() helper function of incremental publishes.
+    """
+
+    def test_structured(self):
+        changed = _changed_indices(
+            simple=False,
+            packages=[("amd64",), ("all",)],
+            package_release_components=[
+                ("bookworm", "main", "amd64", None),
+                ("bookworm", "main", "all", "arm64"),
+                ("bookworm", "contrib", "amd64", "amd64v3"),
+            ],
+            source_package_release_components=[("bookworm", "main")],
+            has_changed_source_packages=True,
+        )
+        self.assertEqual(
+            changed,
+            {
+                ("bookworm", "main", "amd64"),
+                ("bookworm", "main", "all"),
+                ("bookworm", "contrib", "amd64v3"),
+                ("bookworm", "main", "source"),
+            },
+        )
+
+    def test_simple(self):
+        changed = _changed_indices(
+            simple=True,
+            packages=[("amd64",), ("all",)],
+            package_release_components=[],
+            source_package_release_components=[],
+            has_changed_source_packages=True,
+        )
+        self.assertEqual(
+            changed,
+            {("default", "all", "amd64"), ("default", "all", "all"), ("default", "all", "source")},
+        )
+
+    def test_unchanged(self):
+        changed = _changed_indices(
+            simple=True,
+            packages=[],
+            package_release_components=[],
+            source_package_release_components=[],
+            has_changed_source_packages=False,
+        )
+        self.assertEqual(changed, set())
+
+
+class TestPublishProcessPool(TestCase):
+    """
+    Tests the _publish_process_pool() helper function.
+    """
+
+    @override_settings(MAX_PUBLISH_WORKER_PROCESSES=1)
+    def test_single_process(self):
+        self.assertIsNone(_publish_process_pool())
+
+    @override_settings(MAX_PUBLISH_WORKER_PROCESSES=4)
+    def test_worker_processes(self):
+        with _publish_process_pool() as process_pool:
+            self.assertIsInstance(process_pool, ProcessPoolExecutor)
+            self.assertEqual(process_pool._max_workers, 4)
+            self.assertEqual(process_pool._mp_context.get_start_method(), "spawn")
+
+
+class _InProcessPool:
+    """
+    Stands in for the publish process pool, running the submitted _ComponentJobs right away in the
+    test process, which shares the test transaction.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, job):
+        future = Future()
+        future.set_result(job())
+        return future
+
+
+class TestProcessPoolPublish(TestCase):
+    """
+    Tests a structured publish, that renders its components as process pool jobs.
+    """
+
+    def setUp(self):
+        """Setup database fixtures."""
+        self.repository = AptRepository.objects.create(name="asgard")
+        self.addCleanup(self.repository.delete)
+        artifact = Artifact(
+            size=12,
+            md5="aabb",
+            sha1="ccdd",
+            sha256="abcdef0123odin",
+            sha512="gghh",
+            file=SimpleUploadedFile("odin_1.0_all.deb", b"test content"),
+        )
+        artifact.save()
+        self.package = Package(
+            package="odin",
+            version="1.0",
+            architecture="all",
+            maintainer="Allfather",
+            description="The wanderer.",
+            sha256="abcdef0123odin",
+            relative_path="odin_1.0_all.deb",
+        )
+        self.package.save()
+        ContentArtifact(
+            artifact=artifact, content=self.package, relative_path=self.package.relative_path
+        ).save()
+        release_component = ReleaseComponent(distribution="asgard", component="main")
+        release_component.save()
+        package_release_component = PackageReleaseComponent(
+            package=self.package, release_component=release_component
+        )
+        package_release_component.save()
+        with self.repository.new_version() as new_version:
+            new_version.add_content(
+                Content.objects.filter(
+                    pk__in=[self.package.pk, release_component.pk, package_release_component.pk]
+                )
+            )
+
+    @override_settings(APT_REUSE_IDENTICAL_PUBLICATIONS=False)
+    # There is no task to record the created publication for:
+    @mock.patch("pulpcore.app.models.publication.CreatedResource", mock.Mock())
+    @mock.patch("pulp_deb.app.tasks.publishing._publish_process_pool", _InProcessPool)
+    def test_publish(self):
+        repository_version = self.repository.latest_version()
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            os.chdir(temp_dir)
+            try:
+                publish(repository_version.pk, simple=False, structured=True)
+            finally:
+                os.chdir(cwd)
+
+        publication = AptPublication.objects.get(repository_version=repository_version)
+        self.assertEqual(
+            list(
+                PublishedArtifact.objects.filter(
+                    publication=publication, relative_path__startswith="pool/"
+                )
+                .order_by("relative_path")
+                .values_list("relative_path", flat=True)
+            ),
+            [
+                pool_filename(
+                    "odin",
+                    None,
+                    "abcdef0123odin",
+                    "odin_1.0_all.deb",
+                    "main",
+                    publication.layout,
+                )
+            ],
+        )
+        packages_index = PublishedMetadata.objects.get(
+            publication=publication, relative_path="dists/asgard/main/binary-all/Packages"
+        )
+        with packages_index.contentartifact_set.get().artifact.file.open("rb") as index_file:
+            self.assertIn(b"Package: odin\n", index_file.read())
+
+
+class TestIndexFile(TestCase):
+    """
+    Tests, that _IndexFile writes and hashes all variants of an index file in one pass.
+    """
+
+    def test_variants(self):
+        paragraphs = [b"Package: aegir\nVersion: 1.0\n\n", b"Package: fenrir\nVersion: 2.0\n"]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "dists", "stable", "main", "binary-amd64", "Packages")
+            index_file = _IndexFile(path)
+            for paragraph in paragraphs:
+                index_file.write(paragraph)
+            written = index_file.close()
+
+            self.assertEqual(list(written), _IndexFile.variant_paths(path))
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), b"".join(paragraphs))
+            with gzip.open(path + ".gz", "rb") as f:
+                self.assertEqual(f.read(), b"".join(paragraphs))
+            for variant_path, (size, digests) in written.items():
+                with open(variant_path, "rb") as f:
+                    data = f.read()
+                self.assertEqual(size, len(data))
+                self.assertEqual(digests["sha256"], hashlib.sha256(data).hexdigest())
+
+    @override_settings(APT_INDEX_COMPRESSION_FORMATS=["gz"])
+    def test_reproducible_gz_variant(self):
+        def digests(path):
+            index_file = _IndexFile(path)
+            index_file.write(b"Package: aegir\nVersion: 1.0\n")
+            return index_file.close()[path + ".gz"][1]["sha256"]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = digests(os.path.join(temp_dir, "first", "Packages"))
+            with mock.patch("time.time", return_value=time.time() + 3600):
+                second = digests(os.path.join(temp_dir, "second", "Packages"))
+        self.assertEqual(first, second)
+
+    @override_settings(APT_INDEX_COMPRESSION_FORMATS=["gz", "xz"], APT_INDEX_COMPRESSION_THREADS=2)
+    def test_xz_variant(self):
+        data = b"".join(b"Package: aegir%d\nVersion: 1.0\n\n" % i for i in range(10000))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "Sources")
+            index_file = _IndexFile(path)
+            index_file.write(data)
+            written = index_file.close()
+
+            self.assertEqual(list(written), [path, path + ".gz", path + ".xz"])
+            with lzma.open(path + ".xz", "rb") as f:
+                self.assertEqual(f.read(), data)
+            with open(path + ".xz", "rb") as f:
+                self.assertEqual(written[path + ".xz"][0], len(f.read()))
+
+    @override_settings(ALLOWED_CONTENT_CHECKSUMS=["sha1", "sha256", "sha512"])
+    def test_by_hash_paths(self):
+        class FakeArtifact:
+            sha1 = "aa"
+            sha256 = "bb"
+            sha512 = "cc"
+
+        self.assertEqual(
+            _by_hash_paths("dists/stable/main/source/Sources.gz", FakeArtifact),
+            [
+                "dists/stable/main/source/by-hash/SHA1/aa",
+                "dists/stable/main/source/by-hash/SHA256/bb",
+                "dists/stable/main/source/by-hash/SHA512/cc",
+            ],
+        )
+
+
+class TestPrefetchSourcePackageArtifacts(TestCase):
+    """
+    Tests, that the checksums of prefetched source packages are rendered without queries.
+    """
+
+    def setUp(self):
+        """Setup database fixtures."""
+        self.source_packages = []
+        for source in ("aegir", "fenrir"):
+            source_package = SourcePackage(
+                relative_path="{}_1.0.dsc".format(source),
+                format="3.0 (quilt)",
+                source=source,
+                version="1.0",
+                maintainer="Utgardloki",
+                standards_version="4.6.2",
+            )
+            source_package.save()
+            self.source_packages.append(source_package)
+
+        artifact = Artifact(
+            size=12,
+            md5="aabb",
+            sha1="ccdd",
+            sha256="eeff11",
+            sha512="gghh",
+            file=SimpleUploadedFile("aegir_1.0.dsc", b"test content"),
+        )
+        artifact.save()
+        ContentArtifact(
+            artifact=artifact, content=self.source_packages[0], relative_path="aegir_1.0.dsc"
+        ).save()
+
+        remote = AptRemote(name="utgard", url="http://example.com/", distributions="stable")
+        remote.save()
+        content_artifact = ContentArtifact(
+            content=self.source_packages[1], relative_path="fenrir_1.0.dsc"
+        )
+        content_artifact.save()
+        RemoteArtifact(
+            remote=remote,
+            content_artifact=content_artifact,
+            size=34,
+            md5="1122",
+            sha256="3344",
+            url="http://example.com/fenrir_1.0.dsc",
+        ).save()
+
+    def test_no_queries_per_source_package(self):
+        source_packages = list(SourcePackage.objects.filter(pk__in=self.source_packages))
+        with self.assertNumQueries(2):
+            _prefetch_source_package_artifacts(source_packages)
+        with self.assertNumQueries(0):
+            checksums = {
+                source_package.source: (source_package.files, source_package.checksums_sha256)
+                for source_package in source_packages
+            }
+        self.assertEqual(
+            checksums["aegir"],
+            (
+                [{"name": "aegir_1.0.dsc", "md5sum": "aabb", "size": 12}],
+                [{"name": "aegir_1.0.dsc", "sha256": "eeff11", "size": 12}],
+            ),
+        )
+        self.assertEqual(
+            checksums["fenrir"],
+            (
+                [{"name": "fenrir_1.0.dsc", "md5sum": "1122", "size": 34}],
+                [{"name": "fenrir_1.0.dsc", "sha256": "3344", "size": 34}],
+            ),
+        )
+
+
+class TestPackageRows(TestCase):
+    """
+    Tests the helpers streaming package rows into the Packages indices.
+    """
+
+    def test_package_release_component_row(self):
+        values = {field: field.upper() for field in PACKAGE_RELEASE_COMPONENT_ROW_VALUES}
+        values["package__contentartifact__artifact__md5"] = None
+        row = _package_release_component_row(
+            [values[field] for field in PACKAGE_RELEASE_COMPONENT_ROW_VALUES]
+        )
+        self.assertEqual(row["pk"], "PACKAGE__PK")
+        self.assertEqual(row["description"], "PACKAGE__DESCRIPTION")
+        self.assertEqual(set(PACKAGE_INDEX_VALUES) - set(row), set())
+        self.assertEqual(row["relative_path"], "PACKAGE__RELATIVE_PATH")
+        self.assertEqual(row["index_architecture"], "INDEX_ARCHITECTURE")
+        self.assertEqual(
+            row["content_artifact"],
+            ("PACKAGE__CONTENTARTIFACT__PK", "PACKAGE__CONTENTARTIFACT__RELATIVE_PATH"),
+        )
+        self.assertIsNone(row["artifact"].md5)
+        self.assertEqual(row["artifact"].sha256, "PACKAGE__CONTENTARTIFACT__ARTIFACT__SHA256")
+
+    def test_package_release_component_row_without_artifact(self):
+        values = [None] * len(PACKAGE_RELEASE_COMPONENT_ROW_VALUES)
+        self.assertIsNone(_package_release_component_row(values)["artifact"])
+
+    def test_package_row(self):
+        values = {field: field.upper() for field in PACKAGE_ROW_VALUES}
+        row = _package_row([values[field] for field in PACKAGE_ROW_VALUES])
+        self.assertEqual(row["pk"], "PK")
+        self.assertEqual(row["relative_path"], "RELATIVE_PATH")
+        self.assertIsNone(row["index_architecture"])
+        self.assertEqual(
+            row["content_artifact"], ("CONTENTARTIFACT__PK", "CONTENTARTIFACT__RELATIVE_PATH")
+        )
+        self.assertEqual(row["artifact"].size, "CONTENTARTIFACT__ARTIFACT__SIZE")
+
+    def test_index_order(self):
+        query = str(
+            PackageReleaseComponent.objects.order_by(
+                *_index_order(PACKAGE_INDEX_ORDER, "package__")
+            ).query
+        )
+        self.assertIn(
+            'ORDER BY "deb_package"."package" COLLATE "C" ASC, "deb_package"."version" COLLATE "C" '
+            'ASC, "deb_package"."architecture" COLLATE "C" ASC, "deb_package"."sha256" COLLATE "C" '
+            'ASC, "deb_packagereleasecomponent"."package_id" ASC',
+            query,
+        )
+
+    def test_chunks(self):
+        self.assertEqual(list(_chunks(iter(range(5)), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(_chunks([], 2)), [])
+
+
+class TestComponentIndices(TestCase):
+    """
+    Tests for the index files written by the _ComponentHelper with different publish options.
+    """
+
+    PACKAGES = (
+        ("aegir", "amd64", "A sea jötunn.\n He brews ale for the gods."),
+        ("fenrir", "all", "A wolf."),
+        ("libaegir1", "amd64", "A sea jötunn.\n He brews ale for the gods."),
+    )
+
+    def index_files(self, hybrid_format=False, publish_translations=False, packages=PACKAGES):
+        parent = SimpleNamespace(
+            architectures=["amd64", "arm64", "all"],
+            distribution="stable",
+            dists_subfolder="stable",
+            publication=SimpleNamespace(
+                layout="nested_alphabetically",
+                publish_legacy_release_files=False,
+                hybrid_format=hybrid_format,
+                publish_contents=False,
+                publish_translations=publish_translations,
+            ),
+            reuses_index=lambda component, architecture, *index_paths: False,
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cwd = os.getcwd()
+            os.chdir(temp_dir)
+            try:
+                component_helper = _ComponentHelper(parent, "main")
+                for name, architecture, description in packages:
+                    row = {field: None for field in PACKAGE_INDEX_VALUES}
+                    row.update(
+                        pk=name,
+                        package=name,
+                        version="1.0",
+                        architecture=architecture,
+                        description=description,
+                        sha256="abcdef0123" + name,
+                        index_architecture=None,
+                        content_artifact=(name, "{}_1.0_{}.deb".format(name, architecture)),
+                        artifact=None,
+                    )
+                    component_helper.add_package_row(row, None)
+                component_helper.close_indices()
+                index_files = {}
+                for path in component_helper.written_indices:
+                    if os.path.splitext(path)[1] not in (".gz", ".xz", ".zst"):
+                        with open(path, "rb") as f:
+                            index_files[path] = f.read()
+                return index_files
+            finally:
+                os.chdir(cwd)
+
+    def test_hybrid_format(self):
+        index_files = self.index_files()
+        amd64 = index_files["dists/stable/main/binary-amd64/Packages"]
+        self.assertIn(b"Package: aegir\n", amd64)
+        self.assertNotIn(b"Package: fenrir\n", amd64)
+        self.assertEqual(index_files["dists/stable/main/binary-arm64/Packages"], b"")
+        self.assertIn(b"Package: fenrir\n", index_files["dists/stable/main/binary-all/Packages"])
+
+        index_files = self.index_files(hybrid_format=True)
+        self.assertIn(b"Package: aegir\n", index_files["dists/stable/main/binary-amd64/Packages"])
+        self.assertNotIn(
+            b"Package: aegir\n", index_files["dists/stable/main/binary-arm64/Packages"]
+        )
+        for architecture in ("amd64", "arm64", "all"):
+            self.assertIn(
+                b"Package: fenrir\n",
+                index_files["dists/stable/main/binary-{}/Packages".format(architecture)],
+            )
+
+    def test_translations(self):
+        index_files = self.index_files()
+        self.assertNotIn("dists/stable/main/i18n/Translation-en", index_files)
+        self.assertIn(
+            "Description: A sea jötunn.\n He brews ale for the gods.\n".encode(),
+            index_files["dists/stable/main/binary-amd64/Packages"],
+        )
+
+        index_files = self.index_files(publish_translations=True)
+        md5 = hashlib.md5("A sea jötunn.\n He brews ale for the gods.\n".encode()).hexdigest()
+        amd64 = index_files["dists/stable/main/binary-amd64/Packages"]
+        self.assertIn(
+            "Description: A sea jötunn.\nDescription-md5: {}\n".format(md5).encode(), amd64
+        )
+        self.assertNotIn(b"He brews ale", amd64)
+        self.assertIn(
+            b"Description: A wolf.\n", index_files["dists/stable/main/binary-all/Packages"]
+        )
+        self.assertEqual(
+            index_files["dists/stable/main/i18n/Translation-en"].decode(),
+            "Package: {}\nDescription-md5: {}\nDescription-en: A sea jötunn.\n"
+            " He brews ale for the gods.\n\n".format("aegir", md5)
+            + "Package: {}\nDescription-md5: {}\nDescription-en: A sea jötunn.\n"
+            " He brews ale for the gods.\n\n".format("libaegir1", md5),
+        )
+
+    def test_duplicate_rows(self):
+        aegir, fenrir, libaegir1 = self.PACKAGES
+        index_files = self.index_files(
+            publish_translations=True, packages=(aegir, aegir, fenrir, libaegir1, libaegir1)
+        )
+        self.assertEqual(
+            index_files["dists/stable/main/binary-amd64/Packages"].count(b"Package: "), 2
+        )
+        self.assertEqual(
+            index_files["dists/stable/main/i18n/Translation-en"].count(b"Package: "), 2
+        )
+
+
+class TestOverlayPublication(TestCase):
+    """
+    Tests for telling apart the files of the distributions of overlaid publications.
+    """
+
+    def test_release_dir(self):
+        release_dirs = {"dists/stable", "dists/stable/updates", "dists/flat-repo"}
+        self.assertEqual(
+            _release_dir("dists/stable/main/binary-amd64/Packages", release_dirs), "dists/stable"
+        )
+        self.assertEqual(
+            _release_dir("dists/stable/updates/main/binary-amd64/Packages", release_dirs),
+            "dists/stable/updates",
+        )
+        self.assertEqual(_release_dir("dists/flat-repo/Release", release_dirs), "dists/flat-repo")
+        self.assertIsNone(_release_dir("dists/stable-backports/Release", release_dirs))
+
+
+class TestInsertPackagePublishedArtifacts(TestCase):
+    """
+    Tests, that PublishedArtifacts created by INSERT ... SELECT have the paths of pool_filename().
+    """
+
+    def setUp(self):
+        """Setup database fixtures."""
+        self.packages = []
+        for name, source in (
+            ("fenrir", "fenrir (1:2.0-1)"),
+            ("libaegir1", None),
+            ("libaegir-dev", "libaegir"),
+        ):
+            package = Package(
+                package=name,
+                source=source,
+                version="1.0",
+                architecture="amd64",
+                maintainer="Utgardloki",
+                description="A jötunn.",
+                sha256="abcdef0123" + name,
+                relative_path="some/dir/{}_1.0_amd64.deb".format(name),
+            )
+            package.save()
+            ContentArtifact(content=package, relative_path=package.relative_path).save()
+            self.packages.append(package)
+        repository = AptRepository.objects.create(name="utgard")
+        self.addCleanup(repository.delete)
+        self.repository_version = repository.latest_version()
+
+    def test_pool_paths(self):
+        for layout, _ in LAYOUT_CHOICES:
+            with self.subTest(layout=layout):
+                publication = AptPublication(
+                    repository_version=self.repository_version, layout=layout
+                )
+                publication.save()
+                _insert_package_published_artifacts(
+                    publication,
+                    Package.objects.filter(pk__in=[package.pk for package in self.packages]),
+                    "updates/main",
+                    layout,
+                )
+                self.assertEqual(
+                    set(
+                        PublishedArtifact.objects.filter(publication=publication).values_list(
+                            "relative_path", "content_artifact__content_id"
+                        )
+                    ),
+                    {
+                        (
+                            pool_filename(
+                                package.package,
+                                package.source,
+                                package.sha256,
+                                os.path.basename(package.relative_path),
+                                "updates/main",
+                                layout,
+                            ),
+                            package.pk,
+                        )
+                        for package in self.packages
+                    },
+                )
+
+
+class TestPublicationFingerprint(TestCase):
+    """
+    Tests for finding identical publications by their fingerprint.
+    """
+
+    OPTIONS = {
+        "simple": True,
+        "structured": True,
+        "signing_service": None,
+        "publish_upstream_release_fields": None,
+        "layout": "nested_alphabetically",
+        "publish_legacy_release_files": False,
+    }
+
+    def setUp(self):
+        """Setup database fixtures."""
+        self.repository = AptRepository.objects.create(name="asgard")
+        self.addCleanup(self.repository.delete)
+        self.package = Package(
+            package="odin",
+            version="1.0",
+            architecture="all",
+            maintainer="Allfather",
+            description="The wanderer.",
+            sha256="abcdef0123odin",
+            relative_path="odin_1.0_all.deb",
+        )
+        self.package.save()
+
+    def fingerprint(self, **options):
+        repository_version = self.repository.latest_version()
+        return _publication_fingerprint(
+            repository_version, self.repository, **{**self.OPTIONS, **options}
+        )
+
+    def test_fingerprint(self):
+        fingerprint = self.fingerprint()
+        self.assertEqual(fingerprint, self.fingerprint())
+        self.assertNotEqual(fingerprint, self.fingerprint(layout="nested_by_digest"))
+        self.assertNotEqual(fingerprint, self.fingerprint(publish_upstream_release_fields=False))
+        with override_settings(APT_BY_HASH=True):
+            self.assertNotEqual(fingerprint, self.fingerprint())
+        with self.repository.new_version() as new_version:
+            new_version.add_content(Package.objects.filter(pk=self.package.pk))
+        self.assertNotEqual(fingerprint, self.fingerprint())
+
+    def test_identical_publication(self):
+        fingerprint = self.fingerprint()
+        publication = AptPublication(
+            repository_version=self.repository.latest_version(),
+            fingerprint=fingerprint,
+            complete=False,
+        )
+        publication.save()
+        self.assertIsNone(_identical_publication(self.repository, fingerprint))
+        publication.complete = True
+        publication.save()
+        self.assertEqual(_identical_publication(self.repository, fingerprint), publication)
+        self.assertIsNone(_identical_publication(self.repository, self.fingerprint(simple=False)))
+
+
+class TestIncrementalBase(TestCase):
+    """
+    Tests for finding the publication an incremental publish is based on.
+    """
+
+    def setUp(self):
+        """Setup database fixtures."""
+        self.repository = AptRepository.objects.create(name="asgard")
+        self.addCleanup(self.repository.delete)
+        self.packages = []
+        for name in ("odin", "frigg"):
+            package = Package(
+                package=name,
+                version="1.0",
+                architecture="all",
+                maintainer="Allfather",
+                description="An aesir.",
+                sha256="abcdef0123" + name,
+                relative_path="{}_1.0_all.deb".format(name),
+            )
+            package.save()
+            ContentArtifact(content=package, relative_path=package.relative_path).save()
+            self.packages.append(package)
+        with self.repository.new_version() as new_version:
+            new_version.add_content(Package.objects.filter(pk=self.packages[0].pk))
+        self.publication = AptPublication(
+            repository_version=self.repository.latest_version(),
+            complete=True,
+            artifact_state=_artifact_state(self.repository.latest_version()),
+        )
+        self.publication.save()
+
+    def unchanged_artifacts(self):
+        repository_version = self.repository.latest_version()
+        return _unchanged_artifacts(
+            self.publication, repository_version, _artifact_state(repository_version)
+        )
+
+    def test_index_options(self):
+        self.assertEqual(
+            _latest_publication(self.repository, False, True, "nested_alphabetically"),
+            self.publication,
+        )
+        for option in ("hybrid_format", "publish_contents", "publish_translations"):
+            with self.subTest(option=option):
+                self.assertIsNone(
+                    _latest_publication(
+                        self.repository,
+                        False,
+                        True,
+                        "nested_alphabetically",
+                        **{option: True},
+                    )
+                )
+
+    def test_added_content(self):
+        with self.repository.new_version() as new_version:
+            new_version.add_content(Package.objects.filter(pk=self.packages[1].pk))
+        self.assertTrue(self.unchanged_artifacts())
+
+    def test_downloaded_artifact(self):
+        artifact = Artifact(
+            size=12,
+            md5="aabb",
+            sha1="ccdd",
+            sha256="abcdef0123odin",
+            sha512="gghh",
+            file=SimpleUploadedFile("odin_1.0_all.deb", b"test content"),
+        )
+        artifact.save()
+        ContentArtifact.objects.filter(content=self.packages[0]).update(artifact=artifact)
+        self.assertFalse(self.unchanged_artifacts())
+
+    def test_changed_settings(self):
+        with override_settings(ALLOWED_CONTENT_CHECKSUMS=["sha256"]):
+            self.assertFalse(self.unchanged_artifacts())
+
+
+class TestResignedRelease(TestCase):
+    """
+    Tests for republishing the Release files of re-signed publications.
+    """
+
+    def setUp(self):
+        """Setup database fixtures."""
+        repository = AptRepository.objects.create(name="asgard")
+        self.addCleanup(repository.delete)
+        self.publication = AptPublication(repository_version=repository.latest_version())
+        self.publication.save()
+
+    def test_save_unsigned_metadata(self):
+        release = deb822.Release(
+            "Origin: Pulp 3\n"
+            "Codename: asgard\n"
+            "Date: Mon, 05 Oct 2026 10:00:00 +0000\n"
+            "Components: main\n"
+            "SHA256:\n"
+            " {} 0 main/binary-all/Packages\n".format(hashlib.sha256(b"").hexdigest())
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cwd = os.getcwd()
+            os.chdir(temp_dir)
+            try:
+                _ResignedRelease(
+                    self.publication, "dists/asgard", release, temp_dir, None
+                ).save_unsigned_metadata()
+            finally:
+                os.chdir(cwd)
+
+        metadata = PublishedMetadata.objects.get(publication=self.publication)
+        self.assertEqual(metadata.relative_path, "dists/asgard/Release")
+        with metadata.contentartifact_set.get().artifact.file.open("rb") as release_file:
+            published = deb822.Release(release_file)
+        self.assertNotEqual(published["Date"], "Mon, 05 Oct 2026 10:00:00 +0000")
+        self.assertEqual(published["Codename"], "asgard")
+        self.assertEqual(published["SHA256"], release["SHA256"])
+
+    def test_resign_publication_options(self):
+        options = {
+            "simple": True,
+            "structured": False,
+            "layout": "nested_by_digest",
+            "publish_legacy_release_files": True,
+            "hybrid_format": True,
+            "publish_contents": True,
+            "publish_translations": True,
+            "publish_pdiffs": True,
+            "distributions": ["default"],
+            "overlay": True,
+        }
+        for option, value in options.items():
+            setattr(self.publication, option, value)
+        self.publication.complete = True
+        self.publication.save()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cwd = os.getcwd()
+            os.chdir(temp_dir)
+            try:
+                os.makedirs("dists/default")
+                with open("dists/default/Release", "w") as release_file:
+                    release_file.write("Codename: default\nComponents: all\n")
+                PublishedMetadata.create_from_file(
+                    publication=self.publication,
+                    file=File(open("dists/default/Release", "rb")),
+                ).save()
+                # There is no task to record the created publication for:
+                with mock.patch("pulpcore.app.models.publication.CreatedResource"):
+                    publication = _resign_publication(self.publication, None)
+            finally:
+                os.chdir(cwd)
+
+        publication.refresh_from_db()
+        self.assertEqual(
+            {option: getattr(publication, option) for option in options},
+            options,
+        )
+        self.assertEqual(
+            list(
+                PublishedMetadata.objects.filter(publication=publication).values_list(
+                    "relative_path", flat=True
+                )
+            ),
+            ["dists/default/Release"],
+        )
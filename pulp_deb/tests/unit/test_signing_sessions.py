@@ -0,0 +1,104 @@
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from django.test import TestCase
+
+from pulp_deb.app.signing_sessions import SigningSessionPool
+
+HELPER_SCRIPT = """#!{python}
+import json, os, shutil, sys
+
+if not os.environ.get("PULP_SIGNING_SESSION"):
+    sys.exit("not started as a persistent helper")
+for line in sys.stdin:
+    request = json.loads(line)
+    if request["file"].endswith("Fail"):
+        print(json.dumps({{"error": "cannot sign " + request["file"]}}), flush=True)
+        continue
+    if request["file"].endswith("Exit"):
+        sys.exit("exiting on " + request["file"])
+    inline = os.path.join(request["env"]["PULP_TEMP_WORKING_DIR"], "InRelease")
+    shutil.copy(request["file"], inline)
+    response = {{
+        "signatures": {{"inline": inline}},
+        "pid": os.getpid(),
+        "fingerprint": os.environ["PULP_SIGNING_KEY_FINGERPRINT"],
+    }}
+    print(json.dumps(response), flush=True)
+"""
+
+
+class _FakeSigningService(SimpleNamespace):
+    async def asign(self, filename, env_vars=None):
+        return {"signatures": {}, "script": filename}
+
+
+class TestSigningSessionPool(TestCase):
+    """
+    Tests for signing files with persistent signing service helpers.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        script = os.path.join(self.temp_dir.name, "sign.py")
+        with open(script, "w") as script_file:
+            script_file.write(HELPER_SCRIPT.format(python=sys.executable))
+        os.chmod(script, stat.S_IRWXU)
+        self.signing_service = _FakeSigningService(
+            pk=1, name="persistent", script=script, pubkey_fingerprint="0123ABCD"
+        )
+
+    def _sign(self, *file_names, max_sessions=2):
+        async def sign_all():
+            async with SigningSessionPool(max_sessions) as signing_sessions:
+                return await asyncio.gather(
+                    *[
+                        signing_sessions.sign(
+                            self.signing_service, path, env_vars={"PULP_TEMP_WORKING_DIR": path_dir}
+                        )
+                        for path, path_dir in paths
+                    ],
+                    return_exceptions=True,
+                )
+
+        paths = []
+        for file_name in file_names:
+            path_dir = tempfile.mkdtemp(dir=self.temp_dir.name)
+            path = os.path.join(path_dir, file_name)
+            with open(path, "w") as release_file:
+                release_file.write(file_name)
+            paths.append((path, path_dir))
+        with self.settings(APT_PERSISTENT_SIGNING_SERVICES=["persistent"]):
+            return asyncio.run(sign_all())
+
+    def test_sign(self):
+        results = self._sign(*["Release"] * 5)
+        self.assertEqual(len({result["pid"] for result in results}), 2)
+        for result in results:
+            self.assertEqual(result["fingerprint"], "0123ABCD")
+            with open(result["signatures"]["inline"]) as inline:
+                self.assertEqual(inline.read(), "Release")
+
+    def test_sign_error(self):
+        failed, signed = self._sign("Fail", "Release", max_sessions=1)
+        self.assertIsInstance(failed, RuntimeError)
+        self.assertIn("cannot sign", str(failed))
+        self.assertIn("signatures", signed)
+
+    def test_helper_exit(self):
+        exited, signed = self._sign("Exit", "Release", max_sessions=1)
+        self.assertIsInstance(exited, RuntimeError)
+        self.assertIn("exiting on", str(exited))
+        self.assertIn("signatures", signed)
+
+    def test_script_signing_service(self):
+        async def sign():
+            async with SigningSessionPool() as signing_sessions:
+                return await signing_sessions.sign(self.signing_service, "Release")
+
+        self.assertEqual(asyncio.run(sign()), {"signatures": {}, "script": "Release"})
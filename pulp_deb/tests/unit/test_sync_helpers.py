@@ -1,11 +1,25 @@
+import asyncio
+from types import SimpleNamespace
 from unittest import mock
 
+from asgiref.sync import async_to_sync
+from debian import deb822
 from django.test import TestCase
+from rest_framework.exceptions import ValidationError
 
+from pulpcore.plugin.models import ContentArtifact, RemoteArtifact
+
+from pulp_deb.app.models import AptRemote, AptRepository, SourcePackage
 from pulp_deb.app.tasks.synchronizing import (
+    DebFirstStage,
+    InstallerFileDigests,
     _filter_split_architectures,
     _filter_split_components,
+    _filter_translation_paths,
     _get_artifact_set_sha256,
+    _get_known_source_packages,
+    _iter_installer_sums_files,
+    _parse_source_paragraph,
     filter_arch_tokens,
 )
 
@@ -267,3 +281,212 @@ class TestComponentFiltering(TestCase):
 
             self.assertEqual(len(captured.records), 3)
             self.assertEqual(captured.records[0].getMessage(), expected_log_message)
+
+
+class TestTranslationFiltering(TestCase):
+    """
+    Tests the language and compression filtering of the _filter_translation_paths function.
+    """
+
+    paths = [
+        "main/binary-amd64/Packages",
+        "main/i18n/Index",
+        "main/i18n/Translation-de",
+        "main/i18n/Translation-de.bz2",
+        "main/i18n/Translation-en",
+        "main/i18n/Translation-en.bz2",
+        "main/i18n/Translation-en.xz",
+        "main/i18n/Translation-pt_BR.gz",
+        "contrib/i18n/Translation-en",
+    ]
+
+    def test_language_filtering(self):
+        """
+        Test that only translations for the requested languages are retained.
+        """
+        self.assertEqual(
+            _filter_translation_paths(self.paths, "main/i18n", "en"),
+            [
+                "main/i18n/Index",
+                "main/i18n/Translation-en",
+                "main/i18n/Translation-en.bz2",
+                "main/i18n/Translation-en.xz",
+            ],
+        )
+        self.assertEqual(
+            _filter_translation_paths(self.paths, "main/i18n", "de pt_BR"),
+            [
+                "main/i18n/Index",
+                "main/i18n/Translation-de",
+                "main/i18n/Translation-de.bz2",
+                "main/i18n/Translation-pt_BR.gz",
+            ],
+        )
+        self.assertEqual(
+            _filter_translation_paths(self.paths, "main/i18n", ""), ["main/i18n/Index"]
+        )
+
+    def test_single_compression_filtering(self):
+        """
+        Test that only the most strongly compressed variant of each translation is retained.
+        """
+        self.assertEqual(
+            _filter_translation_paths(self.paths, "main/i18n", "de en pt_BR", True),
+            [
+                "main/i18n/Index",
+                "main/i18n/Translation-de.bz2",
+                "main/i18n/Translation-en.xz",
+                "main/i18n/Translation-pt_BR.gz",
+            ],
+        )
+
+
+class TestSourceParagraphParsing(TestCase):
+    """
+    Tests the _parse_source_paragraph function used to sync Sources indices.
+    """
+
+    paragraph = """Package: hello
+Binary: hello
+Version: 2.10-3
+Maintainer: Santiago Vila <sanvila@debian.org>
+Architecture: any
+Standards-Version: 4.6.2
+Format: 3.0 (quilt)
+Files:
+ 0ad8cd9a1f1ba7b5b8bc55b48bed35f0 1183 hello_2.10-3.dsc
+Checksums-Sha256:
+ 58c7b1a5a7a3d0e63f3f4b4ab7de6d3b4ba2bd2c57ad6fbe3b3e8c8c3d0e5c1c 1183 hello_2.10-3.dsc
+Package-List:
+ hello deb devel optional arch=any
+Directory: pool/main/h/hello
+Priority: source
+Section: devel
+"""
+
+    def test_well_formed_paragraph(self):
+        """
+        Test that a well formed paragraph is translated into SourcePackage fields.
+        """
+        self.assertEqual(
+            _parse_source_paragraph(deb822.Sources(self.paragraph)),
+            {
+                "format": "3.0 (quilt)",
+                "source": "hello",
+                "binary": "hello",
+                "architecture": "any",
+                "version": "2.10-3",
+                "maintainer": "Santiago Vila <sanvila@debian.org>",
+                "standards_version": "4.6.2",
+                "package_list": "hello deb devel optional arch=any",
+            },
+        )
+
+    def test_invalid_paragraph(self):
+        """
+        Test that a paragraph lacking a required field raises a ValidationError.
+        """
+        paragraph = self.paragraph.replace("Standards-Version: 4.6.2\n", "")
+        with self.assertRaises(ValidationError):
+            _parse_source_paragraph(deb822.Sources(paragraph))
+
+
+class TestKnownSourcePackages(TestCase):
+    """
+    Tests the _get_known_source_packages() helper function.
+    """
+
+    def setUp(self):
+        """Setup database fixtures."""
+        self.remote = AptRemote(name="utgard", url="http://example.com/", distributions="stable")
+        self.remote.save()
+        self.repository = AptRepository.objects.create(name="utgard")
+        self.addCleanup(self.repository.delete)
+        self.source_package = SourcePackage(
+            relative_path="pool/main/f/fenrir/fenrir_1.0.dsc",
+            format="3.0 (quilt)",
+            source="fenrir",
+            version="1.0",
+            maintainer="Utgardloki",
+            standards_version="4.6.2",
+        )
+        self.source_package.save()
+        content_artifact = ContentArtifact(
+            content=self.source_package, relative_path=self.source_package.relative_path
+        )
+        content_artifact.save()
+        RemoteArtifact(
+            remote=self.remote,
+            content_artifact=content_artifact,
+            size=34,
+            sha256="3344",
+            url="http://example.com/pool/main/f/fenrir/fenrir_1.0.dsc",
+        ).save()
+        with self.repository.new_version() as new_version:
+            new_version.add_content(SourcePackage.objects.filter(pk=self.source_package.pk))
+
+    def known_source_packages(self, deferred_download):
+        return async_to_sync(_get_known_source_packages)(
+            self.repository.latest_version(), self.remote, deferred_download=deferred_download
+        )
+
+    def test_deferred_download(self):
+        self.assertEqual(
+            self.known_source_packages(deferred_download=True),
+            {
+                (
+                    "pool/main/f/fenrir/fenrir_1.0.dsc",
+                    "fenrir",
+                    "1.0",
+                    frozenset([("fenrir_1.0.dsc", "3344")]),
+                ): self.source_package.pk
+            },
+        )
+
+    def test_immediate_download(self):
+        self.assertEqual(self.known_source_packages(deferred_download=False), {})
+
+    def test_changed_remote_url(self):
+        first_stage = SimpleNamespace(
+            previous_repo_version=SimpleNamespace(info={"remote_url": "http://old.example.com/"}),
+            remote=self.remote,
+            _known_source_packages=None,
+        )
+
+        async def known_source_packages():
+            first_stage._known_source_packages_lock = asyncio.Lock()
+            return await DebFirstStage._get_known_source_packages(first_stage)
+
+        self.assertEqual(asyncio.run(known_source_packages()), {})
+
+
+class TestInstallerFileDigests(TestCase):
+    """
+    Tests the streamed parsing of installer file indices.
+    """
+
+    def test_iter_installer_sums_files(self):
+        sums_files = {
+            "sha256": [b"aaa  ./netboot/mini.iso\n", b"bbb  ./SHA256SUMS\n", b"\n"],
+            "md5": [b"ccc  ./netboot/mini.iso\n", b"ddd  ./cdrom/initrd.gz\n"],
+        }
+        self.assertEqual(
+            list(_iter_installer_sums_files(sums_files)),
+            [
+                ("sha256", "netboot/mini.iso", "aaa"),
+                ("md5", "netboot/mini.iso", "ccc"),
+                ("md5", "cdrom/initrd.gz", "ddd"),
+            ],
+        )
+
+    def test_complete_digests_are_returned_immediately(self):
+        digests = InstallerFileDigests(["sha256", "md5"])
+        self.assertIsNone(digests.add("mini.iso", "sha256", "aaa"))
+        self.assertEqual(digests.add("mini.iso", "md5", "ccc"), {"sha256": "aaa", "md5": "ccc"})
+        self.assertEqual(digests.incomplete(), [])
+
+    def test_incomplete_digests(self):
+        digests = InstallerFileDigests(["sha256", "md5"])
+        digests.add("mini.iso", "sha256", "aaa")
+        self.assertEqual(digests.incomplete(), [("mini.iso", {"sha256": "aaa"})])
+        self.assertEqual(digests.incomplete(), [])